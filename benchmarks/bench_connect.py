@@ -0,0 +1,69 @@
+"""
+Benchmark of the connect latency to a running LightTools session.
+
+The benchmark connects repeatedly to the same LightTools session and
+measures the time of each connection (Session object creation), once
+with the enhanced ILTAPIx class being prepared on every connection (as
+it was before the class was cached) and once with the cached class.
+
+The class is prepared only once per process, so each uncached
+connection is measured in a fresh Python process.  The startup of the
+process and the imports are not part of the measurement.
+
+A running LightTools session is needed.  Run the benchmark from the
+repository root, optionally with the PID of the LightTools process:
+
+    $ python benchmarks/bench_connect.py 4711
+"""
+
+import subprocess
+import sys
+import time
+
+import ltapy.session
+
+REPEAT = 20
+
+
+def _connect(pid):
+    # Return the latency of a single connection in milliseconds.
+    start = time.perf_counter()
+    ltapy.session.Session(pid)
+    return (time.perf_counter() - start) * 1000
+
+
+def _bench(pid, cached):
+    # Return the connect latencies in milliseconds.
+    if cached:
+        return [_connect(pid) for __ in range(REPEAT)]
+    latencies = []
+    for __ in range(REPEAT):
+        output = subprocess.check_output(
+            [sys.executable, __file__, "--once", str(pid)]
+        )
+        latencies.append(float(output))
+    return latencies
+
+
+def main():
+    if sys.argv[1:2] == ["--once"]:
+        print(_connect(int(sys.argv[2])))
+        return
+
+    pid = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    # The first connection prepares the class and, if necessary, the
+    # MakePy support, which is not part of the measurement.
+    pid = ltapy.session.Session(pid).pid
+
+    print("Connect latency in milliseconds ({} connections)".format(REPEAT))
+    print("{:<14s}{:>10s}{:>10s}{:>10s}".format("", "min", "median", "max"))
+    for name, cached in (("Before", False), ("After", True)):
+        latencies = sorted(_bench(pid, cached))
+        print("{:<14s}{:>10.2f}{:>10.2f}{:>10.2f}".format(
+            name, latencies[0], latencies[len(latencies) // 2],
+            latencies[-1],
+        ))
+
+
+if __name__ == "__main__":
+    main()
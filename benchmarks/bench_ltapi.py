@@ -0,0 +1,157 @@
+"""
+Micro-benchmark of the per-call overhead of the enhanced LightTools API.
+
+The benchmark uses a stand-in for the generated ILTAPIx class, so
+neither a running LightTools session nor the MakePy support of LightTools
+is needed (pywin32 must be installed, though).  It measures the Python overhead
+of the wrapper that is put around each API method, i.e. the time spent
+in addition to the (here: negligible) COM round trip.
+
+Run the benchmark from the repository root:
+
+    $ python benchmarks/bench_ltapi.py
+"""
+
+import functools
+import timeit
+
+from ltapy import _ltapi
+from ltapy import error
+from ltapy import tracing
+
+NUMBER = 20000
+
+
+class StandInLTAPI:
+
+    """
+    A stand-in for the generated LightTools COM client class.
+
+    The methods return their values in the same layout as the COM
+    server, i.e. with an additional status code.
+    """
+
+    def DbGet(self, dataKey, dataName, status=0):
+        return 3.14, 0
+
+    def DbSet(self, dataKey, dataName, dataValue):
+        return 0
+
+    def Str(self, aString):
+        return '"{}"'.format(aString)
+
+    def GetSplineVec(self, surfKey, startEndFlag, tanVec):
+        return 0, (0.0, 1.0)
+
+    def GetStatusString(self, status):
+        return ""
+
+
+def _legacy_catch_return_value(func):
+    # The wrapper as it was before the return value processors were
+    # created per function.
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return_value = func(*args, **kwargs)
+        lt, *args = args
+        func_name = func.__name__
+        msg = "Calling LTAPI function {}, args={}, kwargs={}, retval={}"
+        _ltapi.log.debug(
+            msg.format(repr(func_name), args, kwargs, return_value)
+        )
+        return _legacy_process_return_value(lt, func_name, return_value)
+    return wrapper
+
+
+def _legacy_process_return_value(lt, func_name, return_value):
+    status = None
+    out = None
+    unexpected = False
+
+    if func_name in _ltapi.NO_STATUS_CODE_FUNCS:
+        status = None
+        out = return_value
+    elif isinstance(return_value, int):
+        status = return_value
+        out = None
+    elif isinstance(return_value, tuple):
+        if len(return_value) == 2:
+            if func_name in _ltapi.SWAPPED_ORDER_FUNCS:
+                status, out = return_value
+            else:
+                out, status = return_value
+            if func_name in _ltapi.REDUNDANT_OUTPUT_FUNCS:
+                out = None
+        elif len(return_value) == 3:
+            if func_name in _ltapi.SWAPPED_ORDER_FUNCS:
+                *out, status = return_value
+            else:
+                status, *out = return_value
+            if func_name in _ltapi.REDUNDANT_OUTPUT_FUNCS:
+                out = out[0]
+        else:
+            unexpected = True
+    else:
+        unexpected = True
+
+    if unexpected:
+        msg = "Unexpected return value from LTAPI function {}: {}"
+        raise ValueError(msg.format(repr(func_name), return_value))
+
+    if func_name in _ltapi.ARRAY_OUTPUT_FUNCS:
+        out = _ltapi.np.array(out)
+
+    msg = "Processing return value of LTAPI function {}, status={}, out={}"
+    _ltapi.log.debug(msg.format(repr(func_name), status, out))
+
+    if status and status != _ltapi.LTReturnCodeEnum.ltStatusSuccessInternal:
+        raise error.APIError(lt, status)
+
+    return out
+
+
+def _make_class(wrap):
+    # Create a subclass of the stand-in class with wrapped API methods.
+    namespace = {}
+    for name in ("DbGet", "DbSet", "Str", "GetSplineVec"):
+        func = getattr(StandInLTAPI, name)
+        namespace[name] = wrap(func)
+    return type("WrappedLTAPI", (StandInLTAPI,), namespace)
+
+
+def _bench(lt):
+    # Return the time per call in microseconds for some API methods.
+    calls = {
+        "DbGet": lambda: lt.DbGet("LENS_MANAGER[1]", "X"),
+        "DbSet": lambda: lt.DbSet("LENS_MANAGER[1]", "X", 1.0),
+        "Str": lambda: lt.Str("abc"),
+        "GetSplineVec": lambda: lt.GetSplineVec("@key", 1, [0.0, 0.0]),
+    }
+    results = {}
+    for name, call in calls.items():
+        seconds = min(timeit.repeat(call, number=NUMBER, repeat=5))
+        results[name] = seconds / NUMBER * 1e6
+    return results
+
+
+def main():
+    raw = _bench(StandInLTAPI())
+    legacy = _bench(_make_class(_legacy_catch_return_value)())
+    current = _bench(_make_class(_ltapi._catch_return_value)())
+    tracing.enable()
+    traced = _bench(_make_class(_ltapi._catch_return_value)())
+    tracing.disable()
+
+    print("Per-call overhead in microseconds (raw call subtracted)")
+    print("{:<14s}{:>10s}{:>10s}{:>10s}".format(
+        "Function", "Before", "After", "Traced"
+    ))
+    for name in raw:
+        print("{:<14s}{:>10.3f}{:>10.3f}{:>10.3f}".format(
+            name, legacy[name] - raw[name], current[name] - raw[name],
+            traced[name] - raw[name],
+        ))
+
+
+if __name__ == "__main__":
+    main()
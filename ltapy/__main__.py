@@ -0,0 +1,53 @@
+"""
+Command line interface of ltapy.
+
+Examples:
+    Build the MakePy support cache ahead of a batch run:
+
+    $ python -m ltapy warm-up
+    $ python -m ltapy warm-up --pid 4711 --rebuild
+"""
+
+import argparse
+
+from . import config
+from . import session
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ltapy")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    warm_up = commands.add_parser(
+        "warm-up", help="build the MakePy support cache"
+    )
+    warm_up.add_argument(
+        "--pid", type=int,
+        help="PID of a running LightTools process (default: start one)",
+    )
+    warm_up.add_argument(
+        "--version", default=config.LT_VERSION,
+        help="LightTools version to start (default: %(default)s)",
+    )
+    warm_up.add_argument(
+        "--no-jumpstart", action="store_true",
+        help="skip the JumpStart library",
+    )
+    warm_up.add_argument(
+        "--rebuild", action="store_true",
+        help="regenerate the support files in any case",
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "warm-up":
+        libids = session.warm_up(
+            pid=args.pid, version=args.version,
+            jumpstart=not args.no_jumpstart, rebuild=args.rebuild,
+        )
+        for clsid, lcid, major, minor in libids:
+            print("{} lcid={} version={}.{}".format(clsid, lcid, major, minor))
+
+
+if __name__ == "__main__":
+    main()
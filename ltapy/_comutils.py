@@ -2,11 +2,29 @@
 This module provides utility objects for client-side COM support.
 """
 
+import json
 import os
+import sys
+import time
+import uuid
 
 import pythoncom
 import win32com.client
 
+from . import error
+
+# Name of the registry file (in the MakePy output directory) that records
+# the type libraries with valid generated modules.
+TYPELIB_REGISTRY = "ltapy_typelibs.json"
+
+# Time in seconds after which the registry lock is considered stale,
+# e.g. because the process holding it died.
+_STALE_LOCK_AGE = 300.0
+
+# Type libraries registered by this process, as (clsid, lcid, major,
+# minor) tuples.
+_REGISTERED = set()
+
 
 class RunningObjectTable(object):
 
@@ -105,6 +123,29 @@ class RunningObjectTable(object):
                 objs[moniker_name] = obj
         return objs
 
+    def find_names(self, prefix):
+        """
+        Return the moniker names that start with a prefix.
+
+        The objects are not bound, so the COM applications are not
+        called.
+
+        Args:
+            prefix (str): The prefix of the moniker display names.
+
+        Returns:
+            list: The matching moniker names.
+        """
+        names = []
+        for moniker in self.rot:
+            try:
+                moniker_name = self._get_moniker_name(moniker)
+            except pythoncom.com_error:
+                continue
+            if moniker_name.startswith(prefix):
+                names.append(moniker_name)
+        return names
+
 
 def is_dynamic_dispatch(idispatch):
     """
@@ -133,7 +174,279 @@ def generate_typelib_support(idispatch):
             object.
     """
     typelib = get_typelib(idispatch)
-    win32com.client.gencache.MakeModuleForTypelibInterface(typelib)
+    try:
+        win32com.client.gencache.MakeModuleForTypelibInterface(typelib)
+    except NameError:
+        # Fix "name 'nan' is not defined" NameError exception (due to a
+        # bug in MakePy) and add the module to the cache.
+        srcfile = get_generated_filepath(idispatch)
+        with open(srcfile, "r+") as f:
+            data = f.read()
+            f.seek(0)
+            f.write(data.replace("=nan", "=defaultNamedNotOptArg"))
+        libid = get_typelib_id(idispatch)
+        win32com.client.gencache.AddModuleToCache(*libid)
+
+
+def ensure_typelib_support(idispatch, rebuild=False):
+    """
+    Ensure that valid type library support exists for the IDispatch based
+    COM object.
+
+    Type libraries with valid generated modules are recorded in a registry
+    file in the MakePy output directory.  For recorded type libraries, the
+    generated module is loaded without probing or regenerating it.
+    Otherwise, existing support is probed and the support files are
+    (re)generated if necessary.  This is done under a file lock, so that
+    several processes starting at the same time generate the support
+    files only once.
+
+    Args:
+        idispatch (PyIDispatch): The IDispatch interface of the COM
+            object.
+        rebuild (bool, optional): Wether to regenerate the support files
+            in any case.
+
+    Returns:
+        tuple: The (clsid, lcid, major, minor) tuple of the type library.
+    """
+    libid = get_typelib_id(idispatch)
+    if not rebuild and _load_registered(libid):
+        return libid
+    with FileLock(_get_registry_path() + ".lock"):
+        # Another process might have generated the support files while
+        # this process was waiting for the lock.
+        if not rebuild and _load_registered(libid):
+            return libid
+        if rebuild or not _has_current_support(idispatch, libid):
+            generate_typelib_support(idispatch)
+        _register(libid, get_generated_filepath(idispatch))
+    return libid
+
+
+def get_typelib_id(idispatch):
+    """
+    Return the identification of the type library of the given IDispatch
+    interface.
+
+    Args:
+        idispatch (PyIDispatch): The IDispatch interface of the COM
+            object.
+
+    Returns:
+        tuple: The (clsid, lcid, major, minor) tuple of the type library,
+            with the clsid as string.
+    """
+    typelib = get_typelib(idispatch)
+    clsid, lcid, __, major, minor, __ = typelib.GetLibAttr()
+    return str(clsid), lcid, major, minor
+
+
+def _has_current_support(idispatch, libid):
+    """
+    Check if an early-bound COM object is created from the given interface
+    with a generated module that matches the type library version.
+
+    Args:
+        idispatch (PyIDispatch): The IDispatch interface of the COM
+            object.
+        libid (tuple): The (clsid, lcid, major, minor) tuple of the type
+            library.
+
+    Returns:
+        bool: True if the support files are valid and up to date.
+    """
+    try:
+        disp = win32com.client.Dispatch(idispatch)
+    except NameError:
+        # Support files with the "name 'nan' is not defined" bug.
+        return False
+    if isinstance(disp, win32com.client.CDispatch):
+        return False
+    module = sys.modules.get(type(disp).__module__)
+    __, __, major, minor = libid
+    return (
+        getattr(module, "MajorVersion", None) == major
+        and getattr(module, "MinorVersion", None) == minor
+    )
+
+
+def _get_registry_path():
+    """
+    Return the path of the type library registry file.
+    """
+    return os.path.join(
+        win32com.client.gencache.GetGeneratePath(), TYPELIB_REGISTRY
+    )
+
+
+def _read_registry():
+    """
+    Return the entries of the type library registry file.
+
+    Returns:
+        dict: A mapping of type library keys to the path and modification
+            time of the generated module.
+    """
+    try:
+        with open(_get_registry_path()) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _load_registered(libid):
+    """
+    Load the generated module of a registered type library.
+
+    Args:
+        libid (tuple): The (clsid, lcid, major, minor) tuple of the type
+            library.
+
+    Returns:
+        bool: False if the type library isn't registered, or if its
+            generated module changed since it was registered.
+    """
+    if libid in _REGISTERED:
+        return True
+    entry = _read_registry().get(_registry_key(libid))
+    if entry is None:
+        return False
+    try:
+        if os.path.getmtime(entry["file"]) != entry["mtime"]:
+            return False
+    except OSError:
+        return False
+    # Make the generated classes available to Dispatch() in this process,
+    # the module might have been generated by another process.
+    win32com.client.gencache.AddModuleToCache(*libid, bFlushNow=False)
+    _REGISTERED.add(libid)
+    return True
+
+
+def _register(libid, filepath):
+    """
+    Record a type library with a valid generated module in the registry.
+
+    Must be called with the registry lock held.
+
+    Args:
+        libid (tuple): The (clsid, lcid, major, minor) tuple of the type
+            library.
+        filepath (str): The path of the generated module.
+    """
+    registry = _read_registry()
+    registry[_registry_key(libid)] = {
+        "file": filepath,
+        "mtime": os.path.getmtime(filepath),
+    }
+    path = _get_registry_path()
+    with open(path + ".tmp", "w") as f:
+        json.dump(registry, f, indent=2)
+    os.replace(path + ".tmp", path)
+    _REGISTERED.add(libid)
+
+
+def _registry_key(libid):
+    return "{}|{}|{}|{}".format(*libid)
+
+
+class FileLock:
+
+    """
+    A lock that is shared between processes, based on the exclusive
+    creation of a lock file.
+
+    The lock file holds a unique token of the owner.  A lock file older
+    than _STALE_LOCK_AGE seconds is considered stale and is removed by
+    waiting processes.  The stale lock file is first renamed, so that
+    only one process removes it, and restored if it turns out to be a
+    new lock file.  The owner of a lock that was broken this way leaves
+    the new lock file alone when it releases the lock.
+
+    Args:
+        path (str): The path of the lock file.
+        timeout (float, optional): The time limit in seconds for acquiring
+            the lock.
+
+    Raises:
+        TimeOutError: If the lock couldn't be acquired within the time
+            limit.
+
+    Examples:
+        >>> with FileLock("registry.json.lock"):
+        ...     update_registry()
+    """
+
+    def __init__(self, path, timeout=60.0):
+        self.path = path
+        self.timeout = timeout
+        self._token = None
+
+    def __enter__(self):
+        deadline = time.time() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                pass
+            else:
+                token = "{}:{}".format(os.getpid(), uuid.uuid4().hex)
+                os.write(fd, token.encode())
+                os.close(fd)
+                self._token = token
+                return self
+            try:
+                # Read the token first: if the lock file is replaced in
+                # between, the age is the one of the new lock file.
+                with open(self.path) as f:
+                    owner = f.read()
+                age = time.time() - os.path.getmtime(self.path)
+            except OSError:
+                # The lock was released in the meantime.
+                continue
+            if age > _STALE_LOCK_AGE:
+                self._break(owner)
+                continue
+            if time.time() > deadline:
+                msg = "Couldn't acquire lock {!r} within {} seconds."
+                raise error.TimeOutError(msg.format(self.path, self.timeout))
+            time.sleep(0.05)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        token, self._token = self._token, None
+        try:
+            with open(self.path) as f:
+                owner = f.read()
+        except OSError:
+            # The lock was broken as stale and released in the meantime.
+            return
+        if owner == token:
+            os.remove(self.path)
+
+    def _break(self, owner):
+        """
+        Remove a stale lock file, unless it was replaced in the meantime.
+
+        Args:
+            owner (str): The token of the stale lock file.
+        """
+        broken = "{}.{}.broken".format(self.path, uuid.uuid4().hex)
+        try:
+            os.rename(self.path, broken)
+        except OSError:
+            # Another process broke or released the lock first.
+            return
+        with open(broken) as f:
+            replaced = f.read() != owner
+        if replaced:
+            # The stale lock was broken and taken over by another process
+            # before, put its lock file back.
+            try:
+                os.link(broken, self.path)
+            except OSError:
+                pass
+        os.remove(broken)
 
 
 def get_typelib(idispatch):
@@ -171,3 +484,38 @@ def get_generated_filepath(idispatch):
         clsid, lcid, major, minor
     )
     return os.path.join(path, filename + ".py")
+
+
+def marshal_interface(idispatch):
+    """
+    Marshal the IDispatch interface for use in another thread.
+
+    Args:
+        idispatch (PyIDispatch): The IDispatch interface of the COM
+            object.
+
+    Returns:
+        PyIStream: A stream that must be passed to unmarshal_interface()
+            in the other thread (exactly once).
+    """
+    return pythoncom.CoMarshalInterThreadInterfaceInStream(
+        pythoncom.IID_IDispatch, idispatch
+    )
+
+
+def unmarshal_interface(stream):
+    """
+    Unmarshal an IDispatch interface that was marshaled by another thread.
+
+    The calling thread must have initialized COM (CoInitialize).
+
+    Args:
+        stream (PyIStream): The stream returned by marshal_interface().
+
+    Returns:
+        PyIDispatch: The IDispatch interface of the COM object, usable in
+            the calling thread.
+    """
+    return pythoncom.CoGetInterfaceAndReleaseStream(
+        stream, pythoncom.IID_IDispatch
+    )
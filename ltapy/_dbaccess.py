@@ -2,10 +2,19 @@
 This module provides simpler access to the LightTools database.
 """
 
-from win32com.client import constants as LTReturnCodeEnum
+import collections
+import weakref
 
+import numpy as np
+import pythoncom
+
+from . import config
 from . import error
 
+# Minimum number of contiguous list items that DbList reads with the
+# server-side list cursor instead of one ListAtPos() call per item.
+_CURSOR_MIN_LENGTH = 16
+
 
 class DbList(str):
 
@@ -31,6 +40,10 @@ class DbList(str):
         datakey (str): The root database item for the list.
         filter_ (str): Specifies what type of objects to put into the
             list.
+        snapshot (bool, optional): If True, fetch the keys of all list
+            items at once, see snapshot().
+        index (bool, optional): If True, read the names of all list items
+            at once, see index_names().
 
     Examples:
         Create a DbList object, as usual, with the DbList() API function.
@@ -92,20 +105,195 @@ class DbList(str):
 
         >>> "Toroid_4" in solids
         True
+
+        A snapshot holds the keys of all list items, so that len(),
+        indexing, slicing and iteration don't call the server.  Use
+        refresh() to fetch the keys again.
+
+        >>> solids = lt.DbList(
+        ...     "LENS_MANAGER[1].COMPONENTS[Components]", "SOLID",
+        ...     snapshot=True,
+        ... )
+        >>> [solids[i] for i in range(len(solids))]
+        ['@Zm100407', '@Qp100408', '@kg100409', '@FR100410', '@dk100411']
+
+        A name index serves membership tests and name lookups without
+        calling the server.
+
+        >>> solids = lt.DbList(
+        ...     "LENS_MANAGER[1].COMPONENTS[Components]", "SOLID",
+        ...     index=True,
+        ... )
+        >>> solids.keys_for(["Cube_1", "Toroid_4"])
+        ['@Zm100407', '@FR100410']
+        >>> solids.get("Toroid_xx") is None
+        True
+
+        The list is deleted on the server when the object is garbage
+        collected (at the next DbList() call of the session), or
+        explicitly with delete() or a with statement.  Identical DbList()
+        requests share one server-side list while it is in use.  The
+        DbList methods don't depend on the position of the server-side
+        list cursor, but calling ListNext() or ListSetPos() directly moves
+        the cursor of all objects sharing the list.  Use lt._DbList() for
+        a private list that is driven by ListNext().
+
+        >>> with lt.DbList("COMPONENTS[1]", "SOLID") as solids:
+        ...     names = [lt.DbGet(solid, "NAME") for solid in solids]
     """
 
-    def __new__(cls, lt, datakey, filter_):
+    def __new__(cls, lt, datakey, filter_, snapshot=False, index=False):
         # Objects of type str are immutable.  Their value cannot be
         # initialized as usual in the __init__ method.  Because the value
         # of listkey is not known before object creation the __new__ method
         # of str must be overriden.
-        listkey = lt._DbList(dataKey=datakey, filter=filter_)
-        return super().__new__(cls, listkey)
+        registry = _get_list_registry(lt)
+        listkey = registry.acquire(lt, datakey, filter_)
+        obj = super().__new__(cls, listkey)
+        # The key of the server-side list that is used by the methods.  It
+        # differs from the value of the object after refresh().
+        obj._listkey = listkey
+        obj._handles = [(datakey, filter_, listkey)]
+        # Release the server-side lists when the object is collected.  The
+        # finalizer may run on any thread, so it only queues the lists for
+        # deletion by the thread that uses the session.
+        obj._finalizer = weakref.finalize(
+            obj, _release_handles, registry, obj._handles
+        )
+        return obj
 
-    def __init__(self, lt, datakey, filter_):
+    def __init__(self, lt, datakey, filter_, snapshot=False, index=False):
         self._lt = lt
         self._datakey = datakey
         self._filter = filter_
+        self._keys = None
+        self._index = None
+        if snapshot:
+            self.snapshot()
+        if index:
+            self.index_names()
+
+    def snapshot(self):
+        """
+        Fetch the keys of all list items in one pass.
+
+        Afterwards, len(), indexing with integers and slices, and
+        iteration use the fetched keys without calling the server.
+        Indices out of range raise an IndexError.
+
+        Returns:
+            DbList: The object itself.
+        """
+        size = self._lt.ListSize(listKey=self._listkey)
+        self._keys = tuple(self._fetch(range(size)))
+        return self
+
+    def index_names(self):
+        """
+        Read the names of all list items into a name index.
+
+        Afterwards, membership tests, indexing with names, keys_for() and
+        get() use the index without calling the server.  Indexing with an
+        unknown name raises a KeyError.  If several list items have the
+        same name, the first one is indexed.
+
+        Returns:
+            DbList: The object itself.
+        """
+        if self._keys is not None:
+            keys = self._keys
+        else:
+            size = self._lt.ListSize(listKey=self._listkey)
+            keys = self._fetch(range(size))
+        index = {}
+        for key in keys:
+            index.setdefault(self._lt.DbGet(key, "NAME"), key)
+        self._index = index
+        return self
+
+    def refresh(self):
+        """
+        Create the list on the server again, and fetch the keys and the
+        names of all list items again if the object holds a snapshot or a
+        name index.
+
+        A server-side list doesn't change after it is created, so this is
+        necessary to see added or removed database items.  The methods of
+        the object use the new list.  The value of the object, i.e. the
+        list key passed to API functions, still refers to the list as it
+        was created.
+
+        Returns:
+            DbList: The object itself.
+        """
+        registry = _get_list_registry(self._lt)
+        listkey = registry.acquire(
+            self._lt, self._datakey, self._filter, fresh=True
+        )
+        # The original list is kept for the value of the object.
+        if len(self._handles) > 1:
+            registry.release(*self._handles.pop())
+        self._handles.append((self._datakey, self._filter, listkey))
+        self._listkey = listkey
+        if self._keys is not None:
+            self.snapshot()
+        if self._index is not None:
+            self.index_names()
+        return self
+
+    def keys_for(self, names):
+        """
+        Return the keys of the list items with the given names.
+
+        The name index is built if necessary.
+
+        Args:
+            names (iterable): The names of the list items.
+
+        Returns:
+            list: The keys of the list items.
+
+        Raises:
+            KeyError: If a name is not in the list.
+        """
+        if self._index is None:
+            self.index_names()
+        return [self._index[name] for name in names]
+
+    def get(self, name, default=None):
+        """
+        Return the key of the list item with the given name, or `default`
+        if there is no such item.
+
+        The name index is built if necessary.
+
+        Args:
+            name (str): The name of the list item.
+            default (optional): The value returned if the name is not in
+                the list.
+
+        Returns:
+            str: The key of the list item.
+        """
+        if self._index is None:
+            self.index_names()
+        return self._index.get(name, default)
+
+    def delete(self):
+        """
+        Delete the list on the server.
+
+        The list is only deleted if no other DbList object uses it.  The
+        object must not be used afterwards, except for a snapshot.
+        """
+        self._finalizer()
+        _get_list_registry(self._lt).purge(self._lt)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.delete()
 
     def show(self):
         """
@@ -116,7 +304,7 @@ class DbList(str):
         # the functions in __repr__ lead to infinite recursion.
         s = "Data Key:    {}\n".format(self._datakey)
         s += "Filter:      {}\n".format(self._filter)
-        size = self._lt.ListSize(self)
+        size = self._lt.ListSize(listKey=self._listkey)
         s += "List Key:    {}\n".format(self)
         s += "List Items:  {} items, {} to {}".format(size, 0, size-1)
         for i, key in enumerate(self):
@@ -125,52 +313,522 @@ class DbList(str):
         print(s)
 
     def __len__(self):
-        return self._lt.ListSize(listKey=self)
+        if self._keys is not None:
+            return len(self._keys)
+        return self._lt.ListSize(listKey=self._listkey)
 
     def __getitem__(self, key):
         if isinstance(key, str):
-            return self._lt.ListByName(listKey=self, dataName=key)
+            if self._index is not None:
+                return self._index[key]
+            return self._lt.ListByName(listKey=self._listkey, dataName=key)
+        elif self._keys is not None and isinstance(key, (int, slice)):
+            items = self._keys[key]
+            return list(items) if isinstance(key, slice) else items
         elif isinstance(key, int):
             if key < 0:
-                key += self._lt.ListSize(listKey=self)
-            return self._lt.ListAtPos(listKey=self, positionOfList=key+1)
+                key += self._lt.ListSize(listKey=self._listkey)
+            return self._lt.ListAtPos(
+                listKey=self._listkey, positionOfList=key+1
+            )
         elif isinstance(key, slice):
-            size = self._lt.ListSize(listKey=self)
-            items = [
-                self._lt.ListAtPos(listKey=self, positionOfList=i+1)
-                for i in range(size)
-            ]
-            return items[key]
+            size = self._lt.ListSize(listKey=self._listkey)
+            return self._fetch(range(*key.indices(size)))
         else:
             msg = "{} indices must be integer, slice or str, not {}."
             name = self.__class__.__name__
             raise TypeError(msg.format(name, repr(type(key))))
 
+    def _fetch(self, positions):
+        """
+        Return the keys of the list items at the given (0-based) positions.
+
+        Long contiguous ranges are read with the server-side list cursor
+        (ListSetPos, then ListNext), which doesn't pass a position with
+        every call.
+        """
+        if len(positions) >= _CURSOR_MIN_LENGTH and abs(positions.step) == 1:
+            first = min(positions[0], positions[-1])
+            listkey = self._listkey
+            self._lt.ListSetPos(listKey=listkey, positionOfList=first+1)
+            items = [
+                self._lt.ListNext(listKey=listkey)
+                for __ in range(len(positions))
+            ]
+            return items if positions.step > 0 else items[::-1]
+        return [
+            self._lt.ListAtPos(listKey=self._listkey, positionOfList=i+1)
+            for i in positions
+        ]
+
     def __iter__(self):
-        try:
-            self._lt.ListSetPos(listKey=self, positionOfList=1)
-        except error.APIError as e:
-            if (e.status == LTReturnCodeEnum.ltStatusListIsEmpty
-                or e.status == LTReturnCodeEnum.ltStatusInvalidListPosition):
-                pass
-            else:
-                raise
-        return self
+        return self.iterate()
+
+    def iterate(self, chunk_size=None):
+        """
+        Return an iterator over the keys of the list items.
+
+        Each iterator has its own position, so that nested loops over the
+        same list don't interfere.  The keys are fetched in chunks, and the
+        end of the list is detected from the list size.
+
+        Args:
+            chunk_size (int, optional): The number of keys fetched at once.
+                Defaults to config.DBLIST_CHUNK_SIZE.
+
+        Returns:
+            iterator: The iterator over the keys.
+        """
+        if self._keys is not None:
+            return iter(self._keys)
+        if chunk_size is None:
+            chunk_size = config.DBLIST_CHUNK_SIZE
+        return _DbListIterator(self, chunk_size)
 
     def __contains__(self, item):
+        if self._index is not None:
+            return item in self._index
         try:
-            self._lt.ListByName(listKey=self, dataName=item)
+            self._lt.ListByName(listKey=self._listkey, dataName=item)
         except error.APIError:
             return False
         else:
             return True
 
+
+class _DbListIterator:
+
+    """
+    An iterator over the keys of the items of a DbList object.
+
+    Args:
+        dblist (DbList): The database list.
+        chunk_size (int): The number of keys fetched at once.
+    """
+
+    def __init__(self, dblist, chunk_size):
+        self._dblist = dblist
+        self._chunk_size = chunk_size
+        self._size = dblist._lt.ListSize(listKey=dblist._listkey)
+        self._pos = 0
+        self._chunk = collections.deque()
+
+    def __iter__(self):
+        return self
+
     def __next__(self):
-        try:
-            return self._lt.ListNext(listKey=self)
-        except error.APIError as e:
-            if (e.status == LTReturnCodeEnum.ltStatusListIsEmpty
-                or e.status == LTReturnCodeEnum.ltStatusEndOfList):
+        if not self._chunk:
+            if self._pos >= self._size:
                 raise StopIteration
-            else:
-                raise
+            stop = min(self._pos + self._chunk_size, self._size)
+            self._chunk.extend(self._dblist._fetch(range(self._pos, stop)))
+            self._pos = stop
+        return self._chunk.popleft()
+
+
+class ListRegistry:
+
+    """
+    The server-side database lists created by the DbList objects of a
+    LightTools session.
+
+    Identical DbList() requests, i.e. with the same data key and filter,
+    share one server-side list while it is in use.  A list is deleted on
+    the server when it is released by the last DbList object.  After a
+    modification of the database (e.g. by Cmd()) new requests get a new
+    list.
+
+    Released lists are only queued, since the finalizer of a DbList object
+    may run on a thread that must not use the session.  They are deleted
+    by purge(), which is called on the next request of a list.
+    """
+
+    def __init__(self):
+        self._shared = {}
+        self._refs = collections.Counter()
+        self._released = collections.deque()
+
+    def __len__(self):
+        # The number of server-side lists that are not deleted yet.
+        return len(self._refs)
+
+    def acquire(self, lt, datakey, filter_, fresh=False):
+        """
+        Return the key of a server-side list, created if necessary, or
+        always if `fresh` is True.
+        """
+        self.purge(lt)
+        listkey = None if fresh else self._shared.get((datakey, filter_))
+        if listkey is None:
+            listkey = lt._DbList(dataKey=datakey, filter=filter_)
+            self._shared[(datakey, filter_)] = listkey
+        self._refs[listkey] += 1
+        return listkey
+
+    def release(self, datakey, filter_, listkey):
+        """
+        Queue a server-side list for release.
+
+        This method doesn't call LightTools and can be called from any
+        thread.
+        """
+        self._released.append((datakey, filter_, listkey))
+
+    def purge(self, lt):
+        """
+        Delete the released lists that are no longer used on the server.
+
+        Must be called by the thread that uses the session.
+        """
+        while self._released:
+            datakey, filter_, listkey = self._released.popleft()
+            self._refs[listkey] -= 1
+            if self._refs[listkey] > 0:
+                continue
+            del self._refs[listkey]
+            if self._shared.get((datakey, filter_)) == listkey:
+                del self._shared[(datakey, filter_)]
+            try:
+                lt.ListDelete(listKey=listkey)
+            except (error.APIError, pythoncom.com_error):
+                # The session was closed or the list is gone already.
+                pass
+
+    def forget(self):
+        """
+        Don't share the existing lists with new requests.
+        """
+        self._shared.clear()
+
+
+def _release_handles(registry, handles):
+    """
+    Release the server-side lists of a collected DbList object.
+    """
+    for handle in handles:
+        registry.release(*handle)
+
+
+def _get_list_registry(lt):
+    """
+    Return the list registry of a LightTools session, created on first
+    use.
+    """
+    registry = lt.__dict__.get("_dblists")
+    if registry is None:
+        registry = lt.__dict__["_dblists"] = ListRegistry()
+    return registry
+
+
+class WriteBuffer:
+
+    """
+    A buffer for deferred writes to the LightTools database.
+
+    The buffer holds the values of DbSet() calls until they are flushed.
+    Writes to the same data item (slot) collapse to the last written value.
+    The writes are flushed in the order of their last write.
+
+    A slot is identified by the data key, the (case-insensitive) data
+    name and the indices of the data item.  Note that different data keys
+    that refer to the same database item (e.g. the name based and the
+    encrypted data key) are different slots.
+
+    Args:
+        dbset (function): A function dbset(dataKey, dataName, dataValue,
+            i, j) that writes a single value to the database.
+    """
+
+    def __init__(self, dbset):
+        self._dbset = dbset
+        self._writes = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._writes)
+
+    def set(self, dataKey, dataName, dataValue, i=pythoncom.Empty,
+            j=pythoncom.Empty):
+        """
+        Buffer the value of a data item.
+
+        Args:
+            dataKey (str): The data key of the database item.
+            dataName (str): The name of the data item.
+            dataValue: The value of the data item.
+            i (int, optional): The first index of an indexed data item.
+            j (int, optional): The second index of an indexed data item.
+        """
+        slot = _slot(dataKey, dataName, i, j)
+        self._writes[slot] = (dataKey, dataName, dataValue, i, j)
+        self._writes.move_to_end(slot)
+
+    def get(self, dataKey, dataName, i=pythoncom.Empty, j=pythoncom.Empty,
+            default=None):
+        """
+        Return the buffered value of a data item.
+
+        Args:
+            dataKey (str): The data key of the database item.
+            dataName (str): The name of the data item.
+            i (int, optional): The first index of an indexed data item.
+            j (int, optional): The second index of an indexed data item.
+            default (optional): The value returned if no value is buffered
+                for the data item.
+
+        Returns:
+            The buffered value of the data item as it was passed to set(),
+                or `default`.
+        """
+        try:
+            write = self._writes[_slot(dataKey, dataName, i, j)]
+        except KeyError:
+            return default
+        return write[2]
+
+    def flush(self):
+        """
+        Write all buffered values to the database.
+
+        The values are written in the order of their last write.  If a
+        write fails, the failed value and the remaining values stay in
+        the buffer.
+
+        Raises:
+            APIError: If a value could not be written.
+        """
+        while self._writes:
+            slot, write = next(iter(self._writes.items()))
+            self._dbset(*write)
+            # Remove the value only if it was written.
+            del self._writes[slot]
+
+    def discard(self):
+        """
+        Discard all buffered values without writing them.
+        """
+        self._writes.clear()
+
+
+#: Statistics of a PropertyCache object.
+CacheInfo = collections.namedtuple(
+    "CacheInfo", ["hits", "misses", "maxsize", "currsize"]
+)
+
+
+class PropertyCache:
+
+    """
+    A least recently used (LRU) cache for data item values.
+
+    The cache holds the values of DbGet() calls.  Cached values must be
+    invalidated if the database is modified.  Depending on the `scope`,
+    the modification of a database item invalidates the cached values of
+    that database item only, or all cached values.
+
+    Args:
+        maxsize (int): The maximum number of cached values.
+        scope (str): 'session' if any modification of the database
+            invalidates all cached values, 'key' if the modification of a
+            database item invalidates the cached values of the same data
+            key only.
+    """
+
+    SCOPES = ("session", "key")
+
+    def __init__(self, maxsize, scope="session"):
+        if scope not in self.SCOPES:
+            msg = "Invalid cache scope {!r}, must be one of {}."
+            raise ValueError(msg.format(scope, self.SCOPES))
+        self.maxsize = maxsize
+        self.scope = scope
+        self.hits = 0
+        self.misses = 0
+        self._values = collections.OrderedDict()
+        self._slots = collections.defaultdict(set)
+
+    def __len__(self):
+        return len(self._values)
+
+    def get(self, dataKey, dataName, i=pythoncom.Empty, j=pythoncom.Empty,
+            default=None):
+        """
+        Return the cached value of a data item.
+
+        Args:
+            dataKey (str): The data key of the database item.
+            dataName (str): The name of the data item.
+            i (int, optional): The first index of an indexed data item.
+            j (int, optional): The second index of an indexed data item.
+            default (optional): The value returned on a cache miss.
+
+        Returns:
+            The cached value of the data item, or `default`.
+        """
+        slot = _slot(dataKey, dataName, i, j)
+        try:
+            value = self._values[slot]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._values.move_to_end(slot)
+        self.hits += 1
+        return value
+
+    def put(self, dataKey, dataName, i, j, value):
+        """
+        Cache the value of a data item.
+
+        The least recently used value is discarded if the cache is full.
+
+        Args:
+            dataKey (str): The data key of the database item.
+            dataName (str): The name of the data item.
+            i (int): The first index of an indexed data item (or
+                pythoncom.Empty).
+            j (int): The second index of an indexed data item (or
+                pythoncom.Empty).
+            value: The value of the data item.
+        """
+        slot = _slot(dataKey, dataName, i, j)
+        self._values[slot] = value
+        self._values.move_to_end(slot)
+        self._slots[dataKey].add(slot)
+        if len(self._values) > self.maxsize:
+            old, __ = self._values.popitem(last=False)
+            self._discard_slot(old)
+
+    def invalidate(self, dataKey):
+        """
+        Invalidate the cached values after a modification of a database
+        item.
+
+        Args:
+            dataKey (str): The data key of the modified database item.
+        """
+        if self.scope == "session":
+            self.clear()
+            return
+        for slot in self._slots.pop(dataKey, ()):
+            del self._values[slot]
+
+    def clear(self):
+        """
+        Invalidate all cached values.
+        """
+        self._values.clear()
+        self._slots.clear()
+
+    def info(self):
+        """
+        Return the cache statistics.
+
+        Returns:
+            CacheInfo: The number of cache hits and misses, the maximum
+                and the current cache size.
+        """
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self))
+
+    def _discard_slot(self, slot):
+        # Remove a slot from the index of slots by data key.
+        slots = self._slots[slot[0]]
+        slots.discard(slot)
+        if not slots:
+            del self._slots[slot[0]]
+
+
+def _slot(dataKey, dataName, i, j):
+    """
+    Return the identifier of a data item.
+
+    Args:
+        dataKey (str): The data key of the database item.
+        dataName (str): The name of the data item.
+        i (int): The first index of an indexed data item (or
+            pythoncom.Empty).
+        j (int): The second index of an indexed data item (or
+            pythoncom.Empty).
+
+    Returns:
+        tuple: The (dataKey, DATANAME, i, j) tuple, with None for missing
+            indices.
+    """
+    if i is pythoncom.Empty:
+        i = None
+    if j is pythoncom.Empty:
+        j = None
+    return dataKey, dataName.upper(), i, j
+
+
+def get_many(dbget, keys, fields, dtype=None):
+    """
+    Get the values of the given fields for all given data keys.
+
+    Args:
+        dbget (function): A function dbget(key, field, i) that returns the
+            value of a single data item (i is None for non-indexed data
+            items).
+        keys (iterable): The data keys of the database items.
+        fields (iterable): The names of the data items.  Indexed data
+            items (e.g. Vertex_X_At) are given as (name, i) tuples.
+        dtype (data-type, optional): The data type of the returned array.
+            If not given, a float array is returned for numeric data items
+            and a structured array otherwise.
+
+    Returns:
+        numpy.ndarray: A (len(keys), len(fields)) array, or a structured
+            array of length len(keys) with one field per data item.
+    """
+    keys = list(keys)
+    fields = [
+        (field, None) if isinstance(field, str) else tuple(field)
+        for field in fields
+    ]
+
+    rows = (
+        tuple([dbget(key, name, i) for name, i in fields]) for key in keys
+    )
+    if dtype is None:
+        # The data type depends on the values of all rows, e.g. a data
+        # item may be numeric for some database items only.
+        rows = list(rows)
+        dtype = _infer_dtype(fields, rows) if rows else float
+    dtype = np.dtype(dtype)
+
+    if dtype.names is None:
+        out = np.empty((len(keys), len(fields)), dtype=dtype)
+    else:
+        out = np.empty(len(keys), dtype=dtype)
+    for row, values in enumerate(rows):
+        out[row] = values
+    return out
+
+
+def _infer_dtype(fields, rows):
+    """
+    Return the array data type for the given data item values.
+
+    Args:
+        fields (list): The (name, i) tuples of the data items.
+        rows (list): The values of the data items, one tuple per database
+            item.
+
+    Returns:
+        numpy.dtype: A float data type if all values are numeric, a
+            structured data type with one field per data item otherwise.
+            A field is of type float if its values are numeric in all rows,
+            and of type object otherwise.
+    """
+    numeric = [
+        all(
+            isinstance(value, (int, float)) and not isinstance(value, bool)
+            for value in column
+        )
+        for column in zip(*rows)
+    ]
+    if all(numeric):
+        return np.dtype(float)
+    names = [
+        name if i is None else "{}[{}]".format(name, i) for name, i in fields
+    ]
+    formats = [float if isnum else object for isnum in numeric]
+    return np.dtype({"names": names, "formats": formats})
@@ -2,12 +2,15 @@
 This module provides a LightTools API object with enhanced features.
 """
 
+import contextlib
 import functools
 import inspect
 import logging
 import os
 import string
 import tempfile
+import threading
+import time
 
 import numpy as np
 import pythoncom
@@ -16,7 +19,10 @@ from win32com.client import constants as LTReturnCodeEnum
 
 from . import _comutils
 from . import _dbaccess
+from . import _profiling
+from . import config
 from . import error
+from . import tracing
 
 log = logging.getLogger(__name__)
 log.addHandler(logging.NullHandler())
@@ -69,6 +75,46 @@ ARRAY_OUTPUT_FUNCS = (
     "GetSweptProfilePoints",
 )
 
+# LightTools API functions that modify the database, other than DbSet().
+# The name of the argument that holds the key of the modified database
+# item is given, or None if the function may modify any database item.
+MUTATING_FUNCS = {
+    "Cmd": None,
+    "SetFreeformSurfacePoints": "surfaceKey",
+    "SetMeshData": "meshKey",
+    "SetMeshStrings": "meshKey",
+    "SetSplineVec": "surfKey",
+    "SetSweptProfilePoints": "profileKey",
+    "SetVar": None,
+    "SplinePatch": "surfKey",
+    "SplineSweep": "surfKey",
+}
+
+# LightTools options that are switched off during bulk edits, i.e.
+# automatic database updates and view redraws.
+BULK_EDIT_OPTIONS = (
+    "DBUPDATE",
+    "VIEWUPDATE",
+)
+
+# LightTools command that updates the database after bulk edits.
+UPDATE_COMMAND = "Update"
+
+# Cache of the API methods created by _get_tuple_output_method, by
+# (ILTAPIx class, function name).
+_TUPLE_OUTPUT_METHODS = {}
+
+# Cache of the enhanced ILTAPIx classes, by IID of the dispatch
+# interface.  A class is enhanced once, later connections only wrap the
+# IDispatch interface of the COM server object.
+_LTAPI_CLASSES = {}
+
+# Serializes the lookup in _LTAPI_CLASSES and the enhancement of a class.
+# Sessions are connected concurrently (e.g. by the workers of a session
+# pool), and a class that is enhanced by two threads at once gets its
+# methods wrapped twice.
+_LTAPI_LOCK = threading.Lock()
+
 
 def LTAPI(comobj, rebuild=False):
     """
@@ -85,19 +131,58 @@ def LTAPI(comobj, rebuild=False):
     # Get the IDispatch interface of the COM server object.
     idispatch = comobj.QueryInterface(pythoncom.IID_IDispatch)
 
-    # Make sure that MakePy support is available for the object.
-    _ensure_makepy_support(idispatch, rebuild)
+    with _LTAPI_LOCK:
+        # Reuse the enhanced class of a previous connection.  The
+        # interface is identified the same way as by
+        # win32com.client.Dispatch(), see _get_interface_iid() for the
+        # cost of that.
+        if not rebuild:
+            iid = _get_interface_iid(idispatch)
+            if iid in _LTAPI_CLASSES:
+                return _LTAPI_CLASSES[iid](idispatch)
+
+        # Make sure that MakePy support is available for the object.
+        _ensure_makepy_support(idispatch, rebuild)
+
+        # Create an early-bound LightTools COM client object.
+        lt = win32com.client.Dispatch(idispatch)
+
+        # Enhance the default LightTools API with additional features.
+        _enable_exceptions(lt)
+        _enable_profiling(lt)
+        _improve_dblist_interface(lt)
+        _add_batched_dbget(lt)
+        _enable_deferred_writes(lt)
+        _enable_property_cache(lt)
+        _enable_bulk_edit(lt)
+        _fix_dbkeydump_argspec(lt)
+        _fix_viewkeydump_argspec(lt)
+
+        if not isinstance(lt, win32com.client.CDispatch):
+            _LTAPI_CLASSES[_get_interface_iid(idispatch)] = lt.__class__
 
-    # Create an early-bound LightTools COM client object.
-    lt = win32com.client.Dispatch(idispatch)
+    return lt
 
-    # Enhance the default LightTools API with additional features.
-    _enable_exceptions(lt)
-    _improve_dblist_interface(lt)
-    _fix_dbkeydump_argspec(lt)
-    _fix_viewkeydump_argspec(lt)
 
-    return lt
+def _get_interface_iid(idispatch):
+    """
+    Return the IID of the dispatch interface of a COM object.
+
+    This costs two COM round trips (GetTypeInfo and GetTypeAttr), which
+    can't be avoided: the QueryInterface of LTAPI() asks for IDispatch,
+    whose IID is the same for all objects, and CLSIDToClass needs this
+    IID as well.  A QueryInterface for the IID of a cached class would
+    also succeed for a newer LightTools version that still implements
+    the older interface, and would silently return the older class.
+
+    Args:
+        idispatch (PyIDispatch): The IDispatch interface of a LightTools
+            COM server object.
+
+    Returns:
+        str: The IID, which identifies the generated ILTAPIx class.
+    """
+    return str(idispatch.GetTypeInfo().GetTypeAttr()[0])
 
 
 def _ensure_makepy_support(idispatch, rebuild=False):
@@ -110,8 +195,7 @@ def _ensure_makepy_support(idispatch, rebuild=False):
         rebuild (bool): Wether to regenerate the Python source code
             (makepy support) for the corresponding COM type library.
     """
-    if rebuild or _comutils.is_dynamic_dispatch(idispatch):
-        _comutils.generate_typelib_support(idispatch)
+    _comutils.ensure_typelib_support(idispatch, rebuild)
 
 
 def _enable_exceptions(lt):
@@ -129,7 +213,10 @@ def _enable_exceptions(lt):
     for name, method in inspect.getmembers(lt, inspect.ismethod):
         if not _is_api_method(method):
             continue
-        setattr(lt.__class__, name, _catch_return_value(method.__func__))
+        process = _make_return_value_processor(name)
+        setattr(
+            lt.__class__, name, _catch_return_value(method.__func__, process)
+        )
 
 
 def _has_exceptions(lt):
@@ -172,7 +259,7 @@ def _is_api_method(method):
     return first_letter in string.ascii_uppercase
 
 
-def _catch_return_value(func):
+def _catch_return_value(func, process=None):
     """
     Catch the return value of a LightTools API function call.
 
@@ -183,25 +270,99 @@ def _catch_return_value(func):
     Args:
         func (function): The function object of a (bound) LightTools
             API method.
+        process (function, optional): The return value processor of the
+            LightTools API function (see _make_return_value_processor).
+            It is created from the function name if not given.
 
     Returns:
         function: The wrapped function object.
     """
+    func_name = func.__name__
+    if process is None:
+        process = _make_return_value_processor(func_name)
+
     @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        return_value = func(*args, **kwargs)
-        lt, *args = args
-        func_name = func.__name__
-        msg = "Calling LTAPI function {}, args={}, kwargs={}, retval={}"
-        log.debug(msg.format(repr(func_name), args, kwargs, return_value))
-        return _process_return_value(lt, func_name, return_value)
+    def wrapper(self, *args, **kwargs):
+        if tracing._tracer is None and not _profiling._enabled:
+            return process(self, func(self, *args, **kwargs))
+        return _call_instrumented(self, func, process, args, kwargs)
     return wrapper
 
 
+def _call_instrumented(lt, func, process, args, kwargs):
+    """
+    Call a LightTools API function and record the call.
+
+    The call is recorded by the call tracer (if tracing is enabled) and by
+    the profiler of the LightTools session (if profiling is enabled).  If
+    the call fails with an APIError, the recorded calls are attached to the
+    exception (APIError.trace) and logged at DEBUG level.  They are only
+    formatted if the log message is emitted.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+        func (function): The function object of a (bound) LightTools
+            API method.
+        process (function): The return value processor of the LightTools
+            API function.
+        args (tuple): The positional arguments of the call.
+        kwargs (dict): The keyword arguments of the call.
+
+    Returns:
+        The processed output value of the LightTools API function.
+    """
+    tracer = tracing._tracer
+    profiler = lt.__dict__.get("_profiler")
+    if profiler is not None and not profiler.enabled:
+        profiler = None
+
+    out = None
+    status = 0
+    api_error = None
+    start = time.perf_counter()
+    com_end = None
+    try:
+        return_value = func(lt, *args, **kwargs)
+        com_end = time.perf_counter()
+        out = process(lt, return_value)
+    except error.APIError as e:
+        status = e.status
+        api_error = e
+        raise
+    except Exception as e:
+        status = type(e).__name__
+        raise
+    finally:
+        end = time.perf_counter()
+        if com_end is None:
+            com_end = end
+        name = func.__name__
+        if profiler is not None:
+            profiler.record(
+                name, com_end - start, end - com_end, out, status != 0
+            )
+        if tracer is not None:
+            tracer.record(name, args, kwargs, out, end - start, status)
+            if api_error is not None:
+                # APIErrors are also part of the normal control flow (e.g.
+                # membership tests of DbList objects), so the trace is
+                # neither formatted nor logged at a high level here.
+                api_error.trace = tracer.records()
+                tracing.log.debug(
+                    "LTAPI call trace (most recent call last):\n%s",
+                    tracing._Dump(api_error.trace),
+                )
+    return out
+
+
 def _process_return_value(lt, func_name, return_value):
     """
     Process the return value(s) of a Lighttools API function call.
 
+    This is a convenience function for one-off calls.  The wrapped API
+    methods use a return value processor that is created only once per
+    function (see _make_return_value_processor).
+
     Args:
         lt (ILTAPIx): A handle to the LightTools session.
         func_name (str): The name of the LightTools API function.
@@ -215,50 +376,233 @@ def _process_return_value(lt, func_name, return_value):
         APIError: If the LightTools API function call returns with a
             non-zero status code.
     """
-    status = None
-    out = None
-    unexpected = False
+    process = _make_return_value_processor(func_name)
+    return process(lt, return_value)
 
+
+def _make_return_value_processor(func_name, array=None):
+    """
+    Create a return value processor for a LightTools API function.
+
+    The layout of the return value(s) is fixed for every LightTools API
+    function.  The membership tests in NO_STATUS_CODE_FUNCS,
+    SWAPPED_ORDER_FUNCS, REDUNDANT_OUTPUT_FUNCS and ARRAY_OUTPUT_FUNCS are
+    therefore evaluated only once, when the processor is created, and
+    not on every API function call.
+
+    Args:
+        func_name (str): The name of the LightTools API function.
+        array (bool, optional): Wether to convert the output value to an
+            ndarray.  Defaults to True for the functions in
+            ARRAY_OUTPUT_FUNCS.
+
+    Returns:
+        function: A function process(lt, return_value) that returns the
+            processed output value of the LightTools API function and
+            raises an APIError if the call returned with a non-zero status
+            code.
+    """
     if func_name in NO_STATUS_CODE_FUNCS:
-        status = None
-        out = return_value
-    elif isinstance(return_value, int):
-        status = return_value
-        out = None
-    elif isinstance(return_value, tuple):
-        if len(return_value) == 2:
-            if func_name in SWAPPED_ORDER_FUNCS:
-                status, out = return_value
+        def process(lt, return_value):
+            return return_value
+        return process
+
+    swapped = func_name in SWAPPED_ORDER_FUNCS
+    redundant = func_name in REDUNDANT_OUTPUT_FUNCS
+    if array is None:
+        array = func_name in ARRAY_OUTPUT_FUNCS
+    # The enumeration constant is resolved once, on the first non-zero
+    # status code.  Attribute access on the win32com constants object is
+    # comparatively expensive, and fails until the MakePy module of
+    # LightTools is loaded.
+    success_internal = None
+
+    def process(lt, return_value):
+        nonlocal success_internal
+        if isinstance(return_value, tuple):
+            size = len(return_value)
+            if size == 2:
+                if swapped:
+                    status, out = return_value
+                else:
+                    out, status = return_value
+                if redundant:
+                    out = None
+            elif size == 3:
+                if swapped:
+                    *out, status = return_value
+                else:
+                    status, *out = return_value
+                if redundant:
+                    out = out[0]
             else:
-                out, status = return_value
-            if func_name in REDUNDANT_OUTPUT_FUNCS:
-                out = None
-        elif len(return_value) == 3:
-            if func_name in SWAPPED_ORDER_FUNCS:
-                *out, status = return_value
-            else:
-                status, *out = return_value
-            if func_name in REDUNDANT_OUTPUT_FUNCS:
-                out = out[0]
+                _raise_unexpected_return_value(func_name, return_value)
+        elif isinstance(return_value, int):
+            status = return_value
+            out = None
         else:
-            unexpected = True
-    else:
-        unexpected = True
+            _raise_unexpected_return_value(func_name, return_value)
 
-    if unexpected:
-        msg = "Unexpected return value from LTAPI function {}: {}"
-        raise ValueError(msg.format(repr(func_name), return_value))
+        if array:
+            out = np.array(out)
 
-    if func_name in ARRAY_OUTPUT_FUNCS:
-        out = np.array(out)
+        if status:
+            if success_internal is None:
+                success_internal = LTReturnCodeEnum.ltStatusSuccessInternal
+            if status != success_internal:
+                raise error.APIError(lt, status)
 
-    msg = "Processing return value of LTAPI function {}, status={}, out={}"
-    log.debug(msg.format(repr(func_name), status, out))
+        return out
 
-    if status and status != LTReturnCodeEnum.ltStatusSuccessInternal:
-        raise error.APIError(lt, status)
+    return process
 
-    return out
+
+def _get_tuple_output_method(lt, func_name):
+    """
+    Return a LightTools API method that doesn't convert its array-like
+    output value.
+
+    The returned method behaves like the (wrapped) API method, except
+    that an array-like output value is returned as it is received from
+    the COM server (i.e. as nested tuples), instead of being converted to
+    an ndarray.  This allows callers to convert the output value more
+    efficiently, e.g. into a preallocated ndarray.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+        func_name (str): The name of the LightTools API function.
+
+    Returns:
+        function: The method, bound to the LightTools session.
+    """
+    cls = lt.__class__
+    try:
+        method = _TUPLE_OUTPUT_METHODS[cls, func_name]
+    except KeyError:
+        func = inspect.unwrap(getattr(cls, func_name))
+        process = _make_return_value_processor(func_name, array=False)
+        method = _catch_return_value(func, process)
+        _TUPLE_OUTPUT_METHODS[cls, func_name] = method
+    return functools.partial(method, lt)
+
+
+def _raise_unexpected_return_value(func_name, return_value):
+    """
+    Raise an error for an unexpected LightTools API function return value.
+
+    Args:
+        func_name (str): The name of the LightTools API function.
+        return_value: The unprocessed return value of the function call.
+
+    Raises:
+        ValueError: Always.
+    """
+    msg = "Unexpected return value from LTAPI function {}: {}"
+    raise ValueError(msg.format(repr(func_name), return_value))
+
+
+def _enable_profiling(lt):
+    """
+    Enable profiling of API method calls for the given LightTools COM
+    object.
+
+    Add methods to collect call statistics of the LightTools API methods,
+    i.e. call counts and latencies, split into COM round trip and Python
+    side processing time, as well as the number of elements and bytes of
+    array output values.  Profiling is disabled by default.
+
+    - lt.enable_stats(enabled=True): Start (or stop) collecting call
+      statistics for the session.
+    - lt.stats(): Return the collected call statistics.
+    - lt.reset_stats(): Discard the collected call statistics.
+    - lt.profile(): Context manager that collects the call statistics of
+      a single block.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+    """
+    def enable_stats(self, enabled=True):
+        """
+        Start or stop collecting call statistics of the API methods.
+
+        Args:
+            enabled (bool, optional): True to start, False to stop
+                collecting call statistics.
+        """
+        profiler = self.__dict__.get("_profiler")
+        if profiler is None:
+            profiler = self.__dict__["_profiler"] = _profiling.Profiler()
+        if enabled:
+            profiler.enable()
+        else:
+            profiler.disable()
+
+    def stats(self):
+        """
+        Return the collected call statistics of the API methods.
+
+        Returns:
+            dict: A mapping of API method names to call statistics, sorted
+                by total time, descending.  The call statistics are a dict
+                with the number of 'calls' and 'errors', the 'total', 'com'
+                (COM round trip) and 'python' (return value processing)
+                time, the 'mean', 'p50', 'p90', 'p99' and 'max' latency
+                (all times in seconds), and the number of 'elements' and
+                'bytes' of array output values.
+
+        Examples:
+            >>> lt.enable_stats()
+            >>> ...
+            >>> import pandas as pd
+            >>> pd.DataFrame.from_dict(lt.stats(), orient="index")
+        """
+        profiler = self.__dict__.get("_profiler")
+        if profiler is None:
+            return {}
+        return profiler.stats()
+
+    def reset_stats(self):
+        """
+        Discard the collected call statistics of the API methods.
+        """
+        profiler = self.__dict__.get("_profiler")
+        if profiler is not None:
+            profiler.reset()
+
+    @contextlib.contextmanager
+    def profile(self):
+        """
+        Collect the call statistics of the API methods within a block.
+
+        The statistics of the block are also added to the statistics of
+        the session, if collecting is enabled for the session.
+
+        Yields:
+            Profiler: The profiler of the block.  Its stats() method
+                returns the call statistics of the block.
+
+        Examples:
+            >>> with lt.profile() as prof:
+            ...     lt.Cmd("BeginAllSimulations")
+            >>> prof.stats()["Cmd"]["total"]
+            12.4
+        """
+        outer = self.__dict__.get("_profiler")
+        profiler = self.__dict__["_profiler"] = _profiling.Profiler()
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+            if outer is None:
+                del self.__dict__["_profiler"]
+            else:
+                self.__dict__["_profiler"] = outer
+                if outer.enabled:
+                    outer.merge(profiler)
+
+    for func in (enable_stats, stats, reset_stats, profile):
+        setattr(lt.__class__, func.__name__, func)
 
 
 def _improve_dblist_interface(lt):
@@ -268,6 +612,7 @@ def _improve_dblist_interface(lt):
     Replace the default DbList() API method with a function that returns
     an enhanced DbList object.  The original DbList() API method can still
     be accessed from the object by using an underscore prefix (lt._DbList).
+    lt.dblist_count() returns the number of live server-side lists.
 
     Args:
         lt (ILTAPIx): A handle to the LightTools session.
@@ -288,12 +633,464 @@ def _improve_dblist_interface(lt):
     doc = lt.DbList.__func__.__doc__
     setattr(lt.__class__, "_DbList", lt.DbList.__func__)# must be __func__
 
-    def DbList(self, dataKey=pythoncom.Empty, filter=pythoncom.Empty, status=0):
-        return _dbaccess.DbList(self, dataKey, filter)
+    def DbList(self, dataKey=pythoncom.Empty, filter=pythoncom.Empty, status=0,
+               snapshot=False, index=False):
+        return _dbaccess.DbList(self, dataKey, filter, snapshot, index)
 
     DbList.__doc__ = doc
     setattr(lt.__class__, "DbList", DbList)
 
+    def dblist_count(self):
+        """
+        Return the number of server-side lists of the DbList objects.
+
+        A list is counted until it is deleted on the server, i.e. until
+        all DbList objects using it are deleted or garbage collected.
+        Lists of collected objects are deleted before counting.
+
+        Returns:
+            int: The number of live server-side lists.
+        """
+        registry = self.__dict__.get("_dblists")
+        if registry is None:
+            return 0
+        registry.purge(self)
+        return len(registry)
+
+    setattr(lt.__class__, "dblist_count", dblist_count)
+
+
+def _add_batched_dbget(lt):
+    """
+    Add a batched version of the DbGet() API method.
+
+    The DbGetMany() method gets the values of several data items for
+    several database items at once.  The function object of the original
+    DbGet() API method is resolved only once, and the values are read
+    without the per-call overhead of the API method wrapper (e.g. tracing
+    and profiling).
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+    """
+    # This function must be executed only once, in order to resolve the
+    # original DbGet() function (see _enable_deferred_writes).
+    if hasattr(lt, "DbGetMany"):
+        return
+
+    # Resolve the unwrapped DbGet() function and its return value
+    # processor only once.
+    dbget = inspect.unwrap(lt.DbGet.__func__)
+    process = _make_return_value_processor("DbGet")
+
+    def DbGetMany(self, dataKeys, dataNames, dtype=None):
+        """
+        Get the values of several data items for several database items.
+
+        Args:
+            dataKeys (iterable): The data keys of the database items, e.g.
+                a DbList object.
+            dataNames (iterable): The names of the data items.  Indexed
+                data items (e.g. Vertex_X_At) are given as (name, i)
+                tuples.
+            dtype (data-type, optional): The data type of the returned
+                array.  If not given, a float array is returned if all data
+                items are numeric, and a structured array otherwise.
+
+        Returns:
+            numpy.ndarray: A (len(dataKeys), len(dataNames)) array, or a
+                structured array of length len(dataKeys) with one field per
+                data item (named like the data item, with the index in
+                square brackets for indexed data items).
+
+        Raises:
+            APIError: If one of the values could not be read.
+
+        Examples:
+            >>> solids = lt.DbList("COMPONENTS[1]", "SOLID")
+            >>> lt.DbGetMany(solids, ["X", "Y", "Z"])
+            array([[ 0.,  0.,  0.],
+                   [ 5.,  0.,  0.],
+                   [10.,  0.,  0.]])
+            >>> lt.DbGetMany(solids, ["Name", "X"])
+            array([('Cube_1', 0.), ('Sphere_2', 5.), ('Cylinder_3', 10.)],
+                  dtype=[('Name', 'O'), ('X', '<f8')])
+        """
+        def get(dataKey, dataName, i):
+            if i is None:
+                return process(self, dbget(self, dataKey, dataName))
+            return process(self, dbget(self, dataKey, dataName, i=i))
+
+        # Values of deferred writes are served from the write buffer,
+        # and cached values from the DbGet() cache.
+        buffer = self.__dict__.get("_write_buffer")
+        cache = self.__dict__.get("_dbcache")
+        if buffer is not None or cache is not None:
+            get = functools.partial(_read_through, buffer, cache, get)
+        return _dbaccess.get_many(get, dataKeys, dataNames, dtype)
+
+    setattr(lt.__class__, "DbGetMany", DbGetMany)
+
+
+def _read_through(buffer, cache, get, dataKey, dataName, i):
+    """
+    Read a data item value from the write buffer, the cache or the
+    database (in that order).
+
+    Args:
+        buffer (WriteBuffer): The write buffer, or None.
+        cache (PropertyCache): The DbGet() cache, or None.
+        get (function): A function get(dataKey, dataName, i) that reads
+            the value from the database.
+        dataKey (str): The data key of the database item.
+        dataName (str): The name of the data item.
+        i (int): The index of an indexed data item, None otherwise.
+
+    Returns:
+        The value of the data item.
+    """
+    index = pythoncom.Empty if i is None else i
+    if buffer is not None:
+        value = buffer.get(dataKey, dataName, index, default=buffer)
+        if value is not buffer:
+            return value
+    if cache is None:
+        return get(dataKey, dataName, i)
+    value = cache.get(dataKey, dataName, index, default=cache)
+    if value is cache:
+        value = get(dataKey, dataName, i)
+        cache.put(dataKey, dataName, index, pythoncom.Empty, value)
+    return value
+
+
+def _enable_deferred_writes(lt):
+    """
+    Enable deferred writes to the database of the given LightTools COM
+    object.
+
+    Add the deferred_writes() context manager.  Within the context, the
+    values of DbSet() calls are held in a write buffer (see
+    _dbaccess.WriteBuffer) and are written to the database in one pass
+    when the context is left or the buffer is flushed explicitly.  DbGet()
+    and DbGetMany() calls return the buffered values.
+
+    Replace the default DbGet() and DbSet() API methods with functions
+    that use the write buffer and the DbGet() cache (see
+    _enable_property_cache).  The original API methods can still be
+    accessed from the object by using an underscore prefix (lt._DbGet,
+    lt._DbSet).
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+    """
+    # This function must be executed only once, in order to avoid that the
+    # original lt._DbGet() and lt._DbSet() functions get overwritten.
+    if hasattr(lt, "_DbSet"):
+        return
+
+    dbget_doc = lt.DbGet.__func__.__doc__
+    dbset_doc = lt.DbSet.__func__.__doc__
+    setattr(lt.__class__, "_DbGet", lt.DbGet.__func__)
+    setattr(lt.__class__, "_DbSet", lt.DbSet.__func__)
+
+    def DbGet(self, dataKey=pythoncom.Empty, dataName=pythoncom.Empty,
+              status=0, i=pythoncom.Empty, j=pythoncom.Empty):
+        buffer = self.__dict__.get("_write_buffer")
+        if buffer is not None:
+            value = buffer.get(dataKey, dataName, i, j, default=buffer)
+            if value is not buffer:
+                return value
+        cache = self.__dict__.get("_dbcache")
+        if cache is None:
+            return self._DbGet(dataKey, dataName, i=i, j=j)
+        value = cache.get(dataKey, dataName, i, j, default=cache)
+        if value is cache:
+            value = self._DbGet(dataKey, dataName, i=i, j=j)
+            cache.put(dataKey, dataName, i, j, value)
+        return value
+
+    def DbSet(self, dataKey=pythoncom.Empty, dataName=pythoncom.Empty,
+              dataValue=pythoncom.Empty, i=pythoncom.Empty, j=pythoncom.Empty):
+        buffer = self.__dict__.get("_write_buffer")
+        if buffer is not None:
+            return buffer.set(dataKey, dataName, dataValue, i, j)
+        return _write_through(self, dataKey, dataName, dataValue, i, j)
+
+    @contextlib.contextmanager
+    def deferred_writes(self):
+        """
+        Defer the DbSet() calls within a block.
+
+        Within the block, DbSet() calls are held in a write buffer.
+        Repeated writes to the same data item collapse to the last value.
+        All values are written in one pass when the block is left or when
+        the buffer is flushed explicitly.  If the block is left by an
+        exception, the values that are not flushed yet are discarded.
+        DbGet() and DbGetMany() return the buffered values as they were
+        passed to DbSet(), i.e. not converted by the database.  Other API
+        methods (e.g. Cmd) don't see them until they are written.
+
+        Nested use is possible, the values are then written when the
+        outermost block is left.
+
+        Yields:
+            WriteBuffer: The write buffer.  Its flush() method writes the
+                buffered values immediately, discard() drops them.
+
+        Examples:
+            >>> with lt.deferred_writes() as buffer:
+            ...     for x in range(10):
+            ...         lt.DbSet(key, "X", x)
+            ...     buffered = lt.DbGet(key, "X")
+            ...     buffer.flush()
+            ...     lt.Cmd("BeginAllSimulations")
+            >>> buffered, lt.DbGet(key, "X")
+            (9, 9.0)
+        """
+        buffer = self.__dict__.get("_write_buffer")
+        if buffer is not None:
+            yield buffer
+            return
+        buffer = _dbaccess.WriteBuffer(
+            functools.partial(_write_through, self)
+        )
+        self.__dict__["_write_buffer"] = buffer
+        try:
+            yield buffer
+        except BaseException:
+            buffer.discard()
+            raise
+        finally:
+            del self.__dict__["_write_buffer"]
+        buffer.flush()
+
+    DbGet.__doc__ = dbget_doc
+    DbSet.__doc__ = dbset_doc
+    setattr(lt.__class__, "DbGet", DbGet)
+    setattr(lt.__class__, "DbSet", DbSet)
+    setattr(lt.__class__, "deferred_writes", deferred_writes)
+
+
+def _write_through(lt, dataKey, dataName, dataValue, i, j):
+    """
+    Write a data item value to the database and invalidate the cached
+    values of the database item.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+        dataKey (str): The data key of the database item.
+        dataName (str): The name of the data item.
+        dataValue: The value of the data item.
+        i (int): The first index of an indexed data item (or
+            pythoncom.Empty).
+        j (int): The second index of an indexed data item (or
+            pythoncom.Empty).
+    """
+    try:
+        return lt._DbSet(dataKey, dataName, dataValue, i=i, j=j)
+    finally:
+        cache = lt.__dict__.get("_dbcache")
+        if cache is not None:
+            cache.invalidate(dataKey)
+
+
+def _enable_property_cache(lt):
+    """
+    Enable an optional cache for DbGet() calls of the given LightTools COM
+    object.
+
+    Add methods to control a least recently used cache for the values
+    returned by DbGet() (and DbGetMany()).  The cache is disabled by
+    default.
+
+    - lt.enable_cache(maxsize, scope): Enable the cache.
+    - lt.disable_cache(): Disable the cache and drop all cached values.
+    - lt.cache_info(): Return the number of cache hits and misses, the
+      maximum and the current cache size.
+    - lt.cache_clear(): Drop all cached values.
+
+    The API methods that modify the database (see MUTATING_FUNCS) are
+    wrapped, so that they invalidate the cached values.  Modifications
+    that are not made through the API (e.g. in the LightTools GUI) are
+    not detected.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+    """
+    # This function must be executed only once, in order to avoid that the
+    # API methods get wrapped multiple times.
+    if hasattr(lt, "enable_cache"):
+        return
+
+    for name, key_arg in MUTATING_FUNCS.items():
+        func = getattr(lt.__class__, name, None)
+        if func is not None:
+            setattr(lt.__class__, name, _invalidate_cache(func, key_arg))
+
+    def enable_cache(self, maxsize=config.CACHE_SIZE, scope="session"):
+        """
+        Enable the cache for DbGet() calls.
+
+        Args:
+            maxsize (int, optional): The maximum number of cached values.
+                The least recently used values are discarded first.
+            scope (str, optional): 'session' to invalidate all cached
+                values on any modification of the database (safe), 'key'
+                to invalidate only the cached values of the modified
+                database item on DbSet() and similar calls.  Cmd() calls
+                invalidate all cached values in both cases.
+
+        Examples:
+            >>> lt.enable_cache(scope="key")
+            >>> for i in range(100):
+            ...     lt.DbGet(meshkey, "X_Dimension")
+            >>> lt.cache_info()
+            CacheInfo(hits=99, misses=1, maxsize=10000, currsize=1)
+        """
+        self.__dict__["_dbcache"] = _dbaccess.PropertyCache(maxsize, scope)
+
+    def disable_cache(self):
+        """
+        Disable the cache for DbGet() calls and drop all cached values.
+        """
+        self.__dict__.pop("_dbcache", None)
+
+    def cache_info(self):
+        """
+        Return the statistics of the DbGet() cache.
+
+        Returns:
+            CacheInfo: The number of cache 'hits' and 'misses', the
+                'maxsize' and the current size ('currsize') of the cache,
+                or None if the cache is disabled.
+        """
+        cache = self.__dict__.get("_dbcache")
+        if cache is None:
+            return None
+        return cache.info()
+
+    def cache_clear(self):
+        """
+        Drop all values of the DbGet() cache.
+        """
+        cache = self.__dict__.get("_dbcache")
+        if cache is not None:
+            cache.clear()
+
+    for func in (enable_cache, disable_cache, cache_info, cache_clear):
+        setattr(lt.__class__, func.__name__, func)
+
+
+def _invalidate_cache(func, key_arg):
+    """
+    Invalidate the DbGet() cache after a LightTools API function call.
+
+    After an API function call that may modify any database item, new
+    DbList() requests no longer share existing server-side lists.
+
+    Args:
+        func (function): The function object of a (bound) LightTools
+            API method that modifies the database.
+        key_arg (str): The name of the argument that holds the key of the
+            modified database item, or None if the API method may modify
+            any database item.
+
+    Returns:
+        function: The wrapped function object.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            # New DbList() requests must not share lists that were created
+            # before an unspecific modification.
+            registry = self.__dict__.get("_dblists")
+            if registry is not None and key_arg is None:
+                registry.forget()
+            cache = self.__dict__.get("_dbcache")
+            if cache is not None:
+                key = None
+                if key_arg is not None:
+                    key = args[0] if args else kwargs.get(key_arg)
+                if key is None:
+                    cache.clear()
+                else:
+                    cache.invalidate(key)
+    return wrapper
+
+
+def _enable_bulk_edit(lt):
+    """
+    Enable bulk edits for the given LightTools COM object.
+
+    Add the bulk_edit() context manager that suspends database updates and
+    view redraws of LightTools within a block.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+    """
+    @contextlib.contextmanager
+    def bulk_edit(self):
+        """
+        Suspend database updates and view redraws within a block.
+
+        The block is enclosed by Begin() and End(), and the options in
+        BULK_EDIT_OPTIONS (automatic database update and view redraw) are
+        switched off.  When the block is left, also by an exception, the
+        previous option values are restored and the database is updated
+        once.
+
+        Nested use is possible (e.g. library code inside user code).  Only
+        the outermost block switches the options and updates the
+        database.
+
+        Examples:
+            >>> with lt.bulk_edit():
+            ...     for key, x in zip(keys, positions):
+            ...         lt.DbSet(key, "X", x)
+        """
+        depth = self.__dict__.get("_bulk_edit_depth", 0)
+        if depth:
+            self.__dict__["_bulk_edit_depth"] = depth + 1
+            try:
+                yield
+            finally:
+                self.__dict__["_bulk_edit_depth"] -= 1
+            return
+
+        # Only the options that were read are restored, and End() is only
+        # called after a successful Begin().
+        self.Begin()
+        options = {}
+        try:
+            for name in BULK_EDIT_OPTIONS:
+                try:
+                    options[name] = self.GetOption(name)
+                except error.APIError:
+                    # Option is not supported by this LightTools version.
+                    continue
+        except BaseException:
+            self.End()
+            raise
+
+        self.__dict__["_bulk_edit_depth"] = 1
+        try:
+            for name in options:
+                self.SetOption(name, 0)
+            yield
+        finally:
+            self.__dict__["_bulk_edit_depth"] = 0
+            try:
+                for name, value in options.items():
+                    self.SetOption(name, value)
+            finally:
+                self.End()
+            if options.get("DBUPDATE"):
+                self.Cmd(UPDATE_COMMAND)
+
+    setattr(lt.__class__, "bulk_edit", bulk_edit)
+
 
 def _fix_dbkeydump_argspec(lt):
     """
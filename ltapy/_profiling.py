@@ -0,0 +1,242 @@
+"""
+This module provides a profiler for LightTools API function calls.
+"""
+
+import random
+import weakref
+
+import numpy as np
+
+from . import config
+
+# The number of enabled profilers.  The wrapped API methods only take
+# the (slower) instrumented code path if at least one profiler is
+# enabled.
+_enabled = 0
+
+
+def _release():
+    """
+    Decrement the number of enabled profilers.
+
+    Called when a profiler is disabled or garbage collected while
+    enabled.
+    """
+    global _enabled
+    _enabled -= 1
+
+
+class MethodStats:
+
+    """
+    Accumulate the call statistics of a single LightTools API method.
+
+    The latencies of the calls are sampled (reservoir sampling) in order
+    to estimate percentiles with bounded memory, no matter how often the
+    API method is called.
+
+    Args:
+        sample_size (int): The maximum number of latency samples.
+    """
+
+    __slots__ = (
+        "calls", "errors", "com_time", "python_time", "max_time",
+        "elements", "nbytes", "samples", "sample_size",
+    )
+
+    def __init__(self, sample_size):
+        self.calls = 0
+        self.errors = 0
+        self.com_time = 0.0
+        self.python_time = 0.0
+        self.max_time = 0.0
+        self.elements = 0
+        self.nbytes = 0
+        self.samples = []
+        self.sample_size = sample_size
+
+    def add(self, com_time, python_time, out, failed):
+        """
+        Add a single API method call.
+
+        Args:
+            com_time (float): The duration of the COM round trip in
+                seconds.
+            python_time (float): The duration of the Python-side
+                processing of the return value in seconds.
+            out: The processed output value of the call.
+            failed (bool): True if the call raised an exception.
+        """
+        latency = com_time + python_time
+        self.calls += 1
+        self.com_time += com_time
+        self.python_time += python_time
+        if latency > self.max_time:
+            self.max_time = latency
+        if failed:
+            self.errors += 1
+        if isinstance(out, np.ndarray):
+            self.elements += out.size
+            self.nbytes += out.nbytes
+        if len(self.samples) < self.sample_size:
+            self.samples.append(latency)
+        else:
+            index = random.randrange(self.calls)
+            if index < self.sample_size:
+                self.samples[index] = latency
+
+    def merge(self, other):
+        """
+        Add the statistics of another MethodStats object.
+
+        Args:
+            other (MethodStats): The statistics to add.
+        """
+        calls = self.calls + other.calls
+        samples = self.samples + other.samples
+        if len(samples) > self.sample_size:
+            # Keep the samples representative for the merged calls by
+            # weighting them with the number of calls they stand for.
+            k = round(self.sample_size * self.calls / calls)
+            k = min(k, len(self.samples))
+            samples = (
+                random.sample(self.samples, k)
+                + random.sample(
+                    other.samples,
+                    min(self.sample_size - k, len(other.samples)),
+                )
+            )
+        self.calls = calls
+        self.errors += other.errors
+        self.com_time += other.com_time
+        self.python_time += other.python_time
+        self.max_time = max(self.max_time, other.max_time)
+        self.elements += other.elements
+        self.nbytes += other.nbytes
+        self.samples = samples
+
+    def summary(self):
+        """
+        Return a summary of the call statistics.
+
+        Returns:
+            dict: The number of 'calls' and 'errors', the 'total', 'com'
+                (COM round trip) and 'python' (return value processing)
+                time, the 'mean', 'p50', 'p90', 'p99' and 'max' latency
+                (all times in seconds), and the number of 'elements' and
+                'bytes' of array output values.
+        """
+        total = self.com_time + self.python_time
+        p50, p90, p99 = (
+            float(p) for p in np.percentile(self.samples, [50, 90, 99])
+        )
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total": total,
+            "com": self.com_time,
+            "python": self.python_time,
+            "mean": total / self.calls,
+            "p50": p50,
+            "p90": p90,
+            "p99": p99,
+            "max": self.max_time,
+            "elements": self.elements,
+            "bytes": self.nbytes,
+        }
+
+
+class Profiler:
+
+    """
+    Collect call statistics for each LightTools API method.
+
+    Args:
+        sample_size (int, optional): The maximum number of latency samples
+            per API method that are kept for the percentile estimates.
+    """
+
+    def __init__(self, sample_size=config.STATS_SAMPLE_SIZE):
+        self._sample_size = sample_size
+        self._methods = {}
+        # Releases the count of the enabled profiler, also if it is
+        # garbage collected without being disabled.
+        self._finalizer = None
+
+    @property
+    def enabled(self):
+        """
+        bool: True if the profiler collects call statistics.
+        """
+        return self._finalizer is not None
+
+    def enable(self):
+        """
+        Start collecting call statistics.
+        """
+        global _enabled
+        if self._finalizer is None:
+            _enabled += 1
+            self._finalizer = weakref.finalize(self, _release)
+
+    def disable(self):
+        """
+        Stop collecting call statistics.
+        """
+        if self._finalizer is not None:
+            self._finalizer()
+            self._finalizer = None
+
+    def record(self, name, com_time, python_time, out, failed):
+        """
+        Record a single LightTools API method call.
+
+        Args:
+            name (str): The name of the LightTools API method.
+            com_time (float): The duration of the COM round trip in
+                seconds.
+            python_time (float): The duration of the Python-side
+                processing of the return value in seconds.
+            out: The processed output value of the call.
+            failed (bool): True if the call raised an exception.
+        """
+        try:
+            stats = self._methods[name]
+        except KeyError:
+            stats = self._methods[name] = MethodStats(self._sample_size)
+        stats.add(com_time, python_time, out, failed)
+
+    def merge(self, other):
+        """
+        Add the call statistics of another profiler.
+
+        Args:
+            other (Profiler): The profiler whose statistics are added.
+        """
+        for name, stats in other._methods.items():
+            try:
+                self._methods[name].merge(stats)
+            except KeyError:
+                self._methods[name] = MethodStats(self._sample_size)
+                self._methods[name].merge(stats)
+
+    def stats(self):
+        """
+        Return the call statistics of all called API methods.
+
+        Returns:
+            dict: A mapping of API method names to call statistics (see
+                MethodStats.summary), sorted by total time, descending.
+        """
+        summaries = {
+            name: stats.summary() for name, stats in self._methods.items()
+        }
+        return dict(sorted(
+            summaries.items(), key=lambda item: item[1]["total"], reverse=True
+        ))
+
+    def reset(self):
+        """
+        Discard all call statistics.
+        """
+        self._methods.clear()
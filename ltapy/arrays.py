@@ -0,0 +1,268 @@
+"""
+This module provides array-native access to LightTools array data.
+
+The LightTools API functions with array-like output (e.g. GetMeshData)
+require the caller to pass an output buffer that describes the shape of
+the requested data, typically created as ``np.empty(shape).tolist()``.
+This builds one Python float per array element just to describe the
+shape.  Furthermore, the nested tuples returned by the COM server are
+converted with ``np.array``.
+
+The functions in this module only take a shape, or look it up in the
+LightTools database, and return a float64 ndarray.  The data can be
+written into a preallocated float64 ndarray (`out` argument), which can
+be reused across loop iterations.  Its shape is checked against the
+shape of the data.
+
+Examples:
+    Get the data of an intensity mesh:
+
+    >>> import ltapy.arrays
+    >>> data = ltapy.arrays.get_mesh_data(lt, meshkey)
+    >>> data.shape
+    (101, 51)
+
+    Reuse the output array in a loop:
+
+    >>> data = None
+    >>> for x in positions:
+    ...     lt.DbSet(srckey, "X", x)
+    ...     lt.Cmd("BeginAllSimulations")
+    ...     data = ltapy.arrays.get_mesh_data(lt, meshkey, out=data)
+"""
+
+import numpy as np
+
+from . import _ltapi
+from . import error
+
+
+def get_mesh_data(lt, meshkey, cellfilter=None, out=None):
+    """
+    Return the cell values of a mesh.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+        meshkey (str): The data key of the mesh.
+        cellfilter (str, optional): The cell filter, e.g. 'Target'.  The
+            default cell filter of GetMeshData is used if not given.
+        out (numpy.ndarray, optional): A (X_Dimension, Y_Dimension)
+            float64 array to write the data into.
+
+    Returns:
+        numpy.ndarray: The cell values, a (X_Dimension, Y_Dimension)
+            array.
+
+    Raises:
+        ValueError: If `out` doesn't match the mesh dimensions.
+    """
+    shape = (
+        int(lt.DbGet(meshkey, "X_Dimension")),
+        int(lt.DbGet(meshkey, "Y_Dimension")),
+    )
+    kwargs = {}
+    if cellfilter is not None:
+        kwargs["cellFilter"] = cellfilter
+    return _get_array(
+        lt, "GetMeshData", shape, out,
+        meshKey=meshkey, dataArray=_make_dummy(shape), **kwargs
+    )
+
+
+def get_freeform_surface_points(lt, surfacekey, out=None):
+    """
+    Return the points of a freeform surface.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+        surfacekey (str): The data key of the freeform surface.
+        out (numpy.ndarray, optional): A (NumPointsInU, NumPointsInV, 3)
+            float64 array to write the data into.
+
+    Returns:
+        numpy.ndarray: The surface points, a (NumPointsInU, NumPointsInV,
+            3) array.
+
+    Raises:
+        ValueError: If `out` doesn't match the number of points.
+    """
+    shape = _get_uv_shape(lt, surfacekey) + (3,)
+    return _get_array(
+        lt, "GetFreeformSurfacePoints", shape, out,
+        surfaceKey=surfacekey, surfacePoints=_make_dummy(shape),
+    )
+
+
+def get_spline_data(lt, surfkey, shape=None, out=None):
+    """
+    Return the points of a spline patch or spline sweep surface.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+        surfkey (str): The data key of the spline surface.
+        shape (tuple, optional): The shape of the data, e.g. (numPoints, 2)
+            for a spline sweep surface.  For a spline patch surface, the
+            shape (NumPointsInU, NumPointsInV, 3) is looked up in the
+            database if not given.
+        out (numpy.ndarray, optional): A float64 array to write the data
+            into.  It gives the shape of a spline sweep surface if
+            `shape` is not given.
+
+    Returns:
+        numpy.ndarray: The spline points.
+
+    Raises:
+        ValueError: If the shape of a spline sweep surface is not given,
+            or if `out` doesn't match the shape.
+    """
+    if shape is None:
+        try:
+            shape = _get_uv_shape(lt, surfkey) + (3,)
+        except error.APIError:
+            if out is None:
+                msg = "Couldn't look up the shape of {!r}, please specify it."
+                raise ValueError(msg.format(surfkey))
+            shape = out.shape
+    return _get_array(
+        lt, "GetSplineData", tuple(shape), out,
+        surfKey=surfkey, dataArray=_make_dummy(shape),
+    )
+
+
+def get_swept_profile_points(lt, profilekey, out=None):
+    """
+    Return the profile points of a swept primitive.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+        profilekey (str): The data key of the swept primitive.
+        out (numpy.ndarray, optional): A (NumPoints, 2) float64 array to
+            write the data into.
+
+    Returns:
+        numpy.ndarray: The profile points, a (NumPoints, 2) array.
+
+    Raises:
+        ValueError: If `out` doesn't match the number of points.
+    """
+    shape = (int(lt.DbGet(profilekey, "NumPoints")), 2)
+    return _get_array(
+        lt, "GetSweptProfilePoints", shape, out,
+        profileKey=profilekey, profilePoints=_make_dummy(shape),
+    )
+
+
+def get_receiver_ray_data(lt, receiverkey, descriptors, numrays,
+                          start=1, out=None):
+    """
+    Return the ray data of a receiver.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+        receiverkey (str): The data key of the receiver (simulation
+            function).
+        descriptors (list): The ray data descriptors, e.g. ['RayDataX',
+            'RayDataY'].
+        numrays (int): The number of rays.
+        start (int, optional): The (1-based) number of the first ray.
+        out (numpy.ndarray, optional): A (numrays, len(descriptors))
+            float64 array to write the data into.
+
+    Returns:
+        numpy.ndarray: The ray data, a (numrays, len(descriptors)) array.
+
+    Raises:
+        ValueError: If `out` doesn't match the shape of the ray data.
+    """
+    shape = (numrays, len(descriptors))
+    return _get_array(
+        lt, "GetReceiverRayData", shape, out,
+        receiverKey=receiverkey,
+        dataDescriptors=list(descriptors),
+        data=_make_dummy(shape),
+        startingRay=start,
+        numberOfRays=numrays,
+    )
+
+
+def _get_uv_shape(lt, surfkey):
+    """
+    Return the number of points in U and V direction of a surface.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+        surfkey (str): The data key of the surface.
+
+    Returns:
+        tuple: The (NumPointsInU, NumPointsInV) tuple.
+    """
+    return (
+        int(lt.DbGet(surfkey, "NumPointsInU")),
+        int(lt.DbGet(surfkey, "NumPointsInV")),
+    )
+
+
+def _make_dummy(shape):
+    """
+    Return a nested list of the given shape for an output buffer argument.
+
+    The API functions only need the shape of the output buffer argument.
+    All rows of the returned list are the same object, so only
+    sum(shape) list items are created instead of prod(shape) floats.
+
+    Args:
+        shape (tuple): The shape of the output buffer.
+
+    Returns:
+        list: A nested list of zeros.
+    """
+    item = 0.0
+    for size in reversed(shape):
+        item = [item] * size
+    return item
+
+
+def _get_array(lt, func_name, shape, out, **kwargs):
+    """
+    Call a LightTools API function and return the array-like output value
+    as ndarray.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+        func_name (str): The name of the LightTools API function.
+        shape (tuple): The shape of the output value.
+        out (numpy.ndarray): An array to write the output value into, or
+            None to create a new float64 array.
+        **kwargs: The arguments of the API function call.
+
+    Returns:
+        numpy.ndarray: The output value.
+
+    Raises:
+        ValueError: If the shape of `out` or of the output value doesn't
+            match `shape`, or if `out` isn't a float64 array.
+    """
+    shape = tuple(int(size) for size in shape)
+    if out is None:
+        out = np.empty(shape, dtype=np.float64)
+    elif out.shape != shape:
+        msg = "Output array has shape {}, expected {}."
+        raise ValueError(msg.format(out.shape, shape))
+    elif out.dtype != np.float64:
+        msg = "Output array has dtype {}, expected float64."
+        raise ValueError(msg.format(out.dtype))
+
+    func = _ltapi._get_tuple_output_method(lt, func_name)
+    data = func(**kwargs)
+
+    if len(data) != shape[0]:
+        msg = "{} returned {} rows, expected {}."
+        raise ValueError(msg.format(func_name, len(data), shape[0]))
+    if out.ndim == 1:
+        out[:] = data
+    else:
+        # Convert row by row, in order to avoid a temporary array of the
+        # full size.
+        for row, values in enumerate(data):
+            out[row] = values
+    return out
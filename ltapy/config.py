@@ -12,6 +12,51 @@ TIMEOUT = 60
 #: Default version of the JumpStart macro function library.
 JS_VERSION = "LTCOM64.JSNET"
 
+#: Default number of LightTools API function calls that are recorded if
+#: tracing is enabled (see ltapy.tracing).
+TRACE_SIZE = 1000
+
+#: Maximum number of latency samples per LightTools API method that are
+#: kept by the profiler for the percentile estimates.
+STATS_SAMPLE_SIZE = 10000
+
+#: Default number of keys that are fetched at once when iterating over a
+#: DbList object.
+DBLIST_CHUNK_SIZE = 100
+
+#: Default maximum number of data item values held by the DbGet() cache
+#: (see lt.enable_cache).
+CACHE_SIZE = 10000
+
+#: Default number of rays that are read at once from a receiver (see
+#: ltapy.raydata).
+RAY_CHUNK_SIZE = 100000
+
+#: Default number of completed parameter points after which the
+#: checkpoint file of a sweep is updated (see ltapy.sweep).
+SWEEP_CHECKPOINT_INTERVAL = 10
+
+#: Default number of consecutive parameter points of a sweep that are
+#: run as one job of a session pool.
+SWEEP_CHUNK_SIZE = 10
+
+#: Default maximum size in bytes of the simulation result cache (see
+#: ltapy.resultcache).
+RESULT_CACHE_SIZE = 1 << 30
+
+#: CPU usage in percent above which a LightTools session is considered
+#: busy (see ltapy.inventory).
+BUSY_CPU_PERCENT = 5.0
+
+#: Minimum time in seconds between two queries of the current file folder
+#: of an idle LightTools session (see ltapy.inventory).
+INVENTORY_PROBE_INTERVAL = 5.0
+
+#: Minimum time in seconds between two searches for new LightTools
+#: processes (see ltapy.inventory).  In between, only the known processes
+#: are checked.
+INVENTORY_SCAN_INTERVAL = 2.0
+
 # Default logging configuration for LightTools.
 _LOGGING = {
     "version": 1,
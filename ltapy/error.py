@@ -24,14 +24,23 @@ class APIError(LightToolsError):
     Args:
         ltapi (ILTAPIx): Handle to the LightTools session.
         status (int): Status code of the LightTools API function call.
+
+    Attributes:
+        trace (list): The records of the most recent LightTools API
+            function calls (see ltapy.tracing.dump), if tracing is
+            enabled, None otherwise.
     """
 
     def __init__(self, ltapi, status):
         self.ltapi = ltapi
         self.status = status
+        self.trace = None
+        self._message = None
 
     def __str__(self):
+        if self._message is None:
+            self._message = self.ltapi.GetStatusString(self.status)
         return "[{status}] {message}".format(
             status=str(self.status),
-            message=self.ltapi.GetStatusString(self.status),
+            message=self._message,
         )
@@ -0,0 +1,317 @@
+"""
+This module provides a cached inventory of the LightTools sessions on
+the host.
+
+A snapshot lists each LightTools session with its process ID, version,
+current file folder, CPU usage, memory usage and whether it is busy.
+Taking a snapshot is cheap enough to be polled every second:
+
+- The processes are found with psutil.  All processes of the host are
+  enumerated only every few seconds, in between only the known
+  LightTools processes are checked.  The Running Object Table is only
+  scanned again if LightTools processes appeared or disappeared.
+- The version and the current file folder are queried by a background
+  thread per session, so a session in the middle of a long simulation
+  doesn't block the snapshot.  The snapshot reports the last known
+  values.  The thread also binds the COM object of the session, which
+  may block as well.  If the thread fails, e.g. because the session
+  couldn't be bound, it is started again on a later snapshot.
+- A session is busy if its CPU usage since the previous snapshot exceeds
+  a threshold, or if it didn't answer the last query within a short
+  time.
+
+Examples:
+    >>> import ltapy.inventory
+    >>> with ltapy.inventory.SessionInventory() as inventory:
+    ...     for info in inventory.snapshot():
+    ...         print(info.pid, info.version, info.busy)
+    1912 8.5.0 False
+    6940 8.5.0 True
+"""
+
+import collections
+import logging
+import threading
+import time
+
+import psutil
+import pythoncom
+
+from . import _comutils
+from . import _ltapi
+from . import config
+from . import session
+from . import utils
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+# Name of the LightTools executable, used to find the processes.
+PROCESS_NAME = "lt.exe"
+
+# The time in seconds a session may take to answer a query before it is
+# considered busy.
+_PROBE_TIMEOUT = 1.0
+
+
+#: Information about a LightTools session, see SessionInventory.snapshot().
+SessionInfo = collections.namedtuple(
+    "SessionInfo",
+    ["pid", "version", "file_folder", "cpu_percent", "rss", "busy"],
+)
+
+
+class SessionInventory:
+
+    """
+    A cached view of all LightTools sessions on the host.
+
+    Args:
+        busy_threshold (float, optional): The CPU usage in percent above
+            which a session is considered busy.
+        probe_interval (float, optional): The minimum time in seconds
+            between two queries of the current file folder of a session.
+        scan_interval (float, optional): The minimum time in seconds
+            between two searches for new LightTools processes.
+
+    Examples:
+        Find an idle session:
+
+        >>> inventory = SessionInventory()
+        >>> idle = [info.pid for info in inventory.snapshot()
+        ...         if not info.busy]
+        >>> inventory.close()
+    """
+
+    def __init__(self, busy_threshold=config.BUSY_CPU_PERCENT,
+                 probe_interval=config.INVENTORY_PROBE_INTERVAL,
+                 scan_interval=config.INVENTORY_SCAN_INTERVAL):
+        self.busy_threshold = busy_threshold
+        self.probe_interval = probe_interval
+        self.scan_interval = scan_interval
+        self._procs = {}
+        self._probes = {}
+        self._last_scan = None
+        self._last_search = None
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """
+        Return information about all LightTools sessions.
+
+        Processes that are not (yet) listed in the Running Object Table
+        are left out.  The version and file folder of a session are None
+        until its first query was answered.
+
+        Returns:
+            list: A SessionInfo tuple for each session, ordered by
+                process ID.
+        """
+        with self._lock:
+            # Failed probes are replaced by the next scan.
+            for pid, probe in list(self._probes.items()):
+                if probe.dead:
+                    del self._probes[pid]
+            procs = self._update_processes()
+            if set(procs) != set(self._procs) or self._needs_rescan():
+                self._rescan(procs)
+
+            infos = []
+            for pid, probe in sorted(self._probes.items()):
+                proc = self._procs[pid]
+                try:
+                    with proc.oneshot():
+                        cpu_percent = proc.cpu_percent(None)
+                        rss = proc.memory_info().rss
+                except psutil.NoSuchProcess:
+                    continue
+                busy = (
+                    cpu_percent > self.busy_threshold
+                    or probe.pending() > _PROBE_TIMEOUT
+                )
+                if not busy:
+                    probe.request(self.probe_interval)
+                infos.append(SessionInfo(
+                    pid, probe.version, probe.file_folder, cpu_percent, rss,
+                    busy,
+                ))
+            return infos
+
+    def close(self):
+        """
+        Stop the background queries of all sessions.
+        """
+        with self._lock:
+            for probe in self._probes.values():
+                probe.stop()
+            self._probes.clear()
+            self._procs.clear()
+            self._last_search = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _update_processes(self):
+        """
+        Return the running LightTools processes.
+
+        Search for new processes if the last search is long enough ago,
+        otherwise only check that the known processes are still running.
+
+        Returns:
+            dict: A mapping of process IDs to psutil.Process objects.
+        """
+        now = time.time()
+        if (self._last_search is not None
+                and now - self._last_search < self.scan_interval):
+            return {
+                pid: proc for pid, proc in self._procs.items()
+                if proc.is_running()
+            }
+        self._last_search = now
+        procs = _find_processes()
+        for pid, proc in procs.items():
+            if pid in self._procs:
+                # Keep the object, it holds the CPU times of the previous
+                # snapshot.
+                procs[pid] = self._procs[pid]
+                continue
+            # The first call returns 0.0 and starts the measurement.
+            try:
+                proc.cpu_percent(None)
+            except psutil.NoSuchProcess:
+                pass
+        return procs
+
+    def _needs_rescan(self):
+        """
+        Check if processes wait for their registration in the Running
+        Object Table, and the last scan is long enough ago.
+        """
+        return (
+            len(self._probes) < len(self._procs)
+            and time.time() - self._last_scan > self.probe_interval
+        )
+
+    def _rescan(self, procs):
+        """
+        Scan the Running Object Table and update the session probes.
+
+        Args:
+            procs (dict): A mapping of process IDs to the psutil.Process
+                objects of the LightTools processes.
+        """
+        for pid in set(self._probes) - set(procs):
+            self._probes.pop(pid).stop()
+        self._procs = procs
+        self._last_scan = time.time()
+        if set(self._probes) == set(procs):
+            return
+
+        # The objects are bound by the probes, binding may block until a
+        # busy session answers.
+        rot = _comutils.RunningObjectTable()
+        for name in rot.find_names(session.ROT_PREFIX):
+            try:
+                pid = int(name[len(session.ROT_PREFIX):])
+            except ValueError:
+                continue
+            if pid in procs and pid not in self._probes:
+                self._probes[pid] = _Probe(pid, name)
+
+
+class _Probe:
+
+    """
+    Query the version and the current file folder of a LightTools session
+    on a background thread.
+
+    Args:
+        pid (int): The process ID of the session.
+        name (str): The moniker name of the session in the Running Object
+            Table.
+    """
+
+    def __init__(self, pid, name):
+        self.pid = pid
+        self.version = None
+        self.file_folder = None
+        self._last = None
+        self._started = time.time()
+        self._stopped = False
+        self.dead = False
+        self._event = threading.Event()
+        self._event.set()
+        thread = threading.Thread(
+            target=self._work, args=(name,), daemon=True
+        )
+        thread.start()
+
+    def request(self, interval):
+        """
+        Request a query if no query is pending and the last one is older
+        than `interval` seconds.
+        """
+        now = time.time()
+        if self._started is None and now - self._last >= interval:
+            self._started = now
+            self._event.set()
+
+    def pending(self):
+        """
+        Return the time in seconds the pending query is waiting for an
+        answer, 0 if no query is pending.
+        """
+        started = self._started
+        return time.time() - started if started is not None else 0.0
+
+    def stop(self):
+        self._stopped = True
+        self._event.set()
+
+    def _work(self, name):
+        pythoncom.CoInitialize()
+        lt = comobj = None
+        try:
+            comobj = _comutils.RunningObjectTable().get_object(name)
+            lt = _ltapi.LTAPI(comobj)
+            while True:
+                self._event.wait()
+                self._event.clear()
+                if self._stopped:
+                    break
+                if self.version is None:
+                    self.version = lt.Version(0)
+                self.file_folder = utils.get_current_file_folder(lt)
+                self._last = time.time()
+                self._started = None
+        except Exception:
+            # The session may have been closed, or couldn't be bound yet.
+            # The inventory starts a new probe if the process still runs.
+            log.warning(
+                "Query of LightTools session %d failed.", self.pid,
+                exc_info=True,
+            )
+            self.dead = True
+        finally:
+            # Release the COM objects before COM is uninitialized.
+            lt = comobj = None
+            pythoncom.CoUninitialize()
+
+
+def _find_processes():
+    """
+    Return the running LightTools processes.
+
+    Returns:
+        dict: A mapping of process IDs to psutil.Process objects.
+    """
+    procs = {}
+    for proc in psutil.process_iter(["name"]):
+        name = proc.info["name"]
+        if name and name.lower() == PROCESS_NAME:
+            procs[proc.pid] = proc
+    return procs
@@ -1,7 +1,24 @@
 """
 This module provides access to the JumpStart macro function library.
+
+The library object `js` is created on first use, so importing this
+module is cheap.  Existing MakePy support files are reused as long as
+they match the version of the JumpStart type library.
+
+Examples:
+    The JumpStart COM object is created by the first attribute access:
+
+    >>> from ltapy.jslib import js
+    >>> js
+    <lazy JumpStart library 'LTCOM64.JSNET'>
+
+    Regenerate the MakePy support files explicitly:
+
+    >>> js.rebuild()
 """
 
+import threading
+
 import pythoncom
 import win32com.client
 
@@ -39,49 +56,71 @@ def _ensure_makepy_support(progid, rebuild=False):
         rebuild (bool): Wether to regenerate the Python source code
             (MakePy support) for the corresponding COM type library.
     """
-    try:
-        # Get the JumpStart library object that is associated with the given
-        # ProgID. If MakePy support is already available an early-bound
-        # (static dispatch) COM object will be generated, a late-bound
-        # (dynamic dispatch) COM object otherwise. NOTE: No support files are
-        # generated at this step!
-        jslib = win32com.client.Dispatch(progid)
-    except NameError:
-        # This exception is raised if support files are available but
-        # incorrect ("name 'nan' is not defined" error due to a bug in
-        # MakePy). Rebuilding of the support files is necessary! The IDispatch
-        # interface (needed for rebuilding) is queried from a late-bound
-        # (dynamic dispatch) JumpStart library object. This makes sure that
-        # the incorrect support files are not used for object creation.
-        rebuild = True
-        jslib = win32com.client.dynamic.Dispatch(progid)
-        idispatch = jslib._oleobj_.QueryInterface(pythoncom.IID_IDispatch)
-    else:
-        # Update the IDispatch interface because the generated JumpStart
-        # library object might already be an early-bound COM automation
-        # object. Generation of MakePy support is not necessary in this case.
-        idispatch = jslib._oleobj_.QueryInterface(pythoncom.IID_IDispatch)
-
-    # Only generate the support files and load the module if explicitly
-    # required (rebuild=True) or if the JumpStart library object is a
-    # late-bound (dynamic dispatch) COM object.
-    if rebuild or _comutils.is_dynamic_dispatch(idispatch):
-        try:
-            _comutils.generate_typelib_support(idispatch)
-        except NameError:
-            # Fix "name 'nan' is not defined" NameError exception and add the
-            # module to the cache.
-            srcfile = _comutils.get_generated_filepath(idispatch)
-            with open(srcfile, "r+") as f:
-                data = f.read()
-                f.seek(0)
-                f.write(data.replace("=nan", "=defaultNamedNotOptArg"))
-            typelib = _comutils.get_typelib(idispatch)
-            clsid, lcid, _, major, minor, _ = typelib.GetLibAttr()
-            win32com.client.gencache.AddModuleToCache(
-                clsid, lcid, major, minor
-            )
-
-
-#: A global, single instance of the JumpStart macro function library.
-js = _JSLIB(rebuild=True)
+    # Query the IDispatch interface from a late-bound (dynamic dispatch)
+    # JumpStart library object.  This makes sure that no (possibly
+    # incorrect) support files are used before they are checked.
+    jslib = win32com.client.dynamic.Dispatch(progid)
+    idispatch = jslib._oleobj_.QueryInterface(pythoncom.IID_IDispatch)
+
+    # Support files are only generated if explicitly required
+    # (rebuild=True), or if no valid support files exist for the version
+    # of the type library.
+    _comutils.ensure_typelib_support(idispatch, rebuild)
+
+
+class _LazyJSLIB:
+
+    """
+    A proxy for the JumpStart macro function library object.
+
+    The COM object is created on first attribute access (see _JSLIB), all
+    attribute access is forwarded to it.
+
+    Args:
+        progid (str): The ProgID for the JumpStart COM object.
+    """
+
+    def __init__(self, progid=config.JS_VERSION):
+        self.__dict__["_progid"] = progid
+        self.__dict__["_jslib"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def _get(self, rebuild=False):
+        """
+        Return the JumpStart library object, create it if necessary.
+
+        Args:
+            rebuild (bool): Wether to regenerate the Python source code
+                (MakePy support) and recreate the object.
+
+        Returns:
+            jslib (JSNET): A handle to the JumpStart macro function
+                library.
+        """
+        with self._lock:
+            if self._jslib is None or rebuild:
+                self.__dict__["_jslib"] = _JSLIB(self._progid, rebuild)
+            return self._jslib
+
+    def rebuild(self):
+        """
+        Regenerate the MakePy support files and recreate the JumpStart
+        library object.
+        """
+        self._get(rebuild=True)
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._get(), name, value)
+
+    def __repr__(self):
+        if self._jslib is None:
+            return "<lazy JumpStart library {!r}>".format(self._progid)
+        return repr(self._jslib)
+
+
+#: A global, single instance of the JumpStart macro function library,
+#: created on first use.
+js = _LazyJSLIB()
@@ -0,0 +1,396 @@
+"""
+This module provides access to the ray data of LightTools receivers.
+
+Receivers can hold far more rays than fit into memory at once.  The
+ray data is therefore read in chunks of a fixed number of rays, so that
+the memory usage is bounded by the chunk size.
+
+Examples:
+    Compute the mean wavelength of all rays of a receiver:
+
+    >>> import ltapy.raydata
+    >>> total = count = 0
+    >>> for rays in ltapy.raydata.iter_receiver_rays(
+    ...         lt, fwskey, ["RayDataX", "RayDataWavelength"]):
+    ...     total += rays["RayDataWavelength"].sum()
+    ...     count += len(rays)
+    >>> total / count
+    550.0
+
+    Export the ray data to disk, in order to analyze it later without
+    LightTools:
+
+    >>> ltapy.raydata.export_receiver_rays(
+    ...     lt, fwskey, ["RayDataX", "RayDataY"], "rays")
+    >>> rays = ltapy.raydata.RayDataset("rays")
+    >>> len(rays)
+    1000000
+    >>> rays["RayDataX"].mean()
+    0.0132
+"""
+
+import json
+import os
+import queue
+import struct
+import threading
+
+import numpy as np
+import pythoncom
+
+from . import _comutils
+from . import _ltapi
+from . import arrays
+from . import config
+
+# Data item of a receiver (simulation function) that holds the number of
+# saved rays.
+NUM_RAYS_FIELD = "NumberOfSavedRays"
+
+# Name of the manifest file of a ray dataset.
+MANIFEST = "manifest.json"
+
+# Size of the header of the .npy files of a ray dataset.  The header has
+# a fixed size, so that it can be updated in place when rays are
+# appended.
+_NPY_HEADER_SIZE = 128
+
+
+def iter_receiver_rays(lt, receiverkey, descriptors,
+                       chunk_size=config.RAY_CHUNK_SIZE, numrays=None,
+                       prefetch=False):
+    """
+    Iterate over the ray data of a receiver in chunks.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+        receiverkey (str): The data key of the receiver (simulation
+            function).
+        descriptors (list): The ray data descriptors, e.g. ['RayDataX',
+            'RayDataY'].
+        chunk_size (int, optional): The maximum number of rays per chunk.
+        numrays (int, optional): The number of rays to read.  All saved
+            rays (see NUM_RAYS_FIELD) are read if not given.
+        prefetch (bool, optional): Wether to read the next chunk in a
+            background thread while the current chunk is processed.
+
+    Yields:
+        numpy.ndarray: A structured array with one float64 field per ray
+            data descriptor, and one element per ray.
+    """
+    if numrays is None:
+        numrays = int(lt.DbGet(receiverkey, NUM_RAYS_FIELD))
+    descriptors = list(descriptors)
+    dtype = np.dtype([(name, np.float64) for name in descriptors])
+
+    def fetch(lt, start):
+        count = min(chunk_size, numrays - start + 1)
+        data = arrays.get_receiver_ray_data(
+            lt, receiverkey, descriptors, count, start
+        )
+        # The (count, len(descriptors)) float64 array has the memory
+        # layout of the structured array, no copy is needed.
+        return data.view(dtype).reshape(count)
+
+    starts = range(1, numrays + 1, chunk_size)
+    if prefetch:
+        yield from _iter_prefetched(lt, fetch, starts)
+    else:
+        for start in starts:
+            yield fetch(lt, start)
+
+
+def _iter_prefetched(lt, fetch, starts):
+    """
+    Call fetch() for all starts in a background thread, one call ahead of
+    the consumer.
+
+    The background thread uses its own handle to the LightTools session,
+    because COM objects must not be shared between threads.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+        fetch (function): A function fetch(lt, start) that returns a
+            chunk of data.
+        starts (iterable): The start values of the chunks.
+
+    Yields:
+        The chunks of data, in the order of `starts`.
+    """
+    stream = _comutils.marshal_interface(lt._oleobj_)
+    results = queue.Queue(maxsize=1)
+    stop = threading.Event()
+
+    def put(item):
+        # Don't block forever if the consumer has stopped.
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            return True
+        return False
+
+    def produce():
+        pythoncom.CoInitialize()
+        worker_lt = None
+        try:
+            worker_lt = _ltapi.LTAPI(_comutils.unmarshal_interface(stream))
+            for start in starts:
+                if not put((fetch(worker_lt, start), None)):
+                    return
+            put((None, None))
+        except Exception as e:
+            put((None, e))
+        finally:
+            # Release the COM object before COM is uninitialized.
+            worker_lt = None
+            pythoncom.CoUninitialize()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            chunk, exc = results.get()
+            if exc is not None:
+                raise exc
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        stop.set()
+        thread.join()
+
+
+def export_receiver_rays(lt, receiverkey, descriptors, path,
+                         chunk_size=config.RAY_CHUNK_SIZE, numrays=None,
+                         append=False, prefetch=False):
+    """
+    Export the ray data of a receiver to an on-disk dataset.
+
+    The dataset is a directory with one .npy file per ray data descriptor
+    (column) and a JSON manifest.  The ray data is streamed to the files
+    in chunks, so the memory usage is bounded by the chunk size.
+
+    An existing dataset that is replaced stays intact until the export is
+    complete: the new columns are written to temporary files, which
+    replace the columns of the existing dataset at the end.  Columns of
+    the existing dataset that are not exported again are removed.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+        receiverkey (str): The data key of the receiver (simulation
+            function).
+        descriptors (list): The ray data descriptors, e.g. ['RayDataX',
+            'RayDataY'].
+        path (str): The directory of the dataset.
+        chunk_size (int, optional): The maximum number of rays per chunk.
+        numrays (int, optional): The number of rays to export.  All saved
+            rays are exported if not given.
+        append (bool, optional): Wether to append the rays to an existing
+            dataset (with the same descriptors).  An existing dataset is
+            replaced otherwise.
+        prefetch (bool, optional): Wether to read the next chunk in a
+            background thread while the current chunk is written.
+
+    Returns:
+        RayDataset: The dataset, opened for reading.
+
+    Raises:
+        ValueError: If the descriptors don't match the columns of the
+            dataset to append to.
+    """
+    descriptors = list(descriptors)
+    manifest_path = os.path.join(path, MANIFEST)
+    if append and os.path.isfile(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest["columns"] != descriptors:
+            msg = "Can't append columns {} to dataset with columns {}."
+            raise ValueError(msg.format(descriptors, manifest["columns"]))
+    else:
+        manifest = {"columns": descriptors, "dtype": "<f8", "numrays": 0}
+    os.makedirs(path, exist_ok=True)
+
+    # Rays are appended to the existing files, a new dataset is written to
+    # temporary files.
+    replace = not manifest["numrays"]
+    files = {}
+    try:
+        for name in descriptors:
+            filename = os.path.join(path, name + ".npy")
+            if not replace:
+                f = open(filename, "r+b")
+                # Discard data of an aborted export, if any.
+                f.truncate(_NPY_HEADER_SIZE + manifest["numrays"] * 8)
+                f.seek(0, os.SEEK_END)
+            else:
+                f = open(filename + ".tmp", "wb")
+                _write_npy_header(f, 0)
+            files[name] = f
+
+        total = manifest["numrays"]
+        for rays in iter_receiver_rays(lt, receiverkey, descriptors,
+                                       chunk_size, numrays, prefetch):
+            for name, f in files.items():
+                f.write(np.ascontiguousarray(rays[name]).tobytes())
+            total += len(rays)
+
+        for f in files.values():
+            _write_npy_header(f, total)
+    except BaseException:
+        for f in files.values():
+            f.close()
+            if replace:
+                os.remove(f.name)
+        raise
+    for f in files.values():
+        f.close()
+
+    if replace:
+        _replace_columns(path, descriptors)
+
+    # Replace the manifest atomically, so that readers never see a
+    # partially written manifest.
+    manifest["numrays"] = total
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+    return RayDataset(path)
+
+
+def _replace_columns(path, columns):
+    """
+    Replace the columns of a dataset with the temporary column files
+    written by export_receiver_rays().
+
+    The manifest is removed first, so that the dataset can't be opened
+    with a mix of old and new columns.  It must be written again
+    afterwards.
+
+    Args:
+        path (str): The directory of the dataset.
+        columns (list): The names of the new columns.
+    """
+    manifest_path = os.path.join(path, MANIFEST)
+    stale = []
+    if os.path.isfile(manifest_path):
+        with open(manifest_path) as f:
+            stale = json.load(f)["columns"]
+        os.remove(manifest_path)
+    for name in columns:
+        filename = os.path.join(path, name + ".npy")
+        os.replace(filename + ".tmp", filename)
+    for name in set(stale) - set(columns):
+        try:
+            os.remove(os.path.join(path, name + ".npy"))
+        except FileNotFoundError:
+            pass
+
+
+def _write_npy_header(f, numrays):
+    """
+    Write the header of a one-dimensional float64 .npy file.
+
+    Args:
+        f (file): The .npy file, opened in binary mode.
+        numrays (int): The number of elements.
+    """
+    magic = np.lib.format.magic(1, 0)
+    header_len = _NPY_HEADER_SIZE - len(magic) - 2
+    header = "{{'descr': '<f8', 'fortran_order': False, 'shape': ({},), }}"
+    header = header.format(numrays).ljust(header_len - 1) + "\n"
+    pos = f.tell()
+    f.seek(0)
+    f.write(magic + struct.pack("<H", header_len) + header.encode("latin1"))
+    if pos > _NPY_HEADER_SIZE:
+        f.seek(pos)
+
+
+class RayDataset:
+
+    """
+    Read access to a ray dataset on disk.
+
+    The columns of the dataset are memory-mapped, so the ray data is not
+    loaded into memory until it is accessed.  No LightTools session is
+    needed.
+
+    Args:
+        path (str): The directory of the dataset.
+        columns (list, optional): The columns (ray data descriptors) to
+            open.  All columns are opened if not given.
+
+    Raises:
+        KeyError: If one of the columns doesn't exist.
+
+    Examples:
+        >>> rays = RayDataset("rays", columns=["RayDataX"])
+        >>> rays.columns
+        ['RayDataX']
+        >>> x = rays["RayDataX"]
+        >>> x[:3]
+        memmap([ 0.12, -0.71,  0.33])
+    """
+
+    def __init__(self, path, columns=None):
+        self.path = path
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+        self._numrays = manifest["numrays"]
+        if columns is None:
+            columns = manifest["columns"]
+        for name in columns:
+            if name not in manifest["columns"]:
+                msg = "Column {!r} doesn't exist in dataset {!r}."
+                raise KeyError(msg.format(name, path))
+        self.columns = list(columns)
+        self._data = {}
+
+    def __len__(self):
+        return self._numrays
+
+    def __getitem__(self, name):
+        """
+        Return the memory-mapped data of a column.
+
+        Args:
+            name (str): The name of the column.
+
+        Returns:
+            numpy.memmap: The read-only data of the column.
+        """
+        if name not in self.columns:
+            msg = "Column {!r} is not opened."
+            raise KeyError(msg.format(name))
+        try:
+            return self._data[name]
+        except KeyError:
+            filename = os.path.join(self.path, name + ".npy")
+            data = np.load(filename, mmap_mode="r")[:self._numrays]
+            self._data[name] = data
+            return data
+
+    def read(self, columns=None, start=0, stop=None):
+        """
+        Read (a range of) the ray data into memory.
+
+        Args:
+            columns (list, optional): The columns to read.  All opened
+                columns are read if not given.
+            start (int, optional): The index of the first ray.
+            stop (int, optional): The index after the last ray.
+
+        Returns:
+            numpy.ndarray: A structured array with one field per column.
+        """
+        if columns is None:
+            columns = self.columns
+        data = [self[name][start:stop] for name in columns]
+        dtype = np.dtype([(name, np.float64) for name in columns])
+        out = np.empty(len(data[0]) if data else 0, dtype=dtype)
+        for name, values in zip(columns, data):
+            out[name] = values
+        return out
@@ -0,0 +1,406 @@
+"""
+This module provides an on-disk cache of simulation results.
+
+Simulation results (mesh data) are stored under a key that is derived
+from the contents of the model file, the parameter overrides applied
+with DbSet, further settings that affect the simulation (e.g. the
+number of rays and the random seed), the cell filter and the requested
+mesh keys.  If an
+identical configuration is simulated again, e.g. in another sweep or on
+another day, the results are returned from the cache without running
+LightTools.
+
+The results are stored as compressed .npz files in the cache directory,
+each with a small JSON file holding the path of the model file.  The
+modification time of an .npz file marks its last use.  The least
+recently used results are removed if the cache exceeds its maximum size.
+Several processes can share a cache directory, since there is no common
+index that they could overwrite.
+
+Examples:
+    Run a simulation, or return the cached results:
+
+    >>> import ltapy.resultcache
+    >>> cache = ltapy.resultcache.ResultCache("cache")
+    >>> results = cache.run(
+    ...     lt, "model.lts", {(srckey, "X"): 1.0}, [meshkey],
+    ...     settings={(simkey, "NumberOfRays"): 100000})
+    >>> results[meshkey].shape
+    (101, 51)
+    >>> cache.info()
+    CacheInfo(hits=0, misses=1, maxsize=1073741824, currsize=40917)
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+from . import arrays
+from . import config
+from . import sweep
+from ._dbaccess import CacheInfo
+
+# File name extensions of the results and of their metadata.
+_RESULTS_EXT = ".npz"
+_METADATA_EXT = ".json"
+
+# Size of the blocks in which model files are read for hashing.
+_BLOCK_SIZE = 1 << 20
+
+
+class ResultCache:
+
+    """
+    A content-addressed on-disk cache of simulation results.
+
+    Args:
+        path (str): The cache directory.  It is created if it doesn't
+            exist.
+        maxsize (int, optional): The maximum size of the cached results
+            in bytes.
+
+    Examples:
+        Look up and store results explicitly:
+
+        >>> cache = ResultCache("cache")
+        >>> key = cache.key("model.lts", {(srckey, "X"): 1.0}, [meshkey])
+        >>> results = cache.get(key)
+        >>> if results is None:
+        ...     results = simulate()
+        ...     cache.put(key, results, "model.lts")
+    """
+
+    def __init__(self, path, maxsize=config.RESULT_CACHE_SIZE):
+        self.path = path
+        self.maxsize = maxsize
+        self._hits = 0
+        self._misses = 0
+        self._digests = {}
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def key(self, modelfile, overrides=None, meshkeys=(), settings=None,
+            cellfilter=None):
+        """
+        Return the cache key of a simulation.
+
+        Args:
+            modelfile (str): The path of the LightTools model file.
+            overrides (dict, optional): A mapping of (data key, data name)
+                tuples to the values set with DbSet before the simulation.
+            meshkeys (list, optional): The data keys of the meshes.
+            settings (dict, optional): A mapping of (data key, data name)
+                tuples to the values of further data items that affect the
+                results, e.g. the number of rays and the random seed.
+            cellfilter (str, optional): The cell filter of the mesh data.
+
+        Returns:
+            str: The cache key, a hex digest.
+        """
+        definition = (
+            self._file_digest(modelfile),
+            sorted(
+                (tuple(param), _canonical(value))
+                for param, value in (overrides or {}).items()
+            ),
+            list(meshkeys),
+            sorted(
+                (tuple(param), _canonical(value))
+                for param, value in (settings or {}).items()
+            ),
+            cellfilter,
+        )
+        return hashlib.sha256(repr(definition).encode()).hexdigest()
+
+    def get(self, key):
+        """
+        Return cached results.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            dict: A mapping of mesh keys to mesh data, or None if the
+                results are not cached.
+        """
+        filename = self._filename(key)
+        try:
+            with np.load(filename) as data:
+                results = {
+                    str(meshkey): data["mesh{}".format(i)]
+                    for i, meshkey in enumerate(data["meshkeys"])
+                }
+            # Mark the results as recently used.
+            os.utime(filename)
+        except FileNotFoundError:
+            with self._lock:
+                self._misses += 1
+            return None
+        with self._lock:
+            self._hits += 1
+        return results
+
+    def put(self, key, results, modelfile=None):
+        """
+        Store results in the cache.
+
+        Least recently used results are removed if the cache exceeds its
+        maximum size.
+
+        Args:
+            key (str): The cache key.
+            results (dict): A mapping of mesh keys to mesh data.
+            modelfile (str, optional): The path of the model file, which
+                allows to invalidate the results by model file.
+        """
+        meshes = {
+            "mesh{}".format(i): np.asarray(data)
+            for i, data in enumerate(results.values())
+        }
+        metadata = {"model": _normpath(modelfile) if modelfile else None}
+        # The metadata is written first, so that the results of a model
+        # file are always found by invalidate().
+        with _ReplacingFile(self.path, key + _METADATA_EXT) as f:
+            f.write(json.dumps(metadata).encode())
+        with _ReplacingFile(self.path, key + _RESULTS_EXT) as f:
+            np.savez_compressed(
+                f, meshkeys=np.array(list(results)), **meshes
+            )
+        with self._lock:
+            self._evict()
+
+    def run(self, lt, modelfile, overrides, meshkeys, settings=None,
+            cellfilter=None, command=sweep.SIMULATE_COMMAND):
+        """
+        Return cached results, or run the simulation and cache its
+        results.
+
+        The model file must be open in the LightTools session, in the
+        state in which it was saved.  The overridden data items are set
+        back to their previous values after the simulation, so that the
+        session matches the model file again.  The settings are checked
+        against the session before the simulation.  If the results are
+        cached, LightTools is not used at all.
+
+        Args:
+            lt (ILTAPIx): A handle to the LightTools session.
+            modelfile (str): The path of the LightTools model file.
+            overrides (dict): A mapping of (data key, data name) tuples to
+                the values that are set with DbSet before the simulation,
+                or None.
+            meshkeys (list): The data keys of the meshes.
+            settings (dict, optional): A mapping of (data key, data name)
+                tuples to the values that further data items must have in
+                the session, see key().
+            cellfilter (str, optional): The cell filter of the mesh data.
+            command (str, optional): The command that runs the
+                simulations.
+
+        Returns:
+            dict: A mapping of mesh keys to mesh data.
+
+        Raises:
+            ValueError: If a setting differs from the value in the
+                session.
+        """
+        overrides = overrides or {}
+        key = self.key(modelfile, overrides, meshkeys, settings, cellfilter)
+        results = self.get(key)
+        if results is None:
+            # The results would be stored under the wrong key otherwise.
+            for (datakey, dataname), value in (settings or {}).items():
+                actual = lt.DbGet(datakey, dataname)
+                if _canonical(actual) != _canonical(value):
+                    msg = "Setting {} of {} is {!r} in the session, not {!r}."
+                    raise ValueError(
+                        msg.format(dataname, datakey, actual, value)
+                    )
+            originals = {
+                (datakey, dataname): lt.DbGet(datakey, dataname)
+                for datakey, dataname in overrides
+            }
+            try:
+                for (datakey, dataname), value in overrides.items():
+                    lt.DbSet(datakey, dataname, value)
+                lt.Cmd(command)
+                results = {
+                    meshkey: arrays.get_mesh_data(lt, meshkey, cellfilter)
+                    for meshkey in meshkeys
+                }
+            finally:
+                for (datakey, dataname), value in originals.items():
+                    lt.DbSet(datakey, dataname, value)
+            self.put(key, results, modelfile)
+        return results
+
+    def invalidate(self, modelfile):
+        """
+        Remove the cached results of a model file.
+
+        Args:
+            modelfile (str): The path of the model file.
+
+        Returns:
+            int: The number of removed results.
+        """
+        modelfile = _normpath(modelfile)
+        removed = 0
+        with self._lock:
+            for key in self._entries():
+                try:
+                    with open(self._filename(key, _METADATA_EXT)) as f:
+                        model = json.load(f)["model"]
+                except (OSError, ValueError):
+                    continue
+                if model == modelfile:
+                    self._remove(key)
+                    removed += 1
+            self._digests.pop(modelfile, None)
+        return removed
+
+    def info(self):
+        """
+        Return the cache statistics.
+
+        Returns:
+            CacheInfo: The number of hits and misses of this cache object,
+                the maximum size and the current size of the cache in
+                bytes.
+        """
+        with self._lock:
+            currsize = sum(size for size, __ in self._entries().values())
+            return CacheInfo(self._hits, self._misses, self.maxsize, currsize)
+
+    def clear(self):
+        """
+        Remove all cached results and reset the statistics.
+        """
+        with self._lock:
+            for key in self._entries():
+                self._remove(key)
+            self._hits = self._misses = 0
+
+    def __len__(self):
+        return len(self._entries())
+
+    def _file_digest(self, modelfile):
+        """
+        Return the hash of the contents of a model file.
+
+        The hash is only computed again if the modification time or the
+        size of the file changed.
+        """
+        modelfile = _normpath(modelfile)
+        stat = os.stat(modelfile)
+        try:
+            mtime, size, digest = self._digests[modelfile]
+            if (mtime, size) == (stat.st_mtime_ns, stat.st_size):
+                return digest
+        except KeyError:
+            pass
+        sha = hashlib.sha256()
+        with open(modelfile, "rb") as f:
+            for block in iter(lambda: f.read(_BLOCK_SIZE), b""):
+                sha.update(block)
+        digest = sha.hexdigest()
+        self._digests[modelfile] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def _filename(self, key, ext=_RESULTS_EXT):
+        return os.path.join(self.path, key + ext)
+
+    def _entries(self):
+        """
+        Return the cached results found in the cache directory.
+
+        Returns:
+            dict: A mapping of cache keys to (size, time of last use)
+                tuples.
+        """
+        entries = {}
+        for name in os.listdir(self.path):
+            key, ext = os.path.splitext(name)
+            if ext != _RESULTS_EXT:
+                continue
+            try:
+                stat = os.stat(os.path.join(self.path, name))
+            except FileNotFoundError:
+                continue
+            entries[key] = (stat.st_size, stat.st_mtime)
+        return entries
+
+    def _evict(self):
+        """
+        Remove the least recently used results until the cache doesn't
+        exceed its maximum size.
+        """
+        entries = self._entries()
+        currsize = sum(size for size, __ in entries.values())
+        if currsize <= self.maxsize:
+            return
+        for key in sorted(entries, key=lambda k: entries[k][1]):
+            currsize -= entries[key][0]
+            self._remove(key)
+            if currsize <= self.maxsize:
+                break
+
+    def _remove(self, key):
+        # Another process may have removed the files already, or (on
+        # Windows) still be reading them.
+        for ext in (_RESULTS_EXT, _METADATA_EXT):
+            try:
+                os.remove(self._filename(key, ext))
+            except OSError:
+                pass
+
+
+class _ReplacingFile:
+
+    """
+    A temporary binary file that atomically replaces the target file when
+    it is closed without an error.
+
+    Args:
+        path (str): The directory of the target file.
+        name (str): The name of the target file.
+    """
+
+    def __init__(self, path, name):
+        self._target = os.path.join(path, name)
+        fd, self._tmpname = tempfile.mkstemp(dir=path, suffix=".tmp")
+        self._file = os.fdopen(fd, "wb")
+
+    def __enter__(self):
+        return self._file
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._file.close()
+        if exc_type is None:
+            os.replace(self._tmpname, self._target)
+        else:
+            os.remove(self._tmpname)
+
+
+def _canonical(value):
+    """
+    Return a value with a type independent representation.
+
+    Numbers are converted to float, so that e.g. 1, 1.0 and
+    np.float64(1.0) result in the same cache key.
+    """
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def _normpath(path):
+    """
+    Return the normalized absolute path of a file.
+    """
+    return os.path.normcase(os.path.abspath(path))
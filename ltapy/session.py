@@ -2,17 +2,41 @@
 This module provides connection capabilities to LightTools.
 """
 
+import asyncio
+import concurrent.futures
+import functools
 import os
+import queue
 import subprocess
+import threading
 import time
 import winreg
 
 import psutil
+import pythoncom
 
 from . import _comutils
 from . import _ltapi
 from . import config
 from . import error
+from . import utils
+
+# Prefix of the moniker display names of LightTools sessions in the
+# Running Object Table, followed by the process ID.
+ROT_PREFIX = "LightTools API Server | "
+
+# The time in seconds a LightTools process is given to terminate after
+# its COM server got disconnected, before the session is considered alive.
+_EXIT_GRACE_PERIOD = 1.0
+
+# HRESULTs of API function calls that failed because the COM server got
+# disconnected: RPC_S_SERVER_UNAVAILABLE, RPC_S_CALL_FAILED and
+# RPC_E_DISCONNECTED.
+_RPC_DISCONNECTED = (-2147023174, -2147023170, -2147417848)
+
+# Minimum and maximum time in seconds between two scans of the Running
+# Object Table.  The interval is doubled after each unsuccessful scan.
+_SCAN_INTERVAL = (0.01, 0.5)
 
 
 def _get_home_dir(version):
@@ -48,6 +72,207 @@ def _get_home_dir(version):
         return value
 
 
+def wait_for_sessions(pids=None, timeout=config.TIMEOUT):
+    """
+    Wait for LightTools sessions to appear in the Running Object Table.
+
+    All requested sessions are looked up in one scan loop, which backs
+    off between unsuccessful scans.  Only the COM objects of LightTools
+    sessions are bound.
+
+    Args:
+        pids (list, optional): The process IDs of the LightTools sessions.
+            If not given, wait for an arbitrary LightTools session.
+        timeout (int, optional): The time limit in seconds after which
+            the lookup is aborted.
+
+    Returns:
+        dict: A mapping of process IDs to LightTools COM server objects
+            (PyIUnknown).  The COM objects can only be used by the calling
+            thread.
+
+    Raises:
+        ValueError: If one of the LightTools processes exited.
+        TimeOutError: If not all sessions were found within the time
+            limit.
+    """
+    return dict(_iter_sessions(pids, timeout))
+
+
+def _iter_sessions(pids, timeout):
+    """
+    Wait for LightTools sessions to appear in the Running Object Table,
+    and yield them as they are found.
+
+    Args:
+        pids (list): The process IDs of the LightTools sessions, or None to
+            wait for an arbitrary LightTools session.
+        timeout (int): The time limit in seconds after which the lookup is
+            aborted.
+
+    Yields:
+        tuple: The process ID and the COM object of each session.
+
+    Raises:
+        ValueError: If one of the LightTools processes exited.
+        TimeOutError: If not all sessions were found within the time
+            limit.
+    """
+    wanted = set(pids) if pids is not None else None
+    rot = _comutils.RunningObjectTable()
+    deadline = time.time() + timeout
+    interval = _SCAN_INTERVAL[0]
+
+    while True:
+        # Only the wanted sessions are bound, binding calls the session
+        # and may block while it is busy.
+        for name in rot.find_names(ROT_PREFIX):
+            try:
+                pid = int(name[len(ROT_PREFIX):])
+            except ValueError:
+                continue
+            if wanted is not None and pid not in wanted:
+                continue
+            try:
+                comobj = rot.get_object(name)
+            except (ValueError, pythoncom.com_error):
+                # The session was closed in the meantime.
+                continue
+            if wanted is None:
+                yield pid, comobj
+                return
+            wanted.remove(pid)
+            interval = _SCAN_INTERVAL[0]
+            yield pid, comobj
+        if wanted is not None:
+            if not wanted:
+                return
+            for pid in wanted:
+                if not psutil.pid_exists(pid):
+                    msg = "LightTools process with PID {} exited."
+                    raise ValueError(msg.format(pid))
+        if time.time() > deadline:
+            msg = (
+                "Couldn't establish a connection to LightTools within {} "
+                "seconds. Connection attempt aborted."
+            )
+            raise error.TimeOutError(msg.format(timeout))
+        time.sleep(min(interval, max(deadline - time.time(), 0)))
+        interval = min(2 * interval, _SCAN_INTERVAL[1])
+
+
+def launch(count, version=config.LT_VERSION, timeout=config.TIMEOUT,
+           executable=None, modelfile=None):
+    """
+    Start several LightTools instances at once and connect to them.
+
+    All instances are started at once and connected as they become ready,
+    so that the startup times overlap.  Optionally, a model file is
+    opened in each instance (in parallel).
+
+    The startup times of each session are recorded in its
+    `startup_times` attribute, a dict with the time in seconds until the
+    session appeared in the Running Object Table ('start'), the time of
+    the connection ('connect') and, if a model file is given, the time of
+    opening the model file ('open').
+
+    Args:
+        count (int): The number of LightTools instances to start.
+        version (str, optional): The LightTools version to be started.
+        timeout (int, optional): The time limit in seconds after which
+            the connection attempt to the instances is aborted.
+        executable (str, optional): The path of the executable to be
+            started instead of lt.exe, see Session.new().
+        modelfile (str, optional): The path of a model file to open.
+
+    Returns:
+        list: The sessions, in the order in which they became ready.
+
+    Raises:
+        TimeOutError: If not all instances could be connected within the
+            time limit.  All started instances are terminated in this
+            case.
+
+    Examples:
+        >>> sessions = launch(16, modelfile="C:/models/lightguide.lts")
+        >>> [ses.startup_times["start"] for ses in sessions]
+        [4.21, 4.25, 4.31, ...]
+    """
+    if executable is None:
+        executable = os.path.join(_get_home_dir(version), "lt.exe")
+    procs = {}
+    start_times = {}
+    for __ in range(count):
+        proc = subprocess.Popen(executable)
+        procs[proc.pid] = proc
+        start_times[proc.pid] = time.perf_counter()
+
+    sessions = []
+    opened = queue.Queue()
+    threads = []
+    try:
+        for pid, comobj in _iter_sessions(list(procs), timeout):
+            found = time.perf_counter()
+            ses = Session(pid, timeout, _comobj=comobj)
+            ses.startup_times = {
+                "start": found - start_times[pid],
+                "connect": time.perf_counter() - found,
+            }
+            if modelfile is None:
+                sessions.append(ses)
+                continue
+            # Open the model files in parallel, each thread with its own
+            # handle to the session.
+            thread = threading.Thread(
+                target=_open_model,
+                args=(
+                    ses, _comutils.marshal_interface(ses.lt._oleobj_),
+                    modelfile, opened,
+                ),
+                daemon=True,
+            )
+            thread.start()
+            threads.append(thread)
+        for __ in threads:
+            ses, exc = opened.get()
+            if exc is not None:
+                raise exc
+            sessions.append(ses)
+    except BaseException:
+        for proc in procs.values():
+            proc.kill()
+        raise
+    return sessions
+
+
+def _open_model(ses, stream, modelfile, opened):
+    """
+    Open a model file in a LightTools session, on a separate thread.
+
+    Args:
+        ses (Session): The session.
+        stream (PyIStream): The marshaled IDispatch interface of the
+            session.
+        modelfile (str): The path of the model file.
+        opened (queue.Queue): The queue that receives the (session,
+            exception) tuple when the model file is opened.
+    """
+    pythoncom.CoInitialize()
+    lt = None
+    try:
+        lt = _ltapi.LTAPI(_comutils.unmarshal_interface(stream))
+        start = time.perf_counter()
+        utils.open_file(lt, modelfile)
+        ses.startup_times["open"] = time.perf_counter() - start
+        opened.put((ses, None))
+    except Exception as e:
+        opened.put((ses, e))
+    finally:
+        # Release the COM object before COM is uninitialized.
+        lt = None
+        pythoncom.CoUninitialize()
+
+
 class Session:
 
     """
@@ -66,6 +291,8 @@ class Session:
 
     Attributes:
         lt (ILTAPIx): A handle to the LightTools session.
+        startup_times (dict): The startup times of a session created by
+            launch(), None otherwise.
 
     Raises:
         TimeOutError: If a connection attempt with LightTools was aborted
@@ -80,19 +307,28 @@ class Session:
         >>> lt.Message("Successfully connected to LightTools!")
     """
 
-    def __init__(self, pid=None, timeout=config.TIMEOUT, _rebuild=False):
+    def __init__(self, pid=None, timeout=config.TIMEOUT, _rebuild=False,
+                 _comobj=None):
         self._pid = pid
         self._timeout = timeout
         self._rebuild = _rebuild
+        self.startup_times = None
 
         # Get a handle to the LightTools session.
-        comobj = self._get_COM_object()
+        comobj = _comobj or self._get_COM_object()
         self.lt = _ltapi.LTAPI(comobj, self._rebuild)
 
         # Get the process ID if connected to an arbitrary LightTools session.
         if not self._pid:
             self._pid = self.lt.GetServerID()
 
+    @property
+    def pid(self):
+        """
+        int: The process ID of the connected LightTools session.
+        """
+        return self._pid
+
     def _get_COM_object(self):
         """
         Return a LightTools COM server object from the Running Object Table.
@@ -102,36 +338,17 @@ class Session:
                 process ID was given return an arbitrary LightTools COM object
                 from the Running Object Table.
         """
-        prefix = "LightTools API Server | "
-
         if self._pid:
             if not psutil.pid_exists(self._pid):
                 msg = "Couldn't find a LightTools process with PID {}."
                 raise ValueError(msg.format(self._pid))
-            prefix += str(self._pid)
-
-        start_time = time.time()
-        connection_attempt_timed_out = (
-            lambda current_time: current_time - start_time > self._timeout
-        )
-
-        rot = _comutils.RunningObjectTable()
-
-        while not connection_attempt_timed_out(time.time()):
-            comobjs = rot.get_objects()
-            for name in comobjs:
-                if name.startswith(prefix):
-                    return comobjs[name]
-        else:
-            msg = (
-                "Couldn't establish a connection to LightTools within {} "
-                "seconds. Connection attempt aborted."
-            )
-            raise error.TimeOutError(msg.format(self._timeout))
+            return wait_for_sessions([self._pid], self._timeout)[self._pid]
+        comobjs = wait_for_sessions(None, self._timeout)
+        return next(iter(comobjs.values()))
 
     @classmethod
     def new(cls, version=config.LT_VERSION, timeout=config.TIMEOUT,
-            _rebuild=False):
+            _rebuild=False, executable=None):
         """
         Start a new LightTools instance and connect to that session.
 
@@ -139,6 +356,9 @@ class Session:
             version (str, optional): The LightTools version to be started.
             timeout (int, optional): The time limit in seconds after which the
                 connection attempt to LightTools is aborted.
+            executable (str, optional): The path of the executable to be
+                started instead of lt.exe of the given LightTools version,
+                e.g. a stand-in for testing.
 
         Returns:
             Session: A session object, connected with the newly created
@@ -155,6 +375,681 @@ class Session:
         >>> lt = ses.lt
         >>> lt.Message("Successfully connected to LightTools!")
         """
-        home_dir = _get_home_dir(version)
-        proc = subprocess.Popen(os.path.join(home_dir, "lt.exe"))
+        if executable is None:
+            executable = os.path.join(_get_home_dir(version), "lt.exe")
+        proc = subprocess.Popen(executable)
         return cls(proc.pid, timeout, _rebuild)
+
+
+def warm_up(pid=None, version=config.LT_VERSION, timeout=config.TIMEOUT,
+            jumpstart=True, rebuild=False):
+    """
+    Build the MakePy support cache ahead of a batch run.
+
+    The type libraries of the LightTools API and (optionally) of the
+    JumpStart library are checked, their support files are generated if
+    necessary and recorded, so that later connections don't need to
+    probe or regenerate them.
+
+    Args:
+        pid (int, optional): The process ID of a running LightTools
+            session.  A new session is started (and closed afterwards) if
+            not given.
+        version (str, optional): The LightTools version to be started.
+        timeout (int, optional): The time limit in seconds after which a
+            connection attempt to LightTools is aborted.
+        jumpstart (bool, optional): Wether to include the JumpStart
+            library.
+        rebuild (bool, optional): Wether to regenerate the support files
+            in any case.
+
+    Returns:
+        list: The (clsid, lcid, major, minor) tuples of the type
+            libraries.
+
+    Examples:
+        From the command line:
+
+        $ python -m ltapy warm-up --version 8.5.0
+    """
+    from . import jslib
+
+    if pid is None:
+        ses = Session.new(version, timeout, _rebuild=rebuild)
+    else:
+        ses = Session(pid, timeout, _rebuild=rebuild)
+    try:
+        libids = [_comutils.get_typelib_id(ses.lt._oleobj_)]
+        if jumpstart:
+            js = jslib._JSLIB(rebuild=rebuild)
+            libids.append(_comutils.get_typelib_id(js._oleobj_))
+    finally:
+        if pid is None:
+            ses.lt.Cmd("Exit")
+    return libids
+
+
+class SessionPool:
+
+    """
+    Distribute jobs to a pool of LightTools sessions.
+
+    LightTools processes the API function calls of a session one after
+    another.  The pool starts (or attaches to) several LightTools
+    sessions, each served by a worker thread with its own handle to the
+    session, and hands out the submitted jobs from a common queue.
+
+    A worker whose LightTools process died while processing a job is
+    replaced by a newly started session, and the job is submitted again.
+    A new session has no model loaded, use an `initializer` to restore
+    the state the jobs expect, e.g. to open the model file.
+
+    Args:
+        size (int, optional): The number of LightTools sessions to start.
+            Defaults to the number of CPUs, or the number of `pids`.
+        pids (list, optional): The process IDs of already running
+            LightTools sessions to attach to.
+        version (str, optional): The LightTools version to be started.
+        timeout (int, optional): The time limit in seconds after which a
+            connection attempt to LightTools is aborted.
+        executable (str, optional): The path of the executable to be
+            started instead of lt.exe, see Session.new().
+        retries (int, optional): The number of times a job is submitted
+            again after its LightTools process died.
+        factory (function, optional): A function factory(pid) that
+            returns a connected session (an object with `lt` and `pid`
+            attributes), used instead of Session and Session.new().  `pid`
+            is None if a new session must be started.
+        initializer (function, optional): A function that is called as
+            initializer(lt, *initargs) for each session, before it gets
+            its first job, and again for each session that replaces a
+            dead one.
+        initargs (tuple, optional): The arguments of the initializer.
+
+    Raises:
+        ValueError: If both `size` and `pids` are given and don't match.
+        TimeOutError: If a connection attempt with LightTools was aborted
+            due to timeout.
+
+    Examples:
+        Evaluate a merit function for several parameter values in four
+        LightTools sessions:
+
+        >>> def merit(lt, x):
+        ...     lt.DbSet(srckey, "X", x)
+        ...     lt.Cmd("BeginAllSimulations")
+        ...     return lt.DbGet(meshkey, "Total_Power")
+        >>> with SessionPool(4, initializer=utils.open_file,
+        ...                  initargs=("model.lts",)) as pool:
+        ...     results = list(pool.map(merit, [0.0, 0.5, 1.0, 1.5]))
+    """
+
+    def __init__(self, size=None, pids=None, version=config.LT_VERSION,
+                 timeout=config.TIMEOUT, executable=None, retries=1,
+                 factory=None, initializer=None, initargs=()):
+        if pids is None:
+            pids = [None] * (size or os.cpu_count())
+        elif size is not None and size != len(pids):
+            msg = "Pool size {} doesn't match the number of PIDs {}."
+            raise ValueError(msg.format(size, len(pids)))
+        if factory is None:
+            factory = functools.partial(
+                _connect_session, version=version, timeout=timeout,
+                executable=executable,
+            )
+        self._factory = factory
+        self._initializer = initializer
+        self._initargs = initargs
+        self._retries = retries
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._alive = len(pids)
+        self._workers = [_PoolWorker(self, pid) for pid in pids]
+
+        try:
+            for worker in self._workers:
+                worker.ready.result()
+        except Exception:
+            self.close()
+            raise
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Submit a job to the pool.
+
+        Args:
+            func (function): The function to call as func(lt, *args,
+                **kwargs), with the handle of a LightTools session.
+            *args: The positional arguments of the function.
+            **kwargs: The keyword arguments of the function.
+
+        Returns:
+            concurrent.futures.Future: The future result of the job.
+
+        Raises:
+            RuntimeError: If the pool is closed.
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The session pool is closed.")
+            if not self._alive:
+                raise RuntimeError("All workers of the session pool died.")
+            future = concurrent.futures.Future()
+            self._jobs.put((future, func, args, kwargs, 0))
+        return future
+
+    def map(self, func, *iterables):
+        """
+        Call a function for each item of the given iterables.
+
+        All jobs are submitted at once, the results are returned in the
+        order of the items.
+
+        Args:
+            func (function): The function to call as func(lt, *items),
+                with the handle of a LightTools session.
+            *iterables: The iterables of function arguments.
+
+        Returns:
+            iterator: The results of the function calls.
+        """
+        futures = [self.submit(func, *items) for items in zip(*iterables)]
+
+        def results():
+            for future in futures:
+                yield future.result()
+        return results()
+
+    def stats(self):
+        """
+        Return the utilization of the workers.
+
+        Returns:
+            list: A dict for each worker with the 'pid' of the LightTools
+                process, the number of 'jobs', 'errors' and 'restarts',
+                the 'busy' time in seconds, and the 'utilization', i.e.
+                the busy fraction of the worker lifetime.
+        """
+        return [worker.stats() for worker in self._workers]
+
+    def close(self):
+        """
+        Finish the submitted jobs and release the LightTools sessions.
+
+        Sessions started by the pool are closed, sessions the pool
+        attached to keep running.
+        """
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                for __ in self._workers:
+                    self._jobs.put(None)
+        for worker in self._workers:
+            worker.thread.join()
+        # Jobs that were submitted again after the pool was closed.
+        self._fail_pending(RuntimeError("The session pool is closed."))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _requeue(self, job):
+        """
+        Submit a job again whose LightTools process died.
+
+        Args:
+            job (tuple): The job.
+
+        Returns:
+            bool: False if the job was not submitted again, because it
+                exceeded the number of retries.
+        """
+        future, func, args, kwargs, attempt = job
+        if attempt >= self._retries:
+            return False
+        self._jobs.put((future, func, args, kwargs, attempt + 1))
+        return True
+
+    def _worker_died(self, exc):
+        """
+        Note that a worker couldn't (re)connect to LightTools.
+
+        If no worker is left, all pending jobs fail.
+
+        Args:
+            exc (Exception): The reason of the connection failure.
+        """
+        with self._lock:
+            self._alive -= 1
+            if not self._alive:
+                self._fail_pending(exc)
+
+    def _fail_pending(self, exc):
+        """
+        Remove all pending jobs from the queue and let them fail.
+
+        Args:
+            exc (Exception): The exception of the failed jobs.
+        """
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                future, __, __, __, attempt = job
+                if attempt or future.set_running_or_notify_cancel():
+                    future.set_exception(exc)
+
+
+class _PoolWorker:
+
+    """
+    A worker thread of a SessionPool, serving one LightTools session.
+
+    Args:
+        pool (SessionPool): The pool the worker belongs to.
+        pid (int): The process ID of a running LightTools session to
+            attach to, or None to start a new session.
+    """
+
+    def __init__(self, pool, pid):
+        self.pool = pool
+        self.session = None
+        self.owned = pid is None
+        self.jobs = 0
+        self.errors = 0
+        self.restarts = 0
+        self.busy = 0.0
+        self.start_time = time.perf_counter()
+        self.ready = concurrent.futures.Future()
+        self.thread = threading.Thread(
+            target=self._work, args=(pid,), daemon=True
+        )
+        self.thread.start()
+
+    def stats(self):
+        """
+        Return the utilization of the worker, see SessionPool.stats().
+        """
+        lifetime = time.perf_counter() - self.start_time
+        return {
+            "pid": self.session.pid if self.session else None,
+            "jobs": self.jobs,
+            "errors": self.errors,
+            "restarts": self.restarts,
+            "busy": self.busy,
+            "utilization": self.busy / lifetime if lifetime else 0.0,
+        }
+
+    def _work(self, pid):
+        """
+        Connect to LightTools and process jobs until the pool is closed.
+
+        Args:
+            pid (int): The process ID of a running LightTools session to
+                attach to, or None to start a new session.
+        """
+        pool = self.pool
+        pythoncom.CoInitialize()
+        try:
+            try:
+                self.session = self._connect(pid)
+            except Exception as e:
+                self.ready.set_exception(e)
+                pool._worker_died(e)
+                return
+            self.ready.set_result(None)
+
+            while True:
+                job = pool._jobs.get()
+                if job is None:
+                    break
+                future, func, args, kwargs, attempt = job
+                if attempt == 0 and not future.set_running_or_notify_cancel():
+                    continue
+
+                start = time.perf_counter()
+                try:
+                    result = func(self.session.lt, *args, **kwargs)
+                except Exception as e:
+                    self.busy += time.perf_counter() - start
+                    if not self._session_died(e):
+                        self.errors += 1
+                        future.set_exception(e)
+                        continue
+                    if not pool._requeue(job):
+                        future.set_exception(e)
+                    if not self._restart():
+                        return
+                else:
+                    self.busy += time.perf_counter() - start
+                    self.jobs += 1
+                    future.set_result(result)
+
+            if self.owned:
+                try:
+                    self.session.lt.Cmd("Exit")
+                except Exception:
+                    pass
+        finally:
+            # Release the COM object before COM is uninitialized.
+            self.session = None
+            pythoncom.CoUninitialize()
+
+    def _connect(self, pid):
+        """
+        Connect to a LightTools session and run the initializer of the
+        pool.
+
+        Args:
+            pid (int): The process ID of a running LightTools session to
+                attach to, or None to start a new session.
+
+        Returns:
+            Session: The connected session.
+        """
+        pool = self.pool
+        session = pool._factory(pid)
+        if pool._initializer is not None:
+            try:
+                pool._initializer(session.lt, *pool._initargs)
+            except Exception:
+                if pid is None:
+                    try:
+                        session.lt.Cmd("Exit")
+                    except Exception:
+                        pass
+                raise
+        return session
+
+    def _session_died(self, exc):
+        """
+        Check if a failed job took down the LightTools session.
+
+        Args:
+            exc (Exception): The exception raised by the job.
+
+        Returns:
+            bool: True if the session is no longer running.
+        """
+        # An APIError is an answer of a running session.
+        if isinstance(exc, error.APIError):
+            return False
+        disconnected = (isinstance(exc, pythoncom.com_error)
+                        and exc.hresult in _RPC_DISCONNECTED)
+        pid = self.session.pid
+        if pid is None:
+            return disconnected
+        # Only a disconnected session may still be about to terminate.
+        timeout = _EXIT_GRACE_PERIOD if disconnected else 0.0
+        return not _is_running(pid, timeout)
+
+    def _restart(self):
+        """
+        Replace the dead LightTools session by a new one.
+
+        Returns:
+            bool: False if no new session could be started.
+        """
+        self.session = None
+        self.owned = True
+        try:
+            self.session = self._connect(None)
+        except Exception as e:
+            self.pool._worker_died(e)
+            return False
+        self.restarts += 1
+        return True
+
+
+def _connect_session(pid, version, timeout, executable):
+    """
+    Connect to a running LightTools session, or start a new one.
+
+    Args:
+        pid (int): The process ID of the running LightTools session, or
+            None to start a new session.
+        version (str): The LightTools version to be started.
+        timeout (int): The time limit in seconds after which a connection
+            attempt to LightTools is aborted.
+        executable (str): The path of the executable to be started
+            instead of lt.exe.
+
+    Returns:
+        Session: The connected session.
+    """
+    if pid is None:
+        return Session.new(version, timeout, executable=executable)
+    return Session(pid, timeout)
+
+
+def _is_running(pid, timeout=0.0):
+    """
+    Check if a process is running.
+
+    Args:
+        pid (int): The process ID.
+        timeout (float, optional): The time in seconds to wait for the
+            process to terminate, e.g. if it is about to crash.
+
+    Returns:
+        bool: True if the process exists and is not a zombie.
+    """
+    deadline = time.time() + timeout
+    while True:
+        try:
+            running = psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+        except psutil.NoSuchProcess:
+            running = False
+        if not running or time.time() >= deadline:
+            return running
+        time.sleep(0.05)
+
+
+class AsyncSession:
+
+    """
+    Connect to a LightTools session for use with asyncio.
+
+    All LightTools API function calls are run on a dedicated worker
+    thread (single-threaded apartment) that owns the COM object.  The API
+    methods of the session are coroutine functions, so the event loop
+    stays responsive while LightTools is busy, e.g. with a simulation.
+    Several sessions can be driven concurrently from one event loop.
+
+    Create the session with the connect() coroutine.  Exceptions raised
+    by an API function call, e.g. APIError, are raised in the awaiting
+    task.
+
+    Args:
+        factory (function): A function that returns a handle to the
+            LightTools session.  It is called on the worker thread.
+        loop (asyncio.AbstractEventLoop, optional): The event loop the
+            session is used with.  The current event loop if not given.
+
+    Examples:
+        Run simulations in two LightTools sessions concurrently:
+
+        >>> async def simulate(pid):
+        ...     async with await AsyncSession.connect(pid=pid) as ses:
+        ...         await ses.Cmd("BeginAllSimulations")
+        ...         return await ses.DbGet(meshkey, "CellValue", 0, 1, 1)
+        >>> loop = asyncio.get_event_loop()
+        >>> loop.run_until_complete(asyncio.gather(
+        ...     simulate(5642), simulate(5700)))
+        [0.0123, 0.0119]
+    """
+
+    def __init__(self, factory, loop=None):
+        self._loop = loop or asyncio.get_event_loop()
+        self._jobs = queue.Queue()
+        self._ready = concurrent.futures.Future()
+        self._lt_class = None
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._work, args=(factory,), daemon=True
+        )
+        self._thread.start()
+
+    @classmethod
+    async def connect(cls, pid=None, timeout=config.TIMEOUT, factory=None,
+                      loop=None, _rebuild=False):
+        """
+        Connect to a running LightTools session.
+
+        Args:
+            pid (int, optional): The process ID of an already running
+                LightTools session.  If `pid` is given connect to that
+                specific session, otherwise connect to an arbitrary
+                session.
+            timeout (int, optional): The time limit in seconds after which
+                a connection attempt to LightTools is aborted.
+            factory (function, optional): A function that returns a
+                handle to the LightTools session, used instead of
+                connecting with Session, e.g. for testing.
+            loop (asyncio.AbstractEventLoop, optional): The event loop the
+                session is used with.
+
+        Returns:
+            AsyncSession: The connected session.
+
+        Raises:
+            TimeOutError: If a connection attempt with LightTools was
+                aborted due to timeout.
+        """
+        if factory is None:
+            factory = lambda: Session(pid, timeout, _rebuild).lt
+        ses = cls(factory, loop)
+        try:
+            await asyncio.wrap_future(ses._ready, loop=ses._loop)
+        except Exception:
+            await ses.close()
+            raise
+        return ses
+
+    def _work(self, factory):
+        """
+        Connect to LightTools and run the submitted jobs, until the
+        session is closed.
+
+        Args:
+            factory (function): A function that returns a handle to the
+                LightTools session.
+        """
+        pythoncom.CoInitialize()
+        lt = None
+        try:
+            try:
+                lt = factory()
+            except Exception as e:
+                self._ready.set_exception(e)
+                return
+            self._lt_class = type(lt)
+            self._ready.set_result(None)
+
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    return
+                future, func, args, kwargs = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    result = func(lt, *args, **kwargs)
+                except error.APIError as e:
+                    # Look up the error message on this thread, the
+                    # session handle must not be used by other threads.
+                    str(e)
+                    e.ltapi = None
+                    future.set_exception(e)
+                except Exception as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+        finally:
+            # Release the COM object before COM is uninitialized.
+            lt = None
+            pythoncom.CoUninitialize()
+
+    def run(self, func, *args, **kwargs):
+        """
+        Call a function with the LightTools session on the worker thread.
+
+        This allows to use functions that take a handle to the LightTools
+        session as first argument, e.g. from the extension modules.
+
+        Args:
+            func (function): The function to call as func(lt, *args,
+                **kwargs).
+            *args: The positional arguments of the function.
+            **kwargs: The keyword arguments of the function.
+
+        Returns:
+            asyncio.Future: The future result of the function call.
+
+        Raises:
+            RuntimeError: If the session is closed.
+
+        Examples:
+            >>> import ltapy.arrays
+            >>> data = await ses.run(ltapy.arrays.get_mesh_data, meshkey)
+        """
+        if self._closed:
+            raise RuntimeError("The session is closed.")
+        future = concurrent.futures.Future()
+        self._jobs.put((future, func, args, kwargs))
+        return asyncio.wrap_future(future, loop=self._loop)
+
+    def __getattr__(self, name):
+        # Only the class of the LightTools API object is inspected, which
+        # is safe outside of the worker thread.
+        if name.startswith("_") or not callable(
+                getattr(self._lt_class, name, None)):
+            msg = "{!r} object has no attribute {!r}"
+            raise AttributeError(msg.format(type(self).__name__, name))
+
+        def method(*args, **kwargs):
+            return self.run(_call_method, name, *args, **kwargs)
+
+        method.__name__ = name
+        method.__doc__ = getattr(self._lt_class, name).__doc__
+        self.__dict__[name] = method
+        return method
+
+    async def close(self):
+        """
+        Finish the submitted API function calls and release the
+        LightTools session.
+
+        LightTools itself keeps running.
+        """
+        if not self._closed:
+            self._closed = True
+            self._jobs.put(None)
+        await self._loop.run_in_executor(None, self._thread.join)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+def _call_method(lt, name, *args, **kwargs):
+    """
+    Call an API method of a LightTools session.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+        name (str): The name of the API method.
+        *args: The positional arguments of the API method.
+        **kwargs: The keyword arguments of the API method.
+
+    Returns:
+        The output value of the API method.
+    """
+    return getattr(lt, name)(*args, **kwargs)
@@ -0,0 +1,553 @@
+"""
+This module provides parameter sweeps over LightTools models.
+
+A sweep sets data items of the model (parameters) with DbSet, runs the
+simulations and collects the data of the requested meshes at each
+parameter point.  The mesh data is stored in preallocated arrays that
+are indexed by the parameter axes, followed by the mesh dimensions.
+
+The parameter points are run in an order that changes as few
+parameters as possible from one point to the next, and unchanged
+parameters are not set again.  The parameters are restored to their
+original values afterwards.  The progress can be saved to a
+checkpoint directory, so that an interrupted sweep resumes with the
+first point that was not completed.  The results are memory-mapped
+from .npy files in the checkpoint directory, and only the new data is
+written when the progress is saved.
+
+Examples:
+    Sweep the position of a source on a 3 x 2 grid:
+
+    >>> import ltapy.sweep
+    >>> sweep = ltapy.sweep.Sweep.grid(
+    ...     {(srckey, "X"): [-1.0, 0.0, 1.0], (srckey, "Y"): [0.0, 1.0]},
+    ...     meshkeys=[meshkey])
+    >>> results = sweep.run(lt, checkpoint="sweep")
+    >>> results[meshkey].shape
+    (3, 2, 101, 51)
+
+    Run a list of parameter points in a pool of LightTools sessions.
+    The initializer opens the model in each session, also in sessions
+    that replace a crashed one:
+
+    >>> sweep = ltapy.sweep.Sweep.points(
+    ...     [(srckey, "X"), (srckey, "Power")],
+    ...     [(0.0, 1.0), (0.5, 1.0), (0.5, 2.0)],
+    ...     meshkeys=[meshkey])
+    >>> with ltapy.session.SessionPool(
+    ...         4, initializer=ltapy.utils.open_file,
+    ...         initargs=("model.lts",)) as pool:
+    ...     results = sweep.run(pool)
+    >>> results[meshkey].shape
+    (3, 101, 51)
+"""
+
+import concurrent.futures
+import hashlib
+import itertools
+import json
+import os
+import uuid
+
+import numpy as np
+
+from . import arrays
+from . import config
+
+# Command that runs the simulations at each parameter point.
+SIMULATE_COMMAND = "BeginAllSimulations"
+
+# Names of the files in a checkpoint directory: the sweep definition,
+# the mask of completed points and the mesh data (by mesh number).
+_CHECKPOINT_SWEEP = "sweep.json"
+_CHECKPOINT_DONE = "done.npy"
+_CHECKPOINT_MESH = "mesh{}.npy"
+
+
+class Sweep:
+
+    """
+    A parameter sweep over a LightTools model.
+
+    Use the grid() or points() constructors to create a sweep.
+
+    Args:
+        parameters (list): The (data key, data name) tuples of the
+            parameters.
+        values (list): The parameter values of each point, as tuples in
+            the order of `parameters`.  The points are in C order of
+            `shape`.
+        shape (tuple): The shape of the parameter axes.
+        order (list): The indices of the points in the order they are run.
+        meshkeys (list): The data keys of the meshes to collect.
+        cellfilter (str, optional): The cell filter of the mesh data, see
+            arrays.get_mesh_data().
+        command (str, optional): The command that runs the simulations.
+
+    Attributes:
+        parameters (list): The (data key, data name) tuples of the
+            parameters.
+        shape (tuple): The shape of the parameter axes.
+        order (list): The indices of the points in the order they are run.
+        meshkeys (list): The data keys of the meshes to collect.
+    """
+
+    def __init__(self, parameters, values, shape, order, meshkeys,
+                 cellfilter=None, command=SIMULATE_COMMAND):
+        self.parameters = [tuple(param) for param in parameters]
+        self._values = [tuple(point) for point in values]
+        self.shape = tuple(shape)
+        self.order = list(order)
+        self.meshkeys = list(meshkeys)
+        self._cellfilter = cellfilter
+        self._command = command
+
+    @classmethod
+    def grid(cls, axes, meshkeys, cellfilter=None, command=SIMULATE_COMMAND):
+        """
+        Create a sweep over all combinations of the parameter values.
+
+        The points are run in boustrophedon order, i.e. the direction of
+        the faster axes is reversed after each step of a slower axis, so
+        that only one parameter changes from one point to the next.
+
+        Args:
+            axes (dict): A mapping of (data key, data name) tuples to the
+                values of the parameter, or a list of such pairs.  The
+                order of the parameters defines the order of the axes.
+            meshkeys (list): The data keys of the meshes to collect.
+            cellfilter (str, optional): The cell filter of the mesh data.
+            command (str, optional): The command that runs the
+                simulations.
+
+        Returns:
+            Sweep: The sweep.
+        """
+        axes = list(axes.items()) if isinstance(axes, dict) else list(axes)
+        parameters = [param for param, __ in axes]
+        shape = tuple(len(values) for __, values in axes)
+        values = itertools.product(*(values for __, values in axes))
+        return cls(
+            parameters, values, shape, _snake_order(shape), meshkeys,
+            cellfilter, command,
+        )
+
+    @classmethod
+    def points(cls, parameters, values, meshkeys, cellfilter=None,
+               command=SIMULATE_COMMAND):
+        """
+        Create a sweep over a list of parameter points.
+
+        The points are run in a (greedy) order that changes as few
+        parameters as possible from one point to the next, starting with
+        the first point.
+
+        Args:
+            parameters (list): The (data key, data name) tuples of the
+                parameters.
+            values (list): The parameter values of each point, as tuples
+                in the order of `parameters`.
+            meshkeys (list): The data keys of the meshes to collect.
+            cellfilter (str, optional): The cell filter of the mesh data.
+            command (str, optional): The command that runs the
+                simulations.
+
+        Returns:
+            Sweep: The sweep.
+        """
+        values = [tuple(point) for point in values]
+        order = [(i,) for i in _greedy_order(values)]
+        return cls(
+            parameters, values, (len(values),), order, meshkeys,
+            cellfilter, command,
+        )
+
+    def values(self, index):
+        """
+        Return the parameter values of a point.
+
+        Args:
+            index (tuple): The index of the point.
+
+        Returns:
+            tuple: The parameter values in the order of `parameters`.
+        """
+        return self._values[np.ravel_multi_index(index, self.shape)]
+
+    def run(self, target, checkpoint=None,
+            checkpoint_interval=config.SWEEP_CHECKPOINT_INTERVAL,
+            chunk_size=config.SWEEP_CHUNK_SIZE):
+        """
+        Run the sweep.
+
+        The parameters are restored to their original values when the
+        sweep is completed or interrupted.  The sessions of a pool
+        restore them after each job.
+
+        Args:
+            target: A handle to the LightTools session (ILTAPIx), or a
+                session.SessionPool to run the points in parallel.  The
+                sessions of a pool must have the model loaded, see the
+                initializer of SessionPool.
+            checkpoint (str, optional): The path of the checkpoint
+                directory.  If it holds a checkpoint, the sweep resumes
+                from it.
+            checkpoint_interval (int, optional): The number of completed
+                points after which the progress is saved.
+            chunk_size (int, optional): The number of consecutive points
+                that are run as one job of a session pool.
+
+        Returns:
+            dict: A mapping of the mesh keys to the mesh data, arrays of
+                shape `shape` + (X_Dimension, Y_Dimension).  The data of
+                points that were not run is NaN.  With a checkpoint, the
+                arrays are memory-mapped from the checkpoint directory.
+
+        Raises:
+            ValueError: If the checkpoint belongs to a different sweep.
+        """
+        pool = target if hasattr(target, "submit") else None
+        if checkpoint and os.path.isfile(
+                os.path.join(checkpoint, _CHECKPOINT_SWEEP)):
+            results, done = self._open_checkpoint(checkpoint)
+        else:
+            if pool:
+                shapes = pool.submit(_get_mesh_shapes, self.meshkeys).result()
+            else:
+                shapes = _get_mesh_shapes(target, self.meshkeys)
+            if checkpoint:
+                results, done = self._create_checkpoint(checkpoint, shapes)
+            else:
+                results = {
+                    key: np.full(self.shape + shape, np.nan)
+                    for key, shape in zip(self.meshkeys, shapes)
+                }
+                done = np.zeros(self.shape, dtype=bool)
+
+        pending = [index for index in self.order if not done[index]]
+        chunks = [
+            pending[i:i+chunk_size] for i in range(0, len(pending), chunk_size)
+        ]
+        token = uuid.uuid4().hex
+        if pool:
+            completed = self._run_pool(pool, chunks, token)
+        else:
+            completed = self._run_session(target, pending, token, results)
+
+        unsaved = 0
+        try:
+            for index, data in completed:
+                if data is not None:
+                    for key, values in zip(self.meshkeys, data):
+                        results[key][index] = values
+                done[index] = True
+                unsaved += 1
+                if checkpoint and unsaved >= checkpoint_interval:
+                    _flush_checkpoint(results, done)
+                    unsaved = 0
+        finally:
+            completed.close()
+            if checkpoint and unsaved:
+                _flush_checkpoint(results, done)
+        return results
+
+    def _run_session(self, lt, indices, token, results):
+        """
+        Run the points in a single LightTools session.
+
+        The mesh data is written directly into the result arrays.
+
+        Yields:
+            tuple: The index of each completed point, and None.
+        """
+        if not indices:
+            return
+        originals = _get_values(lt, self.parameters)
+        try:
+            for index in indices:
+                _apply(lt, token, self.parameters, self.values(index))
+                lt.Cmd(self._command)
+                for key in self.meshkeys:
+                    arrays.get_mesh_data(
+                        lt, key, self._cellfilter, out=results[key][index]
+                    )
+                yield index, None
+        finally:
+            _restore(lt, self.parameters, originals)
+
+    def _run_pool(self, pool, chunks, token):
+        """
+        Run chunks of consecutive points as jobs of a session pool.
+
+        Yields:
+            tuple: The index and the mesh data of each completed point.
+        """
+        futures = [
+            pool.submit(
+                _run_points, token, self.parameters,
+                [(index, self.values(index)) for index in chunk],
+                self.meshkeys, self._cellfilter, self._command,
+            )
+            for chunk in chunks
+        ]
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                yield from future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _fingerprint(self):
+        """
+        Return a hash that identifies the sweep.
+
+        Returns:
+            str: The hex digest of the sweep definition.
+        """
+        definition = (
+            self.parameters, self._values, self.shape, self.meshkeys,
+            self._cellfilter, self._command,
+        )
+        return hashlib.sha1(repr(definition).encode()).hexdigest()
+
+    def _create_checkpoint(self, path, shapes):
+        """
+        Create the memory-mapped result arrays and the mask of completed
+        points in a checkpoint directory.
+
+        The sweep definition is written last, so that an incomplete
+        checkpoint is created again.
+
+        Args:
+            path (str): The checkpoint directory.
+            shapes (list): The (X_Dimension, Y_Dimension) tuples of the
+                meshes.
+
+        Returns:
+            tuple: The results dict and the boolean array of completed
+                points.
+        """
+        os.makedirs(path, exist_ok=True)
+        results = {}
+        for i, (key, shape) in enumerate(zip(self.meshkeys, shapes)):
+            results[key] = np.lib.format.open_memmap(
+                os.path.join(path, _CHECKPOINT_MESH.format(i)), mode="w+",
+                dtype=np.float64, shape=self.shape + shape,
+            )
+            results[key][...] = np.nan
+        done = np.lib.format.open_memmap(
+            os.path.join(path, _CHECKPOINT_DONE), mode="w+", dtype=bool,
+            shape=self.shape,
+        )
+        _flush_checkpoint(results, done)
+
+        filename = os.path.join(path, _CHECKPOINT_SWEEP)
+        with open(filename + ".tmp", "w") as f:
+            json.dump({"fingerprint": self._fingerprint()}, f)
+        os.replace(filename + ".tmp", filename)
+        return results, done
+
+    def _open_checkpoint(self, path):
+        """
+        Open the memory-mapped result arrays and the mask of completed
+        points of a checkpoint directory.
+
+        Returns:
+            tuple: The results dict and the boolean array of completed
+                points.
+        """
+        with open(os.path.join(path, _CHECKPOINT_SWEEP)) as f:
+            fingerprint = json.load(f)["fingerprint"]
+        if fingerprint != self._fingerprint():
+            msg = "Checkpoint {!r} belongs to a different sweep."
+            raise ValueError(msg.format(path))
+        results = {
+            key: np.load(
+                os.path.join(path, _CHECKPOINT_MESH.format(i)), mmap_mode="r+"
+            )
+            for i, key in enumerate(self.meshkeys)
+        }
+        done = np.load(os.path.join(path, _CHECKPOINT_DONE), mmap_mode="r+")
+        return results, done
+
+
+def _flush_checkpoint(results, done):
+    """
+    Write the modified parts of the memory-mapped checkpoint arrays to
+    disk.
+
+    The mesh data is flushed before the mask of completed points, so that
+    a point is never marked as completed without its data.
+    """
+    for data in results.values():
+        data.flush()
+    done.flush()
+
+
+def _snake_order(shape):
+    """
+    Return the indices of a grid in boustrophedon order.
+
+    Consecutive indices differ in exactly one axis by one.
+
+    Args:
+        shape (tuple): The shape of the grid.
+
+    Returns:
+        list: The index tuples.
+    """
+    if not shape:
+        return [()]
+    inner = _snake_order(shape[1:])
+    order = []
+    for i in range(shape[0]):
+        rows = inner if i % 2 == 0 else reversed(inner)
+        order.extend((i,) + index for index in rows)
+    return order
+
+
+def _greedy_order(values):
+    """
+    Return an order of the points in which consecutive points differ in
+    as few parameters as possible.
+
+    Starting with the first point, the next point is always the not yet
+    visited point with the fewest differing parameter values.
+
+    Args:
+        values (list): The parameter values of each point.
+
+    Returns:
+        list: The point numbers in the determined order.
+    """
+    if not values:
+        return []
+    # Encode the values of each parameter as integers for comparison.
+    codes = np.empty((len(values), len(values[0])), dtype=np.intp)
+    for col, column in enumerate(zip(*values)):
+        lookup = {}
+        codes[:, col] = [
+            lookup.setdefault(value, len(lookup)) for value in column
+        ]
+
+    remaining = np.ones(len(values), dtype=bool)
+    current = 0
+    order = [current]
+    remaining[current] = False
+    for __ in range(len(values) - 1):
+        candidates = np.flatnonzero(remaining)
+        changes = (codes[candidates] != codes[current]).sum(axis=1)
+        current = candidates[np.argmin(changes)]
+        order.append(int(current))
+        remaining[current] = False
+    return order
+
+
+def _apply(lt, token, parameters, values):
+    """
+    Set the parameters of a point in a LightTools session.
+
+    Parameters that already have the value set by the same sweep run
+    (identified by `token`) are not set again.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+        token (str): The identifier of the sweep run.
+        parameters (list): The (data key, data name) tuples of the
+            parameters.
+        values (tuple): The parameter values.
+    """
+    state = lt.__dict__.get("_sweep_values")
+    if state is None or state[0] != token:
+        state = lt.__dict__["_sweep_values"] = (token, {})
+    current = state[1]
+    for param, value in zip(parameters, values):
+        if param not in current or current[param] != value:
+            # Forget the value in case the call fails.
+            current.pop(param, None)
+            lt.DbSet(param[0], param[1], value)
+            current[param] = value
+
+
+def _get_values(lt, parameters):
+    """
+    Return the current values of the parameters in a LightTools session.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+        parameters (list): The (data key, data name) tuples of the
+            parameters.
+
+    Returns:
+        list: The parameter values.
+    """
+    return [lt.DbGet(datakey, dataname) for datakey, dataname in parameters]
+
+
+def _restore(lt, parameters, values):
+    """
+    Set the parameters of a LightTools session back to the given values.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+        parameters (list): The (data key, data name) tuples of the
+            parameters.
+        values (list): The original parameter values.
+    """
+    # The values set by the sweep run are no longer in place.
+    lt.__dict__.pop("_sweep_values", None)
+    for (datakey, dataname), value in zip(parameters, values):
+        lt.DbSet(datakey, dataname, value)
+
+
+def _run_points(lt, token, parameters, points, meshkeys, cellfilter,
+                command):
+    """
+    Run a chunk of parameter points in a LightTools session.
+
+    The parameters are restored afterwards, the session may run other
+    jobs of the pool next.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+        token (str): The identifier of the sweep run.
+        parameters (list): The (data key, data name) tuples of the
+            parameters.
+        points (list): The (index, values) tuples of the points.
+        meshkeys (list): The data keys of the meshes to collect.
+        cellfilter (str): The cell filter of the mesh data.
+        command (str): The command that runs the simulations.
+
+    Returns:
+        list: The (index, mesh data) tuples of the points.
+    """
+    results = []
+    originals = _get_values(lt, parameters)
+    try:
+        for index, values in points:
+            _apply(lt, token, parameters, values)
+            lt.Cmd(command)
+            data = [
+                arrays.get_mesh_data(lt, key, cellfilter) for key in meshkeys
+            ]
+            results.append((index, data))
+    finally:
+        _restore(lt, parameters, originals)
+    return results
+
+
+def _get_mesh_shapes(lt, meshkeys):
+    """
+    Return the dimensions of meshes.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+        meshkeys (list): The data keys of the meshes.
+
+    Returns:
+        list: The (X_Dimension, Y_Dimension) tuples of the meshes.
+    """
+    return [
+        (int(lt.DbGet(key, "X_Dimension")), int(lt.DbGet(key, "Y_Dimension")))
+        for key in meshkeys
+    ]
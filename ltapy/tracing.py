@@ -0,0 +1,285 @@
+"""
+This module provides tracing of LightTools API function calls.
+
+Tracing is disabled by default and then costs nothing but a single
+check per API function call.  If enabled, a compact record of each
+call (function name, argument summary, result summary, duration and
+status) is stored in a ring buffer of fixed size.  Nothing is formatted
+as string until the records are dumped, e.g. after an error.
+
+Examples:
+    Enable tracing, run some API function calls and show the most
+    recent calls.
+
+    >>> import ltapy.tracing
+    >>> ltapy.tracing.enable(size=100)
+    >>> lt.DbGet("LENS_MANAGER[1]", "Name")
+    'Lens Manager'
+    >>> print(ltapy.tracing.dump())
+    10:42:13.201  DbGet('LENS_MANAGER[1]', 'Name') -> 'Lens Manager'  [0, 0.412 ms]
+
+    If an API function call raises an APIError, the call records are
+    attached to the exception and written to the log (logger
+    ``ltapy.tracing``, level DEBUG).
+
+    >>> try:
+    ...     lt.DbGet("LENS_MANAGER[1]", "NoSuchItem")
+    ... except ltapy.error.APIError as e:
+    ...     print(ltapy.tracing.dump(e.trace))
+"""
+
+import collections
+import logging
+import time
+
+import numpy as np
+
+from . import config
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+# The active call tracer, None if tracing is disabled.  The wrapped API
+# methods check this variable on every call.
+_tracer = None
+
+# Maximum length of string values that are stored in a call record.
+_MAX_STR_LEN = 80
+
+
+class CallRecord(collections.namedtuple(
+        "CallRecord",
+        ["time", "name", "args", "kwargs", "result", "duration", "status"])):
+
+    """
+    A record of a single LightTools API function call.
+
+    Attributes:
+        time (float): The time of the call, in seconds since the epoch.
+        name (str): The name of the LightTools API function.
+        args (tuple): A summary of the positional arguments.
+        kwargs (dict): A summary of the keyword arguments.
+        result: A summary of the processed output value.
+        duration (float): The duration of the call in seconds.
+        status (int or str): The status code of the call, or the name of
+            the exception type if the call failed for another reason.
+    """
+
+    __slots__ = ()
+
+    def __str__(self):
+        params = [repr(arg) for arg in self.args]
+        params += [
+            "{}={!r}".format(key, value) for key, value in self.kwargs.items()
+        ]
+        clock = time.strftime("%H:%M:%S", time.localtime(self.time))
+        msecs = int(self.time * 1000) % 1000
+        return "{}.{:03d}  {}({}) -> {!r}  [{}, {:.3f} ms]".format(
+            clock, msecs, self.name, ", ".join(params), self.result,
+            self.status, self.duration * 1000,
+        )
+
+
+class Shape(collections.namedtuple("Shape", ["kind", "shape", "dtype"])):
+
+    """
+    A summary of an array-like value, replacing the value in a call record.
+
+    Attributes:
+        kind (str): The type name of the value, e.g. 'ndarray' or 'list'.
+        shape (tuple): The shape of the value.
+        dtype (str): The data type of an ndarray, None otherwise.
+    """
+
+    __slots__ = ()
+
+    def __repr__(self):
+        s = "<{} {}".format(self.kind, "x".join(map(str, self.shape)))
+        if self.dtype:
+            s += " " + self.dtype
+        return s + ">"
+
+
+class CallTracer:
+
+    """
+    Keep records of the most recent LightTools API function calls.
+
+    Args:
+        size (int): The maximum number of records to keep.  Older records
+            are discarded.
+    """
+
+    def __init__(self, size):
+        self._records = collections.deque(maxlen=size)
+
+    @property
+    def size(self):
+        """
+        int: The maximum number of records to keep.
+        """
+        return self._records.maxlen
+
+    def record(self, name, args, kwargs, result, duration, status):
+        """
+        Add a record of a LightTools API function call.
+
+        The arguments and the result are summarized, so that no large
+        objects are referenced or copied by the record.
+
+        Args:
+            name (str): The name of the LightTools API function.
+            args (tuple): The positional arguments of the call.
+            kwargs (dict): The keyword arguments of the call.
+            result: The processed output value of the call.
+            duration (float): The duration of the call in seconds.
+            status (int or str): The status code of the call.
+        """
+        self._records.append(CallRecord(
+            time=time.time(),
+            name=name,
+            args=tuple(_summarize(arg) for arg in args),
+            kwargs={key: _summarize(value) for key, value in kwargs.items()},
+            result=_summarize(result),
+            duration=duration,
+            status=status,
+        ))
+
+    def records(self):
+        """
+        Return the call records, oldest first.
+
+        Returns:
+            list: The recorded CallRecord objects.
+        """
+        return list(self._records)
+
+    def clear(self):
+        """
+        Remove all call records.
+        """
+        self._records.clear()
+
+
+def enable(size=config.TRACE_SIZE):
+    """
+    Enable tracing of LightTools API function calls.
+
+    Args:
+        size (int, optional): The maximum number of call records to keep.
+            Existing records are kept if tracing is already enabled, as
+            far as they fit into the new size.
+    """
+    global _tracer
+    records = _tracer.records() if _tracer else []
+    tracer = CallTracer(size)
+    tracer._records.extend(records)
+    _tracer = tracer
+
+
+def disable():
+    """
+    Disable tracing of LightTools API function calls.
+
+    All call records are discarded.
+    """
+    global _tracer
+    _tracer = None
+
+
+def is_enabled():
+    """
+    Check if tracing of LightTools API function calls is enabled.
+
+    Returns:
+        bool: True if tracing is enabled.
+    """
+    return _tracer is not None
+
+
+def records():
+    """
+    Return the records of the most recent LightTools API function calls.
+
+    Returns:
+        list: The recorded CallRecord objects, oldest first.  The list is
+            empty if tracing is disabled.
+    """
+    return _tracer.records() if _tracer else []
+
+
+def clear():
+    """
+    Remove all records of LightTools API function calls.
+    """
+    if _tracer:
+        _tracer.clear()
+
+
+def dump(trace=None):
+    """
+    Return the records of the most recent LightTools API function calls
+    as string.
+
+    Args:
+        trace (list, optional): The call records to format, e.g. the
+            trace of an APIError.  Defaults to the current records.
+
+    Returns:
+        str: One line per call record, oldest first.
+    """
+    if trace is None:
+        trace = records()
+    return "\n".join(str(record) for record in trace)
+
+
+class _Dump:
+
+    """
+    Format call records only when converted to a string, e.g. by a log
+    handler.
+    """
+
+    __slots__ = ("trace",)
+
+    def __init__(self, trace):
+        self.trace = trace
+
+    def __str__(self):
+        return dump(self.trace)
+
+
+def _summarize(value):
+    """
+    Return a compact summary of the given value.
+
+    Scalars and short strings are kept as they are.  Arrays and (nested)
+    sequences are replaced by their shape.
+
+    Args:
+        value: The value to summarize.
+
+    Returns:
+        The summary of the value.
+    """
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        if len(value) > _MAX_STR_LEN:
+            return value[:_MAX_STR_LEN-3] + "..."
+        return value
+    if isinstance(value, np.ndarray):
+        return Shape(type(value).__name__, value.shape, value.dtype.name)
+    if isinstance(value, (list, tuple)):
+        # Determine the shape from the first element of each nesting
+        # level, which is sufficient for the rectangular arrays used by
+        # the LightTools API.
+        shape = []
+        item = value
+        while isinstance(item, (list, tuple)):
+            shape.append(len(item))
+            if not item:
+                break
+            item = item[0]
+        return Shape(type(value).__name__, tuple(shape), None)
+    return "<{}>".format(type(value).__name__)
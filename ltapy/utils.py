@@ -2,6 +2,8 @@
 This module provides utility functions, useful for external consumption.
 """
 
+import os
+
 import numpy as np
 
 
@@ -45,3 +47,22 @@ def get_current_file_folder(lt):
         str: The file folder of the current LightTools file.
     """
     return lt.DbGet("LENS_MANAGER[1]", "Current File Folder")
+
+
+def open_file(lt, filename):
+    """
+    Open a LightTools file without showing a file dialog box.
+
+    The SHOWFILEDIALOGBOX option is restored afterwards.
+
+    Args:
+        lt (ILTAPIx): A handle to the LightTools session.
+        filename (str): The path of the LightTools file.
+    """
+    path = "/".join(os.path.abspath(filename).split("\\"))
+    show_dialog = lt.GetOption("SHOWFILEDIALOGBOX")
+    lt.SetOption("SHOWFILEDIALOGBOX", 0)
+    try:
+        lt.Cmd("Open " + lt.Str(path))
+    finally:
+        lt.SetOption("SHOWFILEDIALOGBOX", show_dialog)
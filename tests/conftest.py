@@ -1,7 +1,10 @@
 import os
+import threading
+import time
 
 import pytest
 
+import ltapy.error
 import ltapy.session
 
 
@@ -49,3 +52,108 @@ def lt(request):
     open_file(ltapi, getattr(request.module, "FILENAME"))
     teardown(ltapi, interactive, request)
     return ltapi
+
+
+class StandInLTAPI:
+
+    # Mimics the LightTools API object, for tests that don't need a
+    # LightTools session.  The object may only be used by the thread that
+    # created it.
+    #
+    # - DbGet() and DbSet() access `values`, a mapping of (data key, data
+    #   name) tuples to values.  DbGet() fails for unknown data items.
+    # - GetOption() and SetOption() access `options`.
+    # - Cmd() takes `cmd_time` seconds and fails for commands that contain
+    #   `fail_on`.  If a `model` is required, commands fail until it is
+    #   set.  After `crash_after` commands, the session crashes.
+    # - Lists hold the `keys` at the time of their creation.
+    # - Version() returns `version`.
+    #
+    # The calls that change the session are recorded in `calls`.
+
+    def __init__(self, values=None, options=None, keys=(), cmd_time=0.0,
+                 fail_on=None, model="model.lts", crash_after=None,
+                 version="8.5.0"):
+        self.thread = threading.get_ident()
+        self.values = dict(values or {})
+        self.options = dict(options or {})
+        self.keys = list(keys)
+        self.cmd_time = cmd_time
+        self.fail_on = fail_on
+        self.model = model
+        self.crash_after = crash_after
+        self.version = version
+        self.commands = 0
+        self.calls = []
+        self.lists = set()
+        self.items = {}
+
+    def _check_thread(self):
+        assert threading.get_ident() == self.thread
+
+    def DbGet(self, dataKey, dataName):
+        self._check_thread()
+        try:
+            return self.values[dataKey, dataName]
+        except KeyError:
+            raise ltapy.error.APIError(self, -1)
+
+    def DbSet(self, dataKey, dataName, dataValue):
+        self._check_thread()
+        self.calls.append(("DbSet", dataKey, dataName, dataValue))
+        self.values[dataKey, dataName] = dataValue
+
+    def GetOption(self, name):
+        self._check_thread()
+        return self.options[name]
+
+    def SetOption(self, name, value):
+        self._check_thread()
+        self.calls.append(("SetOption", name, value))
+        self.options[name] = value
+
+    def Str(self, s):
+        return '"{}"'.format(s)
+
+    def Cmd(self, cmd):
+        self._check_thread()
+        self.calls.append(("Cmd", cmd))
+        self.commands += 1
+        if self.crash_after is not None and self.commands > self.crash_after:
+            raise RuntimeError("LightTools crashed.")
+        time.sleep(self.cmd_time)
+        if self.model is None or (self.fail_on and self.fail_on in cmd):
+            raise ltapy.error.APIError(self, -1)
+
+    def Version(self, flag):
+        self._check_thread()
+        return self.version
+
+    def GetStatusString(self, status):
+        self._check_thread()
+        return "Failed"
+
+    def _DbList(self, dataKey, filter):
+        self._check_thread()
+        listkey = "@list{}".format(len(self.items))
+        self.lists.add(listkey)
+        self.items[listkey] = list(self.keys)
+        return listkey
+
+    def ListDelete(self, listKey):
+        self._check_thread()
+        self.lists.remove(listKey)
+
+    def ListSize(self, listKey):
+        self._check_thread()
+        return len(self.items[listKey])
+
+    def ListAtPos(self, listKey, positionOfList):
+        self._check_thread()
+        return self.items[listKey][positionOfList-1]
+
+
+@pytest.fixture
+def standin():
+    # Return the class of the LightTools API stand-in.
+    return StandInLTAPI
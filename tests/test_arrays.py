@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+import ltapy.arrays
+
+FILENAME = "ltapi.lts"
+
+
+def test_mesh_data(lt):
+    mshkey = (
+        "LENS_MANAGER[1].ILLUM_MANAGER[Illumination_Manager]"
+        ".RECEIVERS[Receiver_List].FARFIELD_RECEIVER[farFieldReceiver_2]"
+        ".FORWARD_SIM_FUNCTION[Forward_Simulation]"
+        ".INTENSITY_MESH[Intensity_Mesh]"
+    )
+    lng = int(lt.DbGet(mshkey, "X_Dimension"))
+    lat = int(lt.DbGet(mshkey, "Y_Dimension"))
+    expected = lt.GetMeshData(
+        meshKey=mshkey,
+        dataArray=np.empty((lng, lat)).tolist(),
+    )
+
+    data = ltapy.arrays.get_mesh_data(lt, mshkey)
+    assert data.dtype == np.float64
+    assert np.array_equal(data, expected)
+
+    out = np.empty((lng, lat))
+    data = ltapy.arrays.get_mesh_data(lt, mshkey, out=out)
+    assert data is out
+    assert np.array_equal(data, expected)
+
+    with pytest.raises(ValueError):
+        ltapy.arrays.get_mesh_data(lt, mshkey, out=np.empty((lng+1, lat)))
+
+
+def test_mismatched_output_array(standin):
+    mshkey = "mesh"
+    lt = standin({(mshkey, "X_Dimension"): 3, (mshkey, "Y_Dimension"): 2})
+    with pytest.raises(ValueError, match="shape"):
+        ltapy.arrays.get_mesh_data(lt, mshkey, out=np.empty((2, 3)))
+    with pytest.raises(ValueError, match="dtype"):
+        ltapy.arrays.get_mesh_data(
+            lt, mshkey, out=np.empty((3, 2), dtype=np.float32)
+        )
+
+
+def test_freeform_surface_points(lt):
+    ffskey = (
+        "LENS_MANAGER[1].COMPONENTS[Components].SOLID[FreeformEntity_7]"
+        ".FREEFORM_PRIMITIVE[FreeformPrimitive_1]"
+        ".FREEFORM_SURFACE[FrontSurface]"
+    )
+    u = int(lt.DbGet(ffskey, "NumPointsInU"))
+    v = int(lt.DbGet(ffskey, "NumPointsInV"))
+    expected = lt.GetFreeformSurfacePoints(
+        surfaceKey=ffskey,
+        surfacePoints=np.empty((u, v, 3)).tolist(),
+    )
+    data = ltapy.arrays.get_freeform_surface_points(lt, ffskey)
+    assert np.array_equal(data, expected)
+
+
+def test_spline_data(lt):
+    srfkey = (
+        "LENS_MANAGER[1].COMPONENTS[Components].SOLID[Lens_12]"
+        ".CIRC_LENS_PRIMITIVE[LP_3]"
+        ".SPLINESWEEP_LENS_SURFACE[LensRearSurface]"
+    )
+    expected = lt.GetSplineData(
+        surfKey=srfkey,
+        dataArray=np.empty((5, 2)).tolist(),
+    )
+    data = ltapy.arrays.get_spline_data(lt, srfkey, shape=(5, 2))
+    assert np.array_equal(data, expected)
+
+
+def test_swept_profile_points(lt):
+    sptkey = (
+        "LENS_MANAGER[1].COMPONENTS[Components].SOLID[SweptEntity_10]"
+        ".SWEPT_PRIMITIVE[SweptPrimitive_5]"
+    )
+    numpoints = int(lt.DbGet(sptkey, "NumPoints"))
+    expected = lt.GetSweptProfilePoints(
+        profileKey=sptkey,
+        profilePoints=np.empty((numpoints, 2)).tolist(),
+    )
+    data = ltapy.arrays.get_swept_profile_points(lt, sptkey)
+    assert np.array_equal(data, expected)
+
+
+def test_receiver_ray_data(lt):
+    fwskey = (
+        "LENS_MANAGER[1].ILLUM_MANAGER[Illumination_Manager]"
+        ".RECEIVERS[Receiver_List].FARFIELD_RECEIVER[farFieldReceiver_2]"
+        ".FORWARD_SIM_FUNCTION[Forward_Simulation]"
+    )
+    items = ["RayDataX", "RayDataY", "RayDataWavelength"]
+    data = ltapy.arrays.get_receiver_ray_data(lt, fwskey, items, numrays=10)
+    assert data.shape == (10, 3)
+    assert data[0, -1] == 550
@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+import ltapy.error
+from ltapy import _comutils
+
+
+def test_file_lock(tmpdir):
+    path = str(tmpdir.join("registry.lock"))
+    active = []
+    overlaps = []
+
+    def work():
+        for __ in range(10):
+            with _comutils.FileLock(path):
+                active.append(1)
+                overlaps.append(len(active))
+                time.sleep(0.001)
+                active.pop()
+
+    threads = [threading.Thread(target=work) for __ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(overlaps) == 1
+    assert not tmpdir.join("registry.lock").exists()
+
+    with _comutils.FileLock(path):
+        with pytest.raises(ltapy.error.TimeOutError):
+            with _comutils.FileLock(path, timeout=0.1):
+                pass
+
+
+def test_file_lock_broken(tmpdir, monkeypatch):
+    path = str(tmpdir.join("registry.lock"))
+    monkeypatch.setattr(_comutils, "_STALE_LOCK_AGE", 0.05)
+    with _comutils.FileLock(path):
+        # Another process breaks the lock as stale and takes it over.
+        time.sleep(0.1)
+        other = _comutils.FileLock(path, timeout=0.1)
+        other.__enter__()
+    # The lock of the other process is left alone.
+    assert tmpdir.join("registry.lock").exists()
+    other.__exit__(None, None, None)
+    assert not tmpdir.join("registry.lock").exists()
+
+
+def test_file_lock_broken_late(tmpdir, monkeypatch):
+    path = str(tmpdir.join("registry.lock"))
+    monkeypatch.setattr(_comutils, "_STALE_LOCK_AGE", 0.05)
+    stale = _comutils.FileLock(path).__enter__()
+    owner = stale._token
+    time.sleep(0.1)
+    with _comutils.FileLock(path, timeout=0.1) as lock:
+        # A process that found the stale lock as well breaks it late.
+        _comutils.FileLock(path)._break(owner)
+        with open(path) as f:
+            assert f.read() == lock._token
+    assert tmpdir.listdir() == []
@@ -1,5 +1,9 @@
+import gc
+import threading
+
 import pytest
 
+import ltapy._dbaccess
 import ltapy.error
 
 FILENAME = "dbaccess.lts"
@@ -52,12 +56,40 @@ def test_item_access(lt):
     assert solids[numsolids:] == []
 
 
+def test_slicing(lt):
+    solids = lt.DbList("LENS_MANAGER[1].COMPONENTS[Components]", "SOLID")
+    numsolids = lt.ListSize(solids)
+    keys = [lt.ListAtPos(solids, i+1) for i in range(numsolids)]
+    for key in [slice(-3, None), slice(None, None, -1), slice(None, None, 2),
+                slice(4, 1, -2), slice(-2, -10, -1), slice(10, 20)]:
+        assert solids[key] == keys[key]
+
+
 def test_membership(lt):
     solids = lt.DbList("LENS_MANAGER[1].COMPONENTS[Components]", "SOLID")
     assert "Toroid_4" in solids
     assert "Toroid_xx" not in solids
 
 
+def test_name_index(lt):
+    solids = lt.DbList(
+        "LENS_MANAGER[1].COMPONENTS[Components]", "SOLID", index=True
+    )
+    assert "Toroid_4" in solids
+    assert "Toroid_xx" not in solids
+    assert solids["Toroid_4"] == lt.ListAtPos(solids, 4)
+    with pytest.raises(KeyError):
+        solids["Toroid_xx"]
+    assert solids.keys_for(["Cube_1", "Toroid_4"]) == [
+        lt.ListAtPos(solids, 1), lt.ListAtPos(solids, 4)
+    ]
+    with pytest.raises(KeyError):
+        solids.keys_for(["Toroid_xx"])
+    assert solids.get("Toroid_4") == lt.ListAtPos(solids, 4)
+    assert solids.get("Toroid_xx") is None
+    assert solids.get("Toroid_xx", "") == ""
+
+
 def test_iteration(lt):
     solids = lt.DbList("LENS_MANAGER[1].COMPONENTS[Components]", "SOLID")
     for i, solid in enumerate(solids):
@@ -73,8 +105,162 @@ def test_iteration(lt):
     assert i is None
 
 
+def test_snapshot(lt):
+    solids = lt.DbList(
+        "LENS_MANAGER[1].COMPONENTS[Components]", "SOLID", snapshot=True
+    )
+    numsolids = lt.ListSize(solids)
+    assert len(solids) == numsolids
+    assert list(solids) == [
+        lt.ListAtPos(solids, i+1) for i in range(numsolids)
+    ]
+    assert solids[-1] == lt.ListAtPos(solids, numsolids)
+    assert solids[1:3] == [lt.ListAtPos(solids, 2), lt.ListAtPos(solids, 3)]
+    assert solids["Toroid_4"] == lt.ListAtPos(solids, 4)
+    with pytest.raises(IndexError):
+        solids[numsolids]
+    assert solids.refresh() is solids
+    assert len(solids) == numsolids
+
+
+def test_nested_iteration(lt):
+    solids = lt.DbList("LENS_MANAGER[1].COMPONENTS[Components]", "SOLID")
+    keys = [lt.ListAtPos(solids, i+1) for i in range(lt.ListSize(solids))]
+    pairs = [(a, b) for a in solids.iterate(chunk_size=2) for b in solids]
+    assert pairs == [(a, b) for a in keys for b in keys]
+
+    iterator = iter(solids)
+    assert next(iterator) == keys[0]
+    assert list(solids) == keys
+    assert list(iterator) == keys[1:]
+
+
 def test_garbage_collection(lt):
     # The DbList object must not be garbage collected if no name is
     # assigned to the list.
     cylinder = lt.DbList("LENS_MANAGER[1].COMPONENTS[Components]", "SOLID")[-1]
     assert lt.DbGet(cylinder, "Name") == "Cylinder_5"
+
+
+def test_list_lifecycle(lt):
+    compkey = "LENS_MANAGER[1].COMPONENTS[Components]"
+    count = lt.dblist_count()
+
+    solids = lt.DbList(compkey, "SOLID")
+    assert lt.DbList(compkey, "SOLID") == solids
+    assert lt.dblist_count() == count + 1
+
+    with lt.DbList(compkey, "SW_PART_SOLID") as sw_part_solids:
+        assert lt.dblist_count() == count + 2
+    assert lt.dblist_count() == count + 1
+    with pytest.raises(ltapy.error.APIError):
+        lt.ListSize(sw_part_solids)
+
+    del solids
+    gc.collect()
+    assert lt.dblist_count() == count
+
+
+def test_shared_list(lt):
+    # Two objects share the server-side list, but their iterations and
+    # slices don't interfere.
+    compkey = "LENS_MANAGER[1].COMPONENTS[Components]"
+    solids1 = lt.DbList(compkey, "SOLID")
+    solids2 = lt.DbList(compkey, "SOLID")
+    assert solids1 == solids2
+    keys = [lt.ListAtPos(solids1, i+1) for i in range(lt.ListSize(solids1))]
+
+    pairs = []
+    for key1, key2 in zip(solids1.iterate(chunk_size=1), solids2):
+        pairs.append((key1, key2, solids2[::-1]))
+    assert pairs == [(key, key, keys[::-1]) for key in keys]
+
+
+def test_list_release_on_other_thread(standin):
+    lt = standin(keys=["@a", "@b"])
+    solids = ltapy._dbaccess.DbList(lt, "COMPONENTS[1]", "SOLID")
+    assert list(solids) == ["@a", "@b"]
+    registry = lt.__dict__["_dblists"]
+
+    # The object is collected on another thread, which must not call
+    # LightTools.
+    thread = threading.Thread(target=solids._finalizer)
+    thread.start()
+    thread.join()
+    assert len(lt.lists) == 1
+
+    # The list is deleted on the next request by the owning thread.
+    del solids
+    lenses = ltapy._dbaccess.DbList(lt, "COMPONENTS[1]", "LENS")
+    assert lt.lists == {str(lenses)}
+    assert len(registry) == 1
+
+
+def test_refresh(standin):
+    lt = standin(keys=["@a", "@b"])
+    solids = ltapy._dbaccess.DbList(lt, "COMPONENTS[1]", "SOLID", True)
+    lt.keys.append("@c")
+    assert list(solids) == ["@a", "@b"]
+
+    # The list is created again, the original one is kept for the value.
+    assert list(solids.refresh()) == ["@a", "@b", "@c"]
+    assert len(lt.lists) == 2
+    assert lt.ListSize(solids) == 2
+
+    # New requests share the refreshed list, the previous refreshed list
+    # is released.
+    lenses = ltapy._dbaccess.DbList(lt, "COMPONENTS[1]", "SOLID")
+    assert len(lenses) == 3
+    solids.refresh()
+    del lenses
+    solids.refresh()
+    assert len(lt.lists) == 3
+    del solids
+    ltapy._dbaccess.DbList(lt, "COMPONENTS[1]", "LENS")
+    assert len(lt.lists) == 1
+
+
+def test_write_buffer_failed_flush():
+    written = []
+    fail = ["Y"]
+
+    def dbset(dataKey, dataName, dataValue, i, j):
+        if dataName in fail:
+            raise ltapy.error.APIError("DbSet", -1)
+        written.append((dataName, dataValue))
+
+    buffer = ltapy._dbaccess.WriteBuffer(dbset)
+    buffer.set("@a", "X", 1)
+    buffer.set("@a", "Y", 2)
+    buffer.set("@a", "Z", 3)
+    with pytest.raises(ltapy.error.APIError):
+        buffer.flush()
+    # The failed value stays in the buffer.
+    assert written == [("X", 1)]
+    assert len(buffer) == 2
+    assert buffer.get("@a", "Y") == 2
+    fail.clear()
+    buffer.flush()
+    assert written == [("X", 1), ("Y", 2), ("Z", 3)]
+    assert len(buffer) == 0
+
+
+def test_get_many_mixed_rows():
+    values = {
+        ("@a", "Name"): "Cube_1", ("@a", "Value"): 1.0,
+        ("@b", "Name"): "Sphere_2", ("@b", "Value"): "n/a",
+    }
+
+    def dbget(key, name, i):
+        return values[key, name]
+
+    # The second row decides the type of the Value field.
+    data = ltapy._dbaccess.get_many(dbget, ["@a", "@b"], ["Name", "Value"])
+    assert data.dtype.names == ("Name", "Value")
+    assert data.dtype["Value"] == object
+    assert list(data["Value"]) == [1.0, "n/a"]
+
+    data = ltapy._dbaccess.get_many(dbget, ["@a"], ["Value"])
+    assert data.dtype == float
+    assert data.shape == (1, 1)
+    assert ltapy._dbaccess.get_many(dbget, [], ["Value"]).shape == (0, 1)
@@ -0,0 +1,135 @@
+import collections
+import contextlib
+import time
+
+import pytest
+
+import ltapy.config
+import ltapy.inventory
+import ltapy.session
+import ltapy.utils
+
+FILENAME = "ltapi.lts"
+
+
+def test_session_inventory(lt):
+    pid = lt.GetServerID()
+    with ltapy.inventory.SessionInventory() as inventory:
+        # The version and file folder are queried in the background.
+        deadline = time.time() + 10
+        while True:
+            infos = {info.pid: info for info in inventory.snapshot()}
+            assert pid in infos
+            if infos[pid].file_folder is not None or time.time() > deadline:
+                break
+            time.sleep(0.1)
+
+        info = infos[pid]
+        assert info.version == ltapy.config.LT_VERSION
+        assert info.file_folder == ltapy.utils.get_current_file_folder(lt)
+        assert info.rss > 0
+        assert not info.busy
+
+        start = time.time()
+        inventory.snapshot()
+        assert time.time() - start < 0.5
+
+
+class StandInProcess:
+
+    # Mimics the psutil.Process methods used by the inventory.
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.running = True
+        self.cpu_calls = 0
+
+    def is_running(self):
+        return self.running
+
+    def oneshot(self):
+        return contextlib.ExitStack()
+
+    def cpu_percent(self, interval):
+        self.cpu_calls += 1
+        return 0.0 if self.cpu_calls == 1 else 50.0
+
+    def memory_info(self):
+        return collections.namedtuple("pmem", ["rss"])(1024)
+
+
+class StandInRunningObjectTable:
+
+    # Mimics the Running Object Table with two LightTools sessions.  The
+    # sessions in `failures` can't be bound the first time.
+
+    failures = set()
+
+    def find_names(self, prefix):
+        return [prefix + "1912", prefix + "6940"]
+
+    def get_object(self, name):
+        if name in self.failures:
+            self.failures.remove(name)
+            raise ValueError(name)
+        return name
+
+
+@pytest.fixture
+def host(monkeypatch, standin):
+    # Replace the processes and sessions of the host with stand-ins.
+    procs = {1912: StandInProcess(1912), 6940: StandInProcess(6940)}
+    searches = []
+
+    def find_processes():
+        searches.append(time.time())
+        return {pid: proc for pid, proc in procs.items() if proc.running}
+
+    def connect(comobj):
+        folder = ("LENS_MANAGER[1]", "Current File Folder")
+        return standin({folder: "C:/models"})
+
+    monkeypatch.setattr(ltapy.inventory, "_find_processes", find_processes)
+    monkeypatch.setattr(
+        ltapy.inventory._comutils, "RunningObjectTable",
+        StandInRunningObjectTable,
+    )
+    monkeypatch.setattr(StandInRunningObjectTable, "failures", set())
+    monkeypatch.setattr(ltapy.inventory._ltapi, "LTAPI", connect)
+    return procs, searches
+
+
+def test_process_search(host):
+    procs, searches = host
+    with ltapy.inventory.SessionInventory(scan_interval=60) as inventory:
+        # The CPU usage is measured since the processes were found.
+        infos = inventory.snapshot()
+        assert [info.pid for info in infos] == [1912, 6940]
+        assert [info.cpu_percent for info in infos] == [50.0, 50.0]
+        assert all(info.busy for info in infos)
+
+        # Only the known processes are checked until the next search.
+        procs[6940].running = False
+        infos = inventory.snapshot()
+        assert [info.pid for info in infos] == [1912]
+        assert len(searches) == 1
+
+    with ltapy.inventory.SessionInventory(scan_interval=0) as inventory:
+        inventory.snapshot()
+        inventory.snapshot()
+        assert len(searches) == 3
+
+
+def test_probe_restart(host, caplog):
+    StandInRunningObjectTable.failures.add(ltapy.session.ROT_PREFIX + "1912")
+    with ltapy.inventory.SessionInventory(probe_interval=0.05) as inventory:
+        # The probe of the first session fails, and is replaced.
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            infos = {info.pid: info for info in inventory.snapshot()}
+            if 1912 in infos and infos[1912].version is not None:
+                break
+            time.sleep(0.01)
+        assert infos[1912].version == "8.5.0"
+        assert infos[1912].file_folder == "C:/models"
+    assert "1912 failed" in caplog.text
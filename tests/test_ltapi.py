@@ -1,8 +1,13 @@
+import gc
 import os
+import threading
+import time
 
 import numpy as np
 import pytest
 
+import ltapy._ltapi
+import ltapy._profiling
 import ltapy.config
 import ltapy.error
 import ltapy.utils
@@ -423,3 +428,297 @@ class TestViewAccessFunctions:
         assert lt.ViewGet(key, "UCSDisplayStyle") == "OpenArrowHead"
         lt.ViewSet(key, "UCSDisplayStyle", "Planes")
         assert lt.ViewGet(key, "UCSDisplayStyle") == "Planes"
+
+
+class TestEnhancedFunctions:
+
+    def test_batched_database_access(self, lt):
+        compkey = "LENS_MANAGER[1].COMPONENTS[Components]"
+        solids = list(lt.DbList(compkey, "SOLID"))
+        data = lt.DbGetMany(solids, ["X", "Y", "Z"])
+        assert data.shape == (len(solids), 3)
+        assert data[0, 1] == lt.DbGet(solids[0], "Y")
+
+        data = lt.DbGetMany(solids, ["Name", "X"])
+        assert data.dtype.names == ("Name", "X")
+        assert data["Name"][-1] == lt.DbGet(solids[-1], "Name")
+
+        prmkey = (
+            "LENS_MANAGER[1].COMPONENTS[Components].SOLID[ExtrudedPolygon_5]"
+            ".EXTRUSION_PRIMITIVE[ExtrusionPrimitive_4]"
+        )
+        data = lt.DbGetMany([prmkey], [("Vertex_X_At", 1), ("Vertex_X_At", 2)])
+        assert data[0, 1] == lt.DbGet(prmkey, "Vertex_X_At", None, i=2)
+
+        with pytest.raises(ltapy.error.APIError):
+            lt.DbGetMany(solids, ["XX"])
+
+    def test_deferred_writes(self, lt):
+        sphkey = "LENS_MANAGER[1].COMPONENTS[Components].SOLID[Sphere_1]"
+        x = lt.DbGet(sphkey, "X")
+        y = lt.DbGet(sphkey, "Y")
+        try:
+            with lt.deferred_writes() as buffer:
+                lt.DbSet(sphkey, "X", x + 1)
+                lt.DbSet(sphkey, "X", x + 2)
+                assert len(buffer) == 1
+                assert lt.DbGet(sphkey, "X") == x + 2
+                assert lt._DbGet(sphkey, "X") == x
+                with lt.deferred_writes():
+                    lt.DbSet(sphkey, "Y", y + 1)
+                assert len(buffer) == 2
+            assert lt.DbGet(sphkey, "X") == x + 2
+            assert lt.DbGet(sphkey, "Y") == y + 1
+
+            with lt.deferred_writes() as buffer:
+                lt.DbSet(sphkey, "X", x)
+                buffer.flush()
+                assert len(buffer) == 0
+                assert lt._DbGet(sphkey, "X") == x
+
+            # The values are discarded if the block raises.
+            with pytest.raises(ZeroDivisionError):
+                with lt.deferred_writes():
+                    lt.DbSet(sphkey, "X", x + 3)
+                    1 / 0
+            assert lt.DbGet(sphkey, "X") == x
+        finally:
+            lt.DbSet(sphkey, "X", x)
+            lt.DbSet(sphkey, "Y", y)
+
+    def test_bulk_edit(self, lt):
+        sphkey = "LENS_MANAGER[1].COMPONENTS[Components].SOLID[Sphere_1]"
+        x = lt.DbGet(sphkey, "X")
+        assert lt.GetOption("DBUPDATE") == 1
+        try:
+            with lt.bulk_edit():
+                assert lt.GetOption("DBUPDATE") == 0
+                with lt.bulk_edit():
+                    lt.DbSet(sphkey, "X", x + 1)
+                assert lt.GetOption("DBUPDATE") == 0
+                lt.DbSet(sphkey, "X", x + 2)
+            assert lt.GetOption("DBUPDATE") == 1
+            assert lt.DbGet(sphkey, "X") == x + 2
+
+            with pytest.raises(ltapy.error.APIError):
+                with lt.bulk_edit():
+                    lt.DbSet(sphkey, "XX", 1)
+            assert lt.GetOption("DBUPDATE") == 1
+        finally:
+            lt.DbSet(sphkey, "X", x)
+
+    def test_property_cache(self, lt):
+        sphkey = "LENS_MANAGER[1].COMPONENTS[Components].SOLID[Sphere_1]"
+        cylkey = "LENS_MANAGER[1].COMPONENTS[Components].SOLID[Cylinder_6]"
+        assert lt.cache_info() is None
+        lt.enable_cache(scope="key")
+        for i in range(3):
+            lt.DbGet(sphkey, "Name")
+            lt.DbGet(cylkey, "Name")
+        info = lt.cache_info()
+        assert (info.hits, info.misses, info.currsize) == (4, 2, 2)
+
+        x = lt.DbGet(sphkey, "X")
+        lt.DbSet(sphkey, "X", x + 1)
+        assert lt.DbGet(sphkey, "X") == x + 1
+        assert lt.cache_info().currsize == 2
+
+        lt.Cmd("\\V3D")
+        assert lt.cache_info().currsize == 0
+
+        lt.enable_cache(scope="session")
+        lt.DbGet(cylkey, "Name")
+        lt.DbSet(sphkey, "X", x)
+        assert lt.cache_info().currsize == 0
+        lt.disable_cache()
+        assert lt.cache_info() is None
+
+    def test_stats(self, lt):
+        sphkey = "LENS_MANAGER[1].COMPONENTS[Components].SOLID[Sphere_1]"
+        lt.reset_stats()
+        lt.enable_stats()
+        for i in range(10):
+            lt.DbGet(sphkey, "X")
+        stats = lt.stats()["DbGet"]
+        assert stats["calls"] == 10
+        assert stats["errors"] == 0
+        assert abs(stats["total"] - stats["com"] - stats["python"]) < PRECISION
+        assert stats["p50"] <= stats["p99"] <= stats["max"]
+        lt.enable_stats(False)
+
+        with lt.profile() as prof:
+            with pytest.raises(ltapy.error.APIError):
+                lt.DbGet(sphkey, "XX")
+        assert prof.stats()["DbGet"]["errors"] == 1
+        assert lt.stats()["DbGet"]["calls"] == 10
+
+        lt.reset_stats()
+        assert lt.stats() == {}
+
+    def test_class_cache(self, lt):
+        # A second connection reuses the enhanced class of the first one.
+        lt2 = ltapy._ltapi.LTAPI(lt._oleobj_)
+        assert type(lt2) is type(lt)
+        assert type(lt) in ltapy._ltapi._LTAPI_CLASSES.values()
+        sphkey = "LENS_MANAGER[1].COMPONENTS[Components].SOLID[Sphere_1]"
+        assert lt2.DbGet(sphkey, "Name") == lt.DbGet(sphkey, "Name")
+        with pytest.raises(ltapy.error.APIError):
+            lt2.DbGet(sphkey, "XX")
+
+        # The state of the enhancements is not shared between objects.
+        lt.enable_cache()
+        assert lt2.cache_info() is None
+        lt.disable_cache()
+
+
+def test_bulk_edit_failed_begin(standin):
+    class StandInBulkEditLTAPI(standin):
+
+        fail_begin = False
+
+        def Begin(self):
+            if self.fail_begin:
+                raise ltapy.error.APIError(self, -1)
+            self.calls.append(("Begin",))
+
+        def End(self):
+            self.calls.append(("End",))
+
+    lt = StandInBulkEditLTAPI(options={"DBUPDATE": 1})
+    ltapy._ltapi._enable_bulk_edit(lt)
+
+    # The options are neither switched off nor restored, and End() isn't
+    # called without a successful Begin().
+    lt.fail_begin = True
+    with pytest.raises(ltapy.error.APIError):
+        with lt.bulk_edit():
+            pass
+    assert lt.calls == []
+
+    # The option VIEWUPDATE can't be read.
+    lt.fail_begin = False
+    with pytest.raises(KeyError):
+        with lt.bulk_edit():
+            pass
+    assert lt.calls == [("Begin",), ("End",)]
+
+    lt.calls.clear()
+    lt.options["VIEWUPDATE"] = 1
+    with lt.bulk_edit():
+        assert lt.options == {"DBUPDATE": 0, "VIEWUPDATE": 0}
+    assert lt.options == {"DBUPDATE": 1, "VIEWUPDATE": 1}
+    assert lt.calls[0] == ("Begin",)
+    assert lt.calls[-1] == ("Cmd", ltapy._ltapi.UPDATE_COMMAND)
+
+
+def test_profiler_garbage_collected():
+    enabled = ltapy._profiling._enabled
+    profiler = ltapy._profiling.Profiler()
+    profiler.enable()
+    profiler.enable()
+    assert ltapy._profiling._enabled == enabled + 1
+    profiler.disable()
+    profiler.disable()
+    assert ltapy._profiling._enabled == enabled
+
+    # An enabled profiler that is garbage collected releases its count.
+    profiler.enable()
+    del profiler
+    gc.collect()
+    assert ltapy._profiling._enabled == enabled
+
+
+class StandInDispatch:
+
+    # Mimics the IDispatch interface and the generated ILTAPIx class.
+
+    def __init__(self, idispatch=None):
+        self.idispatch = idispatch
+
+    def QueryInterface(self, iid):
+        return self
+
+
+def test_concurrent_enhancement(monkeypatch):
+    enhanced = []
+
+    def enhance(lt):
+        enhanced.append(lt)
+        time.sleep(0.01)
+
+    monkeypatch.setattr(ltapy._ltapi, "_LTAPI_CLASSES", {})
+    monkeypatch.setattr(ltapy._ltapi, "_get_interface_iid", lambda obj: "")
+    monkeypatch.setattr(
+        ltapy._ltapi, "_ensure_makepy_support", lambda *args: None
+    )
+    monkeypatch.setattr(
+        ltapy._ltapi.win32com.client, "Dispatch", StandInDispatch
+    )
+    names = [
+        name for name in dir(ltapy._ltapi)
+        if name.startswith(("_enable_", "_improve_", "_add_", "_fix_"))
+    ]
+    for name in names:
+        monkeypatch.setattr(ltapy._ltapi, name, enhance)
+
+    # The class is enhanced only once, by the first connection.
+    threads = [
+        threading.Thread(target=ltapy._ltapi.LTAPI, args=(StandInDispatch(),))
+        for __ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(enhanced) == len(names)
+    assert len(set(map(id, enhanced))) == 1
+    assert list(ltapy._ltapi._LTAPI_CLASSES.values()) == [StandInDispatch]
+
+
+# Return values of each return signature and the processed output values,
+# as returned before the return value processors were precompiled.
+RETURN_VALUES = [
+    # No status code.
+    ("Str", '"abc"', '"abc"'),
+    ("GetStat", 3, 3),
+    # Status code only.
+    ("Cmd", 0, None),
+    # Output value and status code.
+    ("DbGet", ("Sphere_1", 0), "Sphere_1"),
+    ("DbKeyDump", (0, "dump"), "dump"),
+    ("SetMeshData", (0, [1.0]), None),
+    ("GetSplineVec", (0, [1.0, 2.0]), np.array([1.0, 2.0])),
+    # Two output values and status code.
+    ("ListNext", (0, "@1", "@2"), ["@1", "@2"]),
+    ("GetReceiverRayData", ([1.0], [2.0], 0), np.array([[1.0], [2.0]])),
+    ("GetMeshData", (0, [[1.0]], [[1.0]]), np.array([[1.0]])),
+]
+
+
+class TestReturnValueProcessing:
+
+    @pytest.mark.parametrize("func_name, return_value, out", RETURN_VALUES)
+    def test_output_value(self, lt, func_name, return_value, out):
+        process = ltapy._ltapi._make_return_value_processor(func_name)
+        result = process(lt, return_value)
+        if isinstance(out, np.ndarray):
+            assert isinstance(result, np.ndarray)
+            assert np.array_equal(result, out)
+        else:
+            assert result == out
+
+    def test_status_code(self, lt):
+        process = ltapy._ltapi._make_return_value_processor("DbGet")
+        success = ltapy._ltapi.LTReturnCodeEnum.ltStatusSuccessInternal
+        assert process(lt, ("Sphere_1", success)) == "Sphere_1"
+        with pytest.raises(ltapy.error.APIError):
+            process(lt, ("Sphere_1", -1))
+        with pytest.raises(ltapy.error.APIError):
+            ltapy._ltapi._make_return_value_processor("Cmd")(lt, -1)
+
+    def test_unexpected_return_value(self, lt):
+        process = ltapy._ltapi._make_return_value_processor("DbGet")
+        with pytest.raises(ValueError):
+            process(lt, (0, 1, 2, 3))
+        with pytest.raises(ValueError):
+            process(lt, 1.5)
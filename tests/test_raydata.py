@@ -0,0 +1,102 @@
+import os
+
+import numpy as np
+import pytest
+
+import ltapy.arrays
+import ltapy.raydata
+
+FILENAME = "ltapi.lts"
+
+FWSKEY = (
+    "LENS_MANAGER[1].ILLUM_MANAGER[Illumination_Manager]"
+    ".RECEIVERS[Receiver_List].FARFIELD_RECEIVER[farFieldReceiver_2]"
+    ".FORWARD_SIM_FUNCTION[Forward_Simulation]"
+)
+ITEMS = ["RayDataX", "RayDataY", "RayDataWavelength"]
+
+
+def test_iter_receiver_rays(lt):
+    expected = ltapy.arrays.get_receiver_ray_data(lt, FWSKEY, ITEMS, 25)
+    chunks = list(ltapy.raydata.iter_receiver_rays(
+        lt, FWSKEY, ITEMS, chunk_size=10, numrays=25
+    ))
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    assert chunks[0].dtype.names == tuple(ITEMS)
+    rays = np.concatenate(chunks)
+    assert np.array_equal(rays["RayDataX"], expected[:, 0])
+    assert np.array_equal(rays["RayDataWavelength"], expected[:, 2])
+
+
+def test_iter_receiver_rays_prefetch(lt):
+    chunks = ltapy.raydata.iter_receiver_rays(
+        lt, FWSKEY, ITEMS, chunk_size=10, numrays=25
+    )
+    prefetched = ltapy.raydata.iter_receiver_rays(
+        lt, FWSKEY, ITEMS, chunk_size=10, numrays=25, prefetch=True
+    )
+    for chunk, prefetched_chunk in zip(chunks, prefetched):
+        assert np.array_equal(chunk, prefetched_chunk)
+
+
+def test_export_receiver_rays(lt, tmpdir):
+    path = str(tmpdir.join("rays"))
+    expected = ltapy.arrays.get_receiver_ray_data(lt, FWSKEY, ITEMS, 25)
+    rays = ltapy.raydata.export_receiver_rays(
+        lt, FWSKEY, ITEMS, path, chunk_size=10, numrays=20
+    )
+    assert len(rays) == 20
+    rays = ltapy.raydata.export_receiver_rays(
+        lt, FWSKEY, ITEMS, path, chunk_size=10, numrays=5, append=True
+    )
+    assert len(rays) == 25
+    assert isinstance(rays["RayDataX"], np.memmap)
+    assert np.array_equal(rays["RayDataX"][:20], expected[:20, 0])
+    assert np.array_equal(rays["RayDataX"][20:], expected[:5, 0])
+
+    subset = ltapy.raydata.RayDataset(path, columns=["RayDataWavelength"])
+    assert subset.columns == ["RayDataWavelength"]
+    data = subset.read(stop=20)
+    assert data.dtype.names == ("RayDataWavelength",)
+    assert np.array_equal(data["RayDataWavelength"], expected[:20, 2])
+    assert np.array_equal(np.load(path + "/RayDataY.npy"), rays["RayDataY"])
+
+
+def test_export_replaces_dataset(tmpdir, monkeypatch):
+    path = str(tmpdir.join("rays"))
+    columns = {}
+
+    def iter_receiver_rays(lt, receiverkey, descriptors, chunk_size,
+                           numrays, prefetch):
+        dtype = [(name, np.float64) for name in descriptors]
+        for value in columns["values"]:
+            if value is None:
+                raise RuntimeError("LightTools was closed.")
+            yield np.full(2, value, dtype=dtype)
+
+    monkeypatch.setattr(
+        ltapy.raydata, "iter_receiver_rays", iter_receiver_rays
+    )
+    columns["values"] = [1.0, 2.0]
+    ltapy.raydata.export_receiver_rays(None, FWSKEY, ITEMS, path)
+
+    # An aborted export leaves the existing dataset intact.
+    columns["values"] = [3.0, None]
+    with pytest.raises(RuntimeError):
+        ltapy.raydata.export_receiver_rays(None, FWSKEY, ITEMS[:1], path)
+    rays = ltapy.raydata.RayDataset(path)
+    assert rays.columns == ITEMS
+    assert list(rays["RayDataY"]) == [1.0, 1.0, 2.0, 2.0]
+    assert sorted(os.listdir(path)) == sorted(
+        [ltapy.raydata.MANIFEST] + [name + ".npy" for name in ITEMS]
+    )
+    del rays
+
+    # Columns that are not exported again are removed.
+    columns["values"] = [3.0]
+    rays = ltapy.raydata.export_receiver_rays(None, FWSKEY, ITEMS[:1], path)
+    assert rays.columns == ITEMS[:1]
+    assert list(rays["RayDataX"]) == [3.0, 3.0]
+    assert sorted(os.listdir(path)) == [
+        "RayDataX.npy", ltapy.raydata.MANIFEST
+    ]
@@ -0,0 +1,117 @@
+import os
+
+import numpy as np
+import pytest
+
+import ltapy.arrays
+import ltapy.resultcache
+import ltapy.sweep
+
+FILENAME = "ltapi.lts"
+
+MODELFILE = os.path.join(os.path.dirname(__file__), "models", FILENAME)
+SPHKEY = "LENS_MANAGER[1].COMPONENTS[Components].SOLID[Sphere_1]"
+MSHKEY = (
+    "LENS_MANAGER[1].ILLUM_MANAGER[Illumination_Manager]"
+    ".RECEIVERS[Receiver_List].FARFIELD_RECEIVER[farFieldReceiver_2]"
+    ".FORWARD_SIM_FUNCTION[Forward_Simulation]"
+    ".INTENSITY_MESH[Intensity_Mesh]"
+)
+
+
+def test_result_cache(lt, tmpdir):
+    cache = ltapy.resultcache.ResultCache(str(tmpdir))
+    x = lt.DbGet(SPHKEY, "X")
+    overrides = {(SPHKEY, "X"): x + 1}
+
+    results = cache.run(lt, MODELFILE, overrides, [MSHKEY])
+    assert cache.info().misses == 1
+    cached = cache.run(lt, MODELFILE, overrides, [MSHKEY])
+    assert cache.info().hits == 1
+    assert np.array_equal(cached[MSHKEY], results[MSHKEY])
+
+    # The cache persists across cache objects.
+    cache = ltapy.resultcache.ResultCache(str(tmpdir))
+    key = cache.key(MODELFILE, overrides, [MSHKEY])
+    assert np.array_equal(cache.get(key)[MSHKEY], results[MSHKEY])
+    assert cache.get(cache.key(MODELFILE, {}, [MSHKEY])) is None
+
+    assert cache.invalidate(MODELFILE) == 1
+    assert cache.get(key) is None
+    assert len(cache) == 0
+    assert lt.DbGet(SPHKEY, "X") == x
+
+
+def test_overrides_are_restored(lt, tmpdir):
+    cache = ltapy.resultcache.ResultCache(str(tmpdir))
+    x = lt.DbGet(SPHKEY, "X")
+
+    shifted = cache.run(lt, MODELFILE, {(SPHKEY, "X"): x + 1}, [MSHKEY])
+    assert lt.DbGet(SPHKEY, "X") == x
+    unshifted = cache.run(lt, MODELFILE, {}, [MSHKEY])
+    assert cache.info().misses == 2
+    assert not np.array_equal(shifted[MSHKEY], unshifted[MSHKEY])
+
+
+def test_shared_cache_directory(tmpdir):
+    # Two cache objects (e.g. of two processes) share the directory
+    # without losing each other's results.
+    modelfile = str(tmpdir.join("model.lts"))
+    with open(modelfile, "w") as f:
+        f.write("model")
+    path = str(tmpdir.join("cache"))
+    cache1 = ltapy.resultcache.ResultCache(path)
+    cache2 = ltapy.resultcache.ResultCache(path)
+
+    key1 = cache1.key(modelfile, {("key", "X"): 1}, ["mesh"])
+    key2 = cache2.key(modelfile, {("key", "X"): 2}, ["mesh"])
+    cache1.put(key1, {"mesh": np.ones((10, 10))}, modelfile)
+    cache2.put(key2, {"mesh": np.full((10, 10), 2.0)}, modelfile)
+
+    cache3 = ltapy.resultcache.ResultCache(path)
+    assert len(cache3) == 2
+    assert np.array_equal(cache3.get(key1)["mesh"], np.ones((10, 10)))
+    assert np.array_equal(cache3.get(key2)["mesh"], np.full((10, 10), 2.0))
+
+    # The least recently used results are evicted first.
+    size = cache3.info().currsize
+    cache4 = ltapy.resultcache.ResultCache(path, maxsize=int(1.5 * size))
+    os.utime(cache4._filename(key2), (0, 0))
+    key3 = cache4.key(modelfile, {}, ["mesh"])
+    cache4.put(key3, {"mesh": np.ones((10, 10))}, modelfile)
+    assert cache4.get(key2) is None
+    assert cache4.get(key1) is not None
+    assert cache4.invalidate(modelfile) == 2
+    assert os.listdir(path) == []
+
+
+def test_settings(tmpdir, monkeypatch, standin):
+    monkeypatch.setattr(
+        ltapy.arrays, "get_mesh_data",
+        lambda lt, meshkey, cellfilter=None: np.ones((3, 2)),
+    )
+    modelfile = str(tmpdir.join("model.lts"))
+    with open(modelfile, "w") as f:
+        f.write("model")
+    cache = ltapy.resultcache.ResultCache(str(tmpdir.join("cache")))
+    lt = standin({("sim", "NumberOfRays"): 1000})
+
+    # Results are not stored under settings that differ from the session.
+    with pytest.raises(ValueError):
+        cache.run(
+            lt, modelfile, None, ["mesh"],
+            settings={("sim", "NumberOfRays"): 100000},
+        )
+    assert lt.calls == []
+    assert len(cache) == 0
+
+    cache.run(
+        lt, modelfile, None, ["mesh"],
+        settings={("sim", "NumberOfRays"): 1000},
+    )
+    assert lt.calls == [("Cmd", ltapy.sweep.SIMULATE_COMMAND)]
+    key = cache.key(
+        modelfile, {}, ["mesh"], {("sim", "NumberOfRays"): 1000.0}
+    )
+    assert cache.get(key) is not None
+    assert cache.get(cache.key(modelfile, {}, ["mesh"])) is None
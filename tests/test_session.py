@@ -1,5 +1,12 @@
+import asyncio
+import functools
 import os
 import subprocess
+import sys
+import time
+import types
+
+import pythoncom
 
 import ltapy.config
 import ltapy.error
@@ -23,6 +30,14 @@ def test_connect_to_running_session():
     proc.kill()
 
 
+def test_wait_for_sessions():
+    # The test process itself is no LightTools session.
+    start = time.time()
+    with pytest.raises(ltapy.error.TimeOutError):
+        ltapy.session.wait_for_sessions([os.getpid()], timeout=0.5)
+    assert time.time() - start < 1.0
+
+
 def test_start_new_session():
     with pytest.raises(ValueError):
         ses = ltapy.session.Session.new(version="99.9.9")
@@ -32,3 +47,216 @@ def test_start_new_session():
     version = lt.Version(0)
     lt.Cmd("Exit")
     assert version == ltapy.config.LT_VERSION
+
+
+def test_launch_sessions():
+    sessions = ltapy.session.launch(2)
+    assert len(sessions) == 2
+    assert len({ses.pid for ses in sessions}) == 2
+    for ses in sessions:
+        assert set(ses.startup_times) == {"start", "connect"}
+        assert all(t > 0 for t in ses.startup_times.values())
+        ses.lt.Cmd("Exit")
+
+
+def test_async_session(standin):
+    factory = functools.partial(standin, cmd_time=0.2, fail_on="Fail")
+
+    async def run():
+        ses1 = await ltapy.session.AsyncSession.connect(factory=factory)
+        ses2 = await ltapy.session.AsyncSession.connect(factory=factory)
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            for __ in range(5):
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        start = time.time()
+        await asyncio.gather(ses1.Cmd("Simulate"), ses2.Cmd("Simulate"), tick())
+        assert time.time() - start < 0.35
+        assert ticks == 5
+
+        with pytest.raises(ltapy.error.APIError) as excinfo:
+            await ses1.Cmd("Fail")
+        assert str(excinfo.value) == "[-1] Failed"
+        with pytest.raises(AttributeError):
+            ses1.NoSuchMethod
+
+        await ses1.close()
+        await ses2.close()
+        with pytest.raises(RuntimeError):
+            ses1.Cmd("Simulate")
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+
+def rpc_server_unavailable():
+    return pythoncom.com_error(
+        -2147023174, "The RPC server is unavailable.", None, None
+    )
+
+
+class StandInProcessLTAPI:
+
+    # Mimics the LightTools API object of a LightTools process.
+
+    def __init__(self, proc):
+        self.proc = proc
+
+    def Cmd(self, cmd):
+        if cmd == "Exit":
+            self.proc.kill()
+            self.proc.wait()
+        elif self.proc.poll() is not None:
+            raise rpc_server_unavailable()
+        elif cmd == "Crash":
+            self.proc.kill()
+            self.proc.wait()
+            raise rpc_server_unavailable()
+
+
+class StandInSession:
+
+    # Starts a stand-in process in place of lt.exe.
+
+    def __init__(self, pid=None):
+        self.proc = subprocess.Popen(
+            [sys.executable, "-c", "import time; time.sleep(60)"]
+        )
+        self.pid = self.proc.pid
+        self.lt = StandInProcessLTAPI(self.proc)
+
+
+def test_session_pool():
+    crashed = []
+    sessions = []
+
+    def start_session(pid):
+        sessions.append(StandInSession(pid))
+        return sessions[-1]
+
+    def square(lt, x):
+        if x == 3 and not crashed:
+            crashed.append(x)
+            lt.Cmd("Crash")
+        lt.Cmd("Simulate")
+        return x * x
+
+    with ltapy.session.SessionPool(3, factory=start_session) as pool:
+        assert list(pool.map(square, range(10))) == [x * x for x in range(10)]
+        stats = pool.stats()
+        assert len(stats) == 3
+        assert sum(worker["jobs"] for worker in stats) == 10
+        assert all(0 <= worker["utilization"] <= 1 for worker in stats)
+
+        with pytest.raises(pythoncom.com_error):
+            pool.submit(lambda lt: lt.Cmd("Crash")).result()
+
+    # One restart for the crash in map(), two for the crash and the retry
+    # of the submitted job.
+    assert sum(worker["restarts"] for worker in pool.stats()) == 3
+    assert len(sessions) == 6
+    assert all(ses.proc.poll() is not None for ses in sessions)
+    with pytest.raises(RuntimeError):
+        pool.submit(square, 1)
+
+
+def test_session_pool_initializer():
+    sessions = []
+
+    def start_session(pid):
+        sessions.append(StandInSession(pid))
+        return sessions[-1]
+
+    def load(lt, model):
+        lt.model = model
+
+    def simulate(lt, x):
+        if len(sessions) == 1:
+            lt.Cmd("Crash")
+        lt.Cmd("Simulate")
+        return lt.model, x
+
+    with ltapy.session.SessionPool(
+            1, factory=start_session, initializer=load,
+            initargs=("model.lts",)) as pool:
+        # The job is retried in the restarted session, which must have been
+        # initialized as well.
+        assert pool.submit(simulate, 1).result() == ("model.lts", 1)
+        assert pool.stats()[0]["restarts"] == 1
+
+    def fail(lt):
+        raise ValueError("Couldn't open the model.")
+
+    with pytest.raises(ValueError):
+        ltapy.session.SessionPool(1, factory=start_session, initializer=fail)
+    assert all(ses.proc.poll() is not None for ses in sessions)
+
+
+def test_session_pool_errors(standin):
+    sessions = []
+
+    def start_session(pid):
+        sessions.append(StandInSession(pid))
+        return sessions[-1]
+
+    def fail(lt):
+        raise ValueError("Invalid parameter.")
+
+    # An ordinary exception doesn't wait for the session to terminate.
+    with ltapy.session.SessionPool(1, factory=start_session) as pool:
+        start = time.perf_counter()
+        with pytest.raises(ValueError):
+            pool.submit(fail).result()
+        assert time.perf_counter() - start < ltapy.session._EXIT_GRACE_PERIOD
+        assert pool.stats()[0]["errors"] == 1
+        assert pool.stats()[0]["restarts"] == 0
+
+    def start_anonymous_session(pid):
+        return types.SimpleNamespace(pid=None, lt=standin())
+
+    def disconnect(lt):
+        raise rpc_server_unavailable()
+
+    # Without a process ID only a disconnected session is replaced.
+    with ltapy.session.SessionPool(
+            1, factory=start_anonymous_session) as pool:
+        with pytest.raises(ValueError):
+            pool.submit(fail).result()
+        assert pool.stats()[0]["restarts"] == 0
+        with pytest.raises(pythoncom.com_error):
+            pool.submit(disconnect).result()
+        assert pool.stats()[0]["restarts"] == 2
+    assert all(ses.proc.poll() is not None for ses in sessions)
+
+
+class StandInRunningObjectTable:
+
+    # Mimics the Running Object Table with three LightTools sessions.
+
+    bound = []
+
+    def find_names(self, prefix):
+        return [prefix + str(pid) for pid in (1912, 6940, 7311)]
+
+    def get_object(self, name):
+        self.bound.append(name)
+        return name
+
+
+def test_bind_wanted_sessions_only(monkeypatch):
+    monkeypatch.setattr(
+        ltapy.session._comutils, "RunningObjectTable",
+        StandInRunningObjectTable,
+    )
+    monkeypatch.setattr(StandInRunningObjectTable, "bound", [])
+    prefix = ltapy.session.ROT_PREFIX
+    sessions = dict(ltapy.session._iter_sessions([6940], timeout=1))
+    assert sessions == {6940: prefix + "6940"}
+    assert StandInRunningObjectTable.bound == [prefix + "6940"]
@@ -0,0 +1,136 @@
+import os
+
+import numpy as np
+import pytest
+
+import ltapy.arrays
+import ltapy.session
+import ltapy.sweep
+
+FILENAME = "ltapi.lts"
+
+SPHKEY = "LENS_MANAGER[1].COMPONENTS[Components].SOLID[Sphere_1]"
+MSHKEY = (
+    "LENS_MANAGER[1].ILLUM_MANAGER[Illumination_Manager]"
+    ".RECEIVERS[Receiver_List].FARFIELD_RECEIVER[farFieldReceiver_2]"
+    ".FORWARD_SIM_FUNCTION[Forward_Simulation]"
+    ".INTENSITY_MESH[Intensity_Mesh]"
+)
+
+
+def test_point_order():
+    sweep = ltapy.sweep.Sweep.grid(
+        [(("a", "X"), [0, 1, 2]), (("a", "Y"), [0, 1])], meshkeys=[]
+    )
+    assert sweep.order == [(0, 0), (0, 1), (1, 1), (1, 0), (2, 0), (2, 1)]
+    assert sweep.values((1, 1)) == (1, 1)
+
+    sweep = ltapy.sweep.Sweep.points(
+        [("a", "X"), ("a", "Y")],
+        [(0, 0), (5, 5), (0, 1), (5, 4), (0, 2)],
+        meshkeys=[],
+    )
+    assert sweep.order == [(0,), (2,), (4,), (1,), (3,)]
+
+
+def test_sweep(lt, tmpdir):
+    checkpoint = str(tmpdir.join("sweep"))
+    x = lt.DbGet(SPHKEY, "X")
+    y = lt.DbGet(SPHKEY, "Y")
+    sweep = ltapy.sweep.Sweep.grid(
+        {(SPHKEY, "X"): [x, x + 1], (SPHKEY, "Y"): [0.0, 0.5]},
+        meshkeys=[MSHKEY],
+    )
+    results = sweep.run(lt, checkpoint=checkpoint, checkpoint_interval=1)
+    data = results[MSHKEY]
+    lng = int(lt.DbGet(MSHKEY, "X_Dimension"))
+    lat = int(lt.DbGet(MSHKEY, "Y_Dimension"))
+    assert data.shape == (2, 2, lng, lat)
+    assert not np.isnan(data).any()
+    assert lt.DbGet(SPHKEY, "X") == x
+    assert lt.DbGet(SPHKEY, "Y") == y
+
+    # All points are completed, resuming from the checkpoint returns the
+    # saved results.
+    resumed = sweep.run(lt, checkpoint=checkpoint)
+    assert np.array_equal(resumed[MSHKEY], data)
+
+
+# The data items of the stand-in LightTools session: a 3 x 2 mesh whose
+# cell values depend on the parameters X and Y.
+VALUES = {
+    ("mesh", "X_Dimension"): 3, ("mesh", "Y_Dimension"): 2,
+    ("a", "X"): 5, ("a", "Y"): 5,
+}
+
+
+def get_mesh_data(lt, meshkey, cellfilter=None, out=None):
+    data = np.full((3, 2), 10 * lt.values["a", "X"] + lt.values["a", "Y"])
+    if out is None:
+        return data
+    out[...] = data
+    return out
+
+
+def test_checkpoint(tmpdir, monkeypatch, standin):
+    monkeypatch.setattr(ltapy.arrays, "get_mesh_data", get_mesh_data)
+    checkpoint = str(tmpdir.join("sweep"))
+    sweep = ltapy.sweep.Sweep.grid(
+        {("a", "X"): [0, 1, 2], ("a", "Y"): [0, 1]}, meshkeys=["mesh"]
+    )
+
+    lt = standin(VALUES, crash_after=4)
+    with pytest.raises(RuntimeError):
+        sweep.run(lt, checkpoint=checkpoint, checkpoint_interval=2)
+    assert lt.values == VALUES
+    done = np.load(os.path.join(checkpoint, "done.npy"))
+    assert done.sum() == 4
+
+    # Only the remaining points are run.
+    lt = standin(VALUES)
+    results = sweep.run(lt, checkpoint=checkpoint)
+    assert lt.commands == 2
+    assert lt.values == VALUES
+    assert results["mesh"].shape == (3, 2, 3, 2)
+    assert results["mesh"][:, :, 0, 0].tolist() == [[0, 1], [10, 11], [20, 21]]
+
+    other = ltapy.sweep.Sweep.grid({("a", "X"): [0, 1]}, meshkeys=["mesh"])
+    with pytest.raises(ValueError):
+        other.run(standin(VALUES), checkpoint=checkpoint)
+
+
+class StandInSession:
+
+    def __init__(self, lt):
+        self.lt = lt
+        self.pid = 4242
+
+
+def test_pool_restart(monkeypatch, standin):
+    monkeypatch.setattr(ltapy.arrays, "get_mesh_data", get_mesh_data)
+    sessions = []
+
+    def start_session(pid):
+        # The first session crashes, its replacement has no model loaded
+        # until the initializer runs.
+        crash_after = 1 if not sessions else None
+        lt = standin(VALUES, model=None, crash_after=crash_after)
+        sessions.append(StandInSession(lt))
+        return sessions[-1]
+
+    def open_model(lt, model):
+        lt.model = model
+
+    sweep = ltapy.sweep.Sweep.points(
+        [("a", "X"), ("a", "Y")], [(0, 0), (1, 0), (1, 1)], meshkeys=["mesh"]
+    )
+    with ltapy.session.SessionPool(
+            1, factory=start_session, initializer=open_model,
+            initargs=("model.lts",)) as pool:
+        # Crashes are detected by the process state of the session.
+        monkeypatch.setattr(ltapy.session, "_is_running", lambda *args: False)
+        results = sweep.run(pool, chunk_size=3)
+    assert len(sessions) == 2
+    assert results["mesh"][:, 0, 0].tolist() == [0, 10, 11]
+    assert sessions[-1].lt.values == VALUES
+
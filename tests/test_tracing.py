@@ -0,0 +1,82 @@
+import logging
+
+import numpy as np
+import pytest
+
+import ltapy._ltapi
+import ltapy.error
+import ltapy.tracing
+
+
+@pytest.fixture
+def tracing():
+    ltapy.tracing.enable(size=3)
+    yield ltapy.tracing
+    ltapy.tracing.disable()
+
+
+def call(lt, name, *args, status=0):
+    # Call a stand-in API function the way the wrapped API methods do.
+    def func(lt, *args):
+        if status:
+            raise ltapy.error.APIError(lt, status)
+        return args[-1] if args else None
+    func.__name__ = name
+    return ltapy._ltapi._call_instrumented(
+        lt, func, lambda lt, value: value, args, {}
+    )
+
+
+def test_records(tracing, standin):
+    lt = standin()
+    for i in range(5):
+        call(lt, "DbGet", "LENS_MANAGER[1]", i)
+    records = tracing.records()
+    assert [record.result for record in records] == [2, 3, 4]
+    assert all(record.name == "DbGet" for record in records)
+    assert all(record.status == 0 for record in records)
+    assert tracing.dump().count("\n") == 2
+    assert "DbGet('LENS_MANAGER[1]', 4) -> 4" in tracing.dump()
+
+    tracing.enable(size=2)
+    assert [record.result for record in tracing.records()] == [3, 4]
+    tracing.clear()
+    assert tracing.records() == []
+
+
+def test_disabled():
+    assert not ltapy.tracing.is_enabled()
+    assert ltapy.tracing.records() == []
+    assert ltapy.tracing.dump() == ""
+
+
+def test_summaries(tracing, standin):
+    lt = standin()
+    call(lt, "GetMeshData", np.zeros((11, 21)))
+    call(lt, "GetSplineVec", [[0, 1], [2, 3], [4, 5]])
+    call(lt, "Cmd", "x" * 200)
+    mesh, spline, cmd = tracing.records()
+    assert repr(mesh.result) == "<ndarray 11x21 float64>"
+    assert repr(spline.result) == "<list 3x2>"
+    assert len(cmd.args[0]) == ltapy.tracing._MAX_STR_LEN
+
+
+def test_trace_of_api_error(tracing, caplog, standin):
+    lt = standin()
+    call(lt, "DbGet", "LENS_MANAGER[1]", "Name")
+    with caplog.at_level(logging.INFO, logger="ltapy.tracing"):
+        with pytest.raises(ltapy.error.APIError) as excinfo:
+            call(lt, "ListByName", "@list", "Toroid_xx", status=-1)
+    # API errors are part of the normal control flow, the trace is not
+    # logged above DEBUG level.
+    assert caplog.records == []
+
+    trace = excinfo.value.trace
+    assert [record.name for record in trace] == ["DbGet", "ListByName"]
+    assert trace[-1].status == -1
+    assert "ListByName('@list', 'Toroid_xx')" in ltapy.tracing.dump(trace)
+
+    with caplog.at_level(logging.DEBUG, logger="ltapy.tracing"):
+        with pytest.raises(ltapy.error.APIError):
+            call(lt, "ListByName", "@list", "Toroid_xx", status=-1)
+    assert "most recent call last" in caplog.records[-1].getMessage()
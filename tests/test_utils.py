@@ -0,0 +1,20 @@
+import pytest
+
+import ltapy.error
+import ltapy.utils
+
+
+def test_open_file(standin):
+    for show_dialog in (0, 1):
+        lt = standin(options={"SHOWFILEDIALOGBOX": show_dialog})
+        ltapy.utils.open_file(lt, "model.lts")
+        (__, __, hide), (__, cmd), (__, __, restore) = lt.calls
+        assert hide == 0
+        assert cmd.startswith("Open ")
+        assert cmd.endswith('/model.lts"')
+        assert restore == show_dialog
+
+    lt = standin(options={"SHOWFILEDIALOGBOX": 1}, fail_on="Open")
+    with pytest.raises(ltapy.error.APIError):
+        ltapy.utils.open_file(lt, "missing.lts")
+    assert lt.options["SHOWFILEDIALOGBOX"] == 1